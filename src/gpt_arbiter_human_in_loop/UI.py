@@ -1,13 +1,17 @@
 import asyncio
 import functools
+import heapq
 import typing as tp
 import time
 import math
 import threading
 import subprocess
 import shutil
-import random
+import contextlib
 
+from dataclasses import dataclass, replace
+
+from rich.markup import escape
 from textual import on
 from textual.pilot import Pilot
 from textual.reactive import reactive
@@ -20,11 +24,24 @@ from textual.widgets import (
 )
 import webbrowser
 
-from .shared import PromptAndExamples, Classifiee, titled, ItemStatus, QAPair
+from .shared import (
+    Classifiee, titled, ItemStatus, QAPair, NO_OR_YES, PromptAndExamples, 
+)
 from .stacked_bar_ascii import StackedBar
 from .histogram_ascii import Histogram
+from .share_bar_ascii import ShareBar
 from .arbiter_interface import ArbiterInterface
-from .persistent import Persistent, ItemAnnotations
+from .persistent import ItemAnnotations
+from .pricing import PRICING
+from .token_estimate import PromptTokenProfile, ClassifieeTokenStats
+from .example_selection import ExampleSelector
+from .classifiee_cache import ClassifieeCache
+from .id_queue import IdQueue, queryScore
+from .work_queue import WorkQueue
+from .labeling_server import LabelingServer, Assignments
+from .track import Track, QueryKey
+from .neighbor_index import NeighborIndex
+from .circuit_breaker import CircuitOpenError
 
 class LinkPrivate(Link):
     def action_open_link(self) -> None:
@@ -37,11 +54,46 @@ class LinkPrivate(Link):
             else:
                 webbrowser.open(self.url)
 
+def isHistogrammed(anno: ItemAnnotations) -> bool:
+    '''
+    The decisions histogram shows GPT verdicts on unlabeled items.  
+    '''
+    return (
+        anno.status != ItemStatus.Unvisited() and 
+        anno.human_label_no_or_yes is None
+    )
+
+def collected(
+    ids: tp.Iterable[str], among: tp.Container[str], into: set[str], 
+) -> tp.Iterator[str]:
+    '''
+    Passes `ids` through, and adds those `among` to `into`.  
+    '''
+    for id_ in ids:
+        if id_ in among:
+            into.add(id_)
+        yield id_
+
+@dataclass
+class PreparedQuery:
+    '''
+    Renders of a query candidate, computed off the critical path.  
+    `with_examples` is valid for prompt version `version` only.  
+    '''
+    classifiee: Classifiee
+    with_prompt: str
+    with_examples: str
+    version: str
+
 class UI(App):
     CSS_PATH = "styles.tcss"
     BINDINGS = [
         Binding("y", "label_yes", "/"),
         Binding("n", "label_no", "."),
+        *[
+            Binding(str(i + 1), f"label_class({i})", show=False)
+            for i in range(9)
+        ],
         Binding("e", "focus_explanation", "Explain."),
         Binding("ctrl+s", "submit", "Submit."),
         Binding("w", "ask_why", "Why?"),
@@ -58,7 +110,7 @@ class UI(App):
         self, 
         arbiter: ArbiterInterface,
         prompt_and_examples_filename: str,
-        all_ids: tp.Sequence[str],
+        all_ids: tp.Iterable[str],
         idToClassifiee: tp.Callable[[str], Classifiee],
         rw_json_path: str,
         Lambda: float, 
@@ -66,95 +118,151 @@ class UI(App):
         initial_throttle_qps: float = 1.0, # queries per second
         interrogate_question: str = 'Explain VERY BRIEFLY (1 short sentence) why you made that decision.',
         interrogate_max_tokens: int = 50,
+        preflight_sample_size: int = 8,
+        example_selector: ExampleSelector | None = None,
+        example_budget_tokens: int | None = None,
+        idsToClassifiees: tp.Callable[
+            [tp.Sequence[str]], tp.Sequence[Classifiee], 
+        ] | None = None,
+        classifiee_cache_size: int = 1024,
+        prefetch_ahead: int = 16,
+        shuffle_buffer: int = 100_000,
+        n_ids: int | None = None,
+        work_queue: WorkQueue | None = None,
+        worker_id: str = 'ui',
+        query_queue_size: int = 4,
+        prefetch_interrogation: bool = False,
+        labeling_port: int | None = None,
+        labeling_host: str = '127.0.0.1',
+        labeling_lease_seconds: float = 600.0,
+        warm_up_connections: int = 2,
+        extra_tracks: tp.Sequence[Track] = (),
+        neighbor_index: NeighborIndex | None = None,
+        warm_start: bool = True,
     ) -> None:
         '''
+        `rw_json_path`: the annotations file.  
         `Lambda`: data diversity hyperparam.  
         Its inverse, `1 / Lambda`, equals the probability that 
         two independently drawn data points are significantly 
         related.  
+        `preflight_sample_size`: how many classifiees to fetch at 
+        startup to project costs before the first API call.  
+        `example_selector` and `example_budget_tokens`: if both are 
+        given, only the selected examples within the budget are 
+        rendered into the prompt. Otherwise all examples are.  
+        `idsToClassifiees`: optional batch version of `idToClassifiee`.  
+        `prefetch_ahead`: how many upcoming items to fetch classifiees 
+        for in the background, ahead of the judging loop.  
+        `all_ids` can be any iterable, e.g. a generator over a database. 
+        Unless it is a `Sequence`, unvisited ids are drawn through a 
+        shuffle buffer of `shuffle_buffer` ids. See `IdQueue`.  
+        `n_ids`: the dataset size, if `all_ids` has no `len()`.  
+        `work_queue`: share judging with `HeadlessWorker`s. This UI 
+        enqueues `all_ids`, judges leased items like any worker, and 
+        publishes the prompt version after each label.  
+        `query_queue_size`: how many top query candidates to keep 
+        prepared, so the next query shows up as soon as you submit.  
+        `prefetch_interrogation`: speculatively start "Ask GPT why" in 
+        the background as soon as a query shows up. Costs an 
+        interrogation per query, shown separately in the Cost pane.  
+        `labeling_port`: serve a local web page where colleagues can 
+        label concurrently. Each gets a different query candidate, held 
+        for `labeling_lease_seconds`. Set `query_queue_size` to at 
+        least the number of labelers. See `LabelingServer`.  
+        `warm_up_connections`: how many API connections to open at 
+        startup, before the first judge call needs one.  
+        `extra_tracks`: more prompts to judge the same ids against, in 
+        the same pass. The dashboard shows the main track. Human 
+        queries come from whichever track is most uncertain. See `Track`.  
+        `neighbor_index`: a label only makes items similar to the 
+        labeled one more stale. See `NeighborIndex`. Not with a 
+        `work_queue`, which counts every label.  
+        `warm_start`: at startup, verdicts from an older prompt version 
+        become Outdated by the version distance, instead of Unvisited. 
+        See `Track.reconcileVersions`.  
         '''
         super().__init__()
 
         self.arbiter = arbiter
         self.prompt_and_examples_filename = prompt_and_examples_filename
         self.unsorted_all_ids = all_ids
-        self.all_ids: list[str] | None = None
+        self.all_ids: IdQueue | None = None
+        self.shuffle_buffer = shuffle_buffer
+        self.n_ids = n_ids
+        self.work_queue = work_queue
+        self.worker_id = worker_id
+        # renewed by heartbeats while judging
+        self.lease_seconds = 60.0
+        self.work_queue_seq = 0
         self.idToClassifiee = idToClassifiee
+        self.classifiees = ClassifieeCache(
+            idToClassifiee, idsToClassifiees, 
+            capacity=max(classifiee_cache_size, prefetch_ahead * 2), 
+        )
+        self.prefetch_ahead = prefetch_ahead
         self.Lambda = Lambda
         self.model_name = model_name
         self.interrogate_question = interrogate_question
         self.interrogate_max_tokens = interrogate_max_tokens
+        self.preflight_sample_size = preflight_sample_size
+        self.example_selector = example_selector
+        self.example_budget_tokens = example_budget_tokens
 
         self.throttle_active = True
         self.throttle_qps = initial_throttle_qps
-        self.querying_id: str | None = None
+        self.querying: QueryKey | None = None
         self.gpt_reasons: list[str] | None = None
+        self.gpt_reasons_revealed = False
+        self.interrogateTask: asyncio.Task | None = None
+        # left to finish after their query changed
+        self.detached_interrogations: set[asyncio.Task] = set()
+        self.query_queue_size = query_queue_size
+        self.prefetch_interrogation = prefetch_interrogation
+        self.query_candidates: list[QueryKey] = []
+        self.prepared_queries: dict[QueryKey, PreparedQuery] = {}
+        self.assignments = Assignments(labeling_lease_seconds)
+        self.labeling_port = labeling_port
+        self.labeling_host = labeling_host
+        self.labeling_server: LabelingServer | None = None
+        self.warm_up_connections = warm_up_connections
+        self.warmUpTask: asyncio.Task | None = None
+        self.neighbor_index = neighbor_index
+        self.warm_start = warm_start
 
-        self.persistent = Persistent(rw_json_path)
-        self.Context = self.persistent.Context
+        self.main_track = Track(
+            'main', prompt_and_examples_filename, rw_json_path, 
+        )
+        self.tracks = [self.main_track, *extra_tracks]
+        # the main track owns the visiting order and the dashboard
+        self.persistent = self.main_track.persistent
         self.cursor = 0
         self.last_gpt_time = 0.0
         self.arbitTask: asyncio.Task | None = None
         self.selectQueryTask: asyncio.Task | None = None
+        self.preflightTask: asyncio.Task | None = None
+        self.prepareQueryTask: asyncio.Task | None = None
         self.selectQueryBarrier = threading.Lock()
         self.selectQueryBarrier.acquire()
+        self.submit_lock = asyncio.Lock()
         self.last_arbit_info: tuple[ItemAnnotations, float] | None = None
+        self.classifiee_token_stats = ClassifieeTokenStats()
+        # input tokens cut by the tracks' `CompactionPolicy`s
+        self.compaction_saved_tokens = 0
 
-        self.prompt_and_examples = PromptAndExamples.fromFile(
-            prompt_and_examples_filename
+        assert self.main_track.is_binary or work_queue is None, (
+            'The work queue only supports Yes/No classification.'
+        )
+        assert not extra_tracks or work_queue is None, (
+            'The work queue only supports one track.'
+        )
+        assert neighbor_index is None or work_queue is None, (
+            'The work queue counts staleness in labels since judging, '
+            'so a neighbor index would have no effect.'
         )
 
         self.title = "GPT Arbiter Human-in-Loop"
     
-    @staticmethod
-    def orderedIds(
-        unsorted: tp.Sequence[str], persistent: Persistent,
-        Lambda: float,
-    ) -> list[str]:
-        '''
-        - Order visited items by how probable GPT has new ideas about them.
-          - The math mirrors the query selection scoring.
-        - Randomly shuffle unvisited items.  
-          - i.i.d. is important.  
-        '''
-        visited: list[tuple[str, ItemAnnotations]] = []
-        unvisited: list[str] = []
-        for id_ in unsorted:
-            anno = persistent.get(id_)
-            if anno.status == ItemStatus.Unvisited():
-                unvisited.append(id_)
-            else:
-                visited.append((
-                    id_, anno
-                ))
-        
-        def score(item: tuple[str, ItemAnnotations]) -> float:
-            _, anno_ = item
-            if anno_.human_label_no_or_yes is not None:
-                return -2.0
-            k = anno_.status.staleness
-            if k == 0:
-                return -1.0
-            p = anno_.gpt_verdict
-            assert p is not None
-            H2 = -p * math.log2(p) - (1 - p) * math.log2(
-                1 - p
-            ) if 0.0 < p < 1.0 else 0.0
-            return H2 * (1 - (1 - 1 / Lambda) ** k)
-
-        visited.sort(key=score, reverse=True)
-        random.shuffle(unvisited)
-        results = unvisited + [
-            id_ for id_, _ in visited
-        ]
-        # for index in (0, 1, 2, 3, -2, -1):
-        #     print(f'{index = }')
-        #     id_ = results[index]
-        #     print(f'{id_ = }')
-        #     anno = persistent.get(id_)
-        #     print(f'{anno = }')
-        return results
-    
     def run(
         self, *, headless: bool = False, inline: bool = False, 
         inline_no_clear: bool = False, mouse: bool = True, 
@@ -163,9 +271,29 @@ class UI(App):
             [Pilot[object]], tp.Coroutine[tp.Any, tp.Any, None]
         ] | None = None, loop: asyncio.AbstractEventLoop | None = None, 
     ) -> tp.Any | None:
-        with self.persistent.Context():
-            self.all_ids = __class__.orderedIds(
-                self.unsorted_all_ids, self.persistent, self.Lambda, 
+        with contextlib.ExitStack() as stack:
+            for track in self.tracks:
+                stack.enter_context(track.persistent.Context())
+                track.reconcileVersions(self.warm_start)
+            source = self.unsorted_all_ids
+            total = self.n_ids
+            source_ids: set[str] | None = None
+            if self.work_queue is not None:
+                if total is None and isinstance(source, tp.Sized):
+                    total = len(source)
+                # the work queue owns the order of unvisited ids. 
+                # Only annotated ids are kept, for `IdQueue` to revisit.
+                annotated = {id_ for id_, _ in self.persistent.items()}
+                source_ids = set()
+                self.work_queue.enqueue(
+                    collected(source, annotated, source_ids), 
+                )
+                del annotated
+                source = ()
+            self.all_ids = IdQueue(
+                source, self.persistent, self.Lambda, 
+                shuffle_buffer=self.shuffle_buffer, total=total, 
+                source_ids=source_ids, 
             )
             return super().run(
                 headless=headless, inline=inline, 
@@ -194,9 +322,17 @@ class UI(App):
                     with titled(RadioSet(id='on-off'), 'GPT ⏻', skip_bottom=False):
                         yield RadioButton("Pause", id="off-radio", value=True)
                         yield RadioButton("Judge", id="on-radio")
-                    yield titled(Histogram(
-                        ('No', 'Yes'), id="decisions-histogram",
-                    ), 'GPT Decisions and Confidence', skip_bottom=False)
+                    if self.main_track.is_binary:
+                        yield titled(Histogram(
+                            ('No', 'Yes'), id="decisions-histogram",
+                        ), 'GPT Decisions and Confidence', skip_bottom=False)
+                    else:
+                        yield titled(Histogram(
+                            ('Unsure', 'Sure'), id="decisions-histogram",
+                        ), 'GPT Confidence', skip_bottom=False)
+                        yield titled(ShareBar(
+                            self.main_track.class_names, id="decisions-share",
+                        ), 'GPT Decisions', skip_bottom=False)
             with titled(Container(id='progress-box'), 'Progress', skip_bottom=False):
                 yield StackedBar('-0123456789+', id='stacked-bar')
         
@@ -235,19 +371,30 @@ class UI(App):
                 with titled(Grid(id="human-input"), 'What do you think?', skip_bottom=False):
                     yield Button("Submit", id="submit-btn")
                     with RadioSet(id='yes-no'):
-                        yield RadioButton("No", id="no-radio")
-                        yield RadioButton("Yes", id="yes-radio")
+                        # relabeled per query, for the query's track
+                        n_radios = max(len(t.class_names) for t in self.tracks)
+                        for i in range(n_radios):
+                            yield RadioButton(
+                                self.main_track.class_names[i] 
+                                if i < len(self.main_track.class_names) else '', 
+                                id=f"class-radio-{i}", 
+                            )
                     yield Input(placeholder="(Optional) Explain...", id="explanation-input")
 
         yield Footer(compact=True)
     
     def action_label_yes(self) -> None:
-        b = self.query_one('#yes-radio', RadioButton)
-        b.value = True
-        self.onYesNoChanged()
+        if self.queryingTrack().is_binary:
+            self.action_label_class(1)
     
     def action_label_no(self) -> None:
-        b = self.query_one('#no-radio', RadioButton)
+        if self.queryingTrack().is_binary:
+            self.action_label_class(0)
+    
+    def action_label_class(self, class_i: int) -> None:
+        if class_i >= len(self.queryingTrack().class_names):
+            return
+        b = self.query_one(f'#class-radio-{class_i}', RadioButton)
         b.value = True
         self.onYesNoChanged()
     
@@ -281,106 +428,399 @@ class UI(App):
         b.focus()
 
     @on(Button.Pressed, '#submit-btn')
-    def action_submit(self) -> None:
-        if self.querying_id is None:
+    async def action_submit(self) -> None:
+        if self.querying is None:
             return
         yesNo: RadioSet = self.query_one('#yes-no', RadioSet)
         label = yesNo.pressed_index
         if label == -1:
             return
-        self.persistent.labelOne(self.querying_id, label)
         explainInput: Input = self.query_one('#explanation-input', Input)
         explanation = explainInput.value.strip() or None
-        self.prompt_and_examples = self.prompt_and_examples.addExampleSyncingFile(
-            QAPair(
-                question = self.idToClassifiee(self.querying_id),
-                no_or_yes = label,
-                explanation = explanation,
-            ),
-        )
+        querying = self.querying
+        self.setQuery(None)
 
         pressed_button = yesNo.pressed_button
         if pressed_button is not None:
             with self.prevent(RadioButton.Changed):
                 pressed_button.value = False
             yesNo._pressed_button = None
-        self.querying_id = None
-        self.gpt_reasons = None
         explainInput.value = ''
         bAskWhy: Button = self.query_one('#ask-why-btn', Button)
         bAskWhy.focus()
+        await self.submitLabel(querying, label, explanation)
+    
+    async def submitLabel(
+        self, key: QueryKey, label: int, explanation: str | None,
+    ) -> bool:
+        '''
+        The one path for labels, from the TUI and the labeling server.  
+        Runs on the event loop, and submits are applied serially.  
+        Returns False if the item is already labeled in that track.  
+        '''
+        async with self.submit_lock:
+            return await self.applyLabel(key, label, explanation)
+    
+    async def applyLabel(
+        self, key: QueryKey, label: int, explanation: str | None,
+    ) -> bool:
+        track_i, id_ = key
+        track = self.tracks[track_i]
+        if track.persistent.get(id_).human_label_no_or_yes is not None:
+            return False
+        classifiee = await self.getClassifiee(id_)
+        near = None
+        if self.neighbor_index is not None:
+            # a brute-force scan over all vectors
+            near = await asyncio.to_thread(self.neighbor_index.near, id_)
+        track.persistent.labelOne(id_, label, near=near)
+        track.prompt_and_examples = track.prompt_and_examples.addExampleSyncingFile(
+            QAPair(
+                question = classifiee,
+                no_or_yes = label,
+                explanation = explanation,
+            ),
+        )
+        if self.work_queue is not None:
+            await asyncio.to_thread(self.labelInWorkQueue, id_, label)
+        self.prepared_queries.pop(key, None)
+        if self.querying is None:
+            self.showNextQuery()
         self.myUpdate()
-        self.maybeStartSelectQuery()
+        if self.selectQueryTask is None:
+            # refresh the candidates in the background
+            self.maybeStartSelectQuery()
+        return True
     
-    def maybeStartSelectQuery(self) -> None:
-        assert self.selectQueryTask is None
-        assert self.querying_id is None
-        self.selectQueryTask = asyncio.create_task(
-            asyncio.to_thread(self.selectQuery), 
+    def setQuery(self, key: QueryKey | None) -> None:
+        if self.interrogateTask is not None:
+            # usage only arrives with the last chunk, so a cancelled 
+            # stream would be paid for but never counted
+            self.detached_interrogations.add(self.interrogateTask)
+            self.interrogateTask.add_done_callback(
+                self.detached_interrogations.discard, 
+            )
+            self.interrogateTask = None
+        self.querying = key
+        self.gpt_reasons = None
+        self.gpt_reasons_revealed = False
+        if key is not None and len(self.tracks) > 1:
+            self.showTrack(self.tracks[key[0]])
+        if key is not None and self.prefetch_interrogation:
+            self.startInterrogation(speculative=True)
+    
+    def showTrack(self, track: Track) -> None:
+        '''
+        Relabels the class radio buttons for `track`.  
+        '''
+        self.query_one('#greeter', Static).update(escape(
+            f'The GPT arbiter is entrusting you with the following decision! '
+            f'({track.name})'
+        ))
+        yesNo: RadioSet = self.query_one('#yes-no', RadioSet)
+        for i, radioButton in enumerate(yesNo.query(RadioButton)):
+            is_used = i < len(track.class_names)
+            radioButton.label = track.class_names[i] if is_used else ''
+            radioButton.display = is_used
+    
+    def showNextQuery(self) -> bool:
+        '''
+        Re-ranks the prepared candidates with fresh annotations, 
+        and shows the best one without rescanning all items.  
+        '''
+        assert self.querying is None
+        self.rerankCandidates()
+        if not self.query_candidates:
+            return False
+        self.setQuery(self.query_candidates.pop(0))
+        return True
+    
+    def queryingTrack(self) -> Track:
+        if self.querying is None:
+            return self.main_track
+        return self.tracks[self.querying[0]]
+    
+    def annotationsOf(self, key: QueryKey) -> ItemAnnotations:
+        track_i, id_ = key
+        return self.tracks[track_i].persistent.get(id_)
+    
+    def rerankCandidates(self) -> None:
+        held = self.assignments.active()
+        scored = [
+            (queryScore(self.annotationsOf(key), self.Lambda), key)
+            for key in self.query_candidates
+            if key not in held
+        ]
+        scored.sort(reverse=True)
+        self.query_candidates = [key for s, key in scored if s > 0.0]
+    
+    async def assignQuery(self, labeler: str) -> dict[str, tp.Any] | None:
+        '''
+        For the labeling server. Hands out a query nobody else holds.  
+        '''
+        held = self.assignments.heldBy(labeler)
+        if held:
+            key = held[0]
+        else:
+            self.rerankCandidates()
+            if not self.query_candidates:
+                # the task clears `selectQueryTask` from its thread
+                task = self.selectQueryTask
+                if task is None:
+                    task = self.maybeStartSelectQuery()
+                await asyncio.shield(task)
+                self.rerankCandidates()
+            if not self.query_candidates:
+                return None
+            key = self.query_candidates.pop(0)
+        self.assignments.assign(key, labeler)
+        prepared = await self.prepareQueryOffLoop(key)
+        track_i, id_ = key
+        track = self.tracks[track_i]
+        anno = track.persistent.get(id_)
+        if len(self.query_candidates) <= 1 and self.selectQueryTask is None:
+            self.maybeStartSelectQuery()
+        return dict(
+            track=track_i, 
+            track_name=track.name, 
+            id=id_, 
+            classifiee=prepared.classifiee, 
+            with_prompt=prepared.with_prompt, 
+            with_examples=prepared.with_examples, 
+            classes=track.class_names, 
+            gpt_decision=track.class_names[anno.decision()], 
+            gpt_confidence=max(anno.probs()), 
+            gpt_verdict=anno.gpt_verdict, 
+            staleness=anno.status.staleness, 
         )
+    
+    async def interrogateFor(self, key: QueryKey) -> list[tuple[str, str]]:
+        '''
+        For the labeling server. Not streamed.  
+        Returns (decision, reason) pairs.  
+        '''
+        decisions = self.topTwoClasses(key)
+        reasons = ['', '']
+        def append(index_: int, chunk: str) -> None:
+            reasons[index_] += chunk.replace('\n', ' ')
+        await self.arbiter.interrogate(
+            model=self.model_name, 
+            prompt=(await self.prepareQueryOffLoop(key)).with_examples,
+            callbackNo =functools.partial(append, 0),
+            callbackYes=functools.partial(append, 1),
+            max_tokens=self.interrogate_max_tokens,
+            question=self.interrogate_question,
+            decisions=decisions,
+        )
+        return [*zip(decisions, reasons)]
+    
+    def topTwoClasses(self, key: QueryKey) -> tuple[str, str]:
+        '''
+        What interrogation argues for. Yes/No keeps its order.  
+        '''
+        track = self.tracks[key[0]]
+        if track.is_binary:
+            return NO_OR_YES
+        probs = self.annotationsOf(key).probs()
+        i, j = sorted(
+            range(len(track.class_names)), key=lambda k: -probs[k], 
+        )[:2]
+        return track.class_names[i], track.class_names[j]
+    
+    def maybeStartSelectQuery(self) -> asyncio.Task:
+        assert self.selectQueryTask is None
+        task = asyncio.create_task(asyncio.to_thread(self.selectQuery))
+        self.selectQueryTask = task
         self.selectQueryBarrier.release()
+        return task
     
     def selectQuery(self) -> None:
         assert self.all_ids is not None
         self.selectQueryBarrier.acquire()
         try:
-            def score(id_: str) -> float:
-                anno = self.persistent.get(id_)
-                if anno.human_label_no_or_yes is not None:
-                    return -1.0
-                match anno.status:
-                    case ItemStatus.Unvisited():
-                        return -1.0
-                    case _:
-                        k = anno.status.staleness
-                p = anno.gpt_verdict
-                assert p is not None
-                H2 = -p * math.log2(p) - (1 - p) * math.log2(
-                    1 - p
-                ) if 0.0 < p < 1.0 else 0.0
-                return H2 * (1 - 1 / self.Lambda) ** k
-            
-            best_id = max(self.all_ids, key=score)
-            # self.log(f'{score(best_id) = }')
-            if score(best_id) <= 0.0:
-                return
-            self.querying_id = best_id
-            self.myUpdate()
+            held = self.assignments.active()
+            # entropy is in bits, so scores compare across tracks
+            ranked = heapq.nlargest(
+                self.query_queue_size + 1, (
+                    (queryScore(anno, self.Lambda), (track_i, id_))
+                    for track_i, track in enumerate(self.tracks)
+                    for id_, anno in track.persistent.items()
+                    if (track_i, id_) != self.querying and 
+                    (track_i, id_) not in held
+                ), 
+            )
+            candidates = [key for s, key in ranked if s > 0.0]
+            # `prepared_queries` belongs to the event loop
+            prepared = {
+                key: self.buildPreparedQuery(
+                    key, self.prepared_queries.get(key), 
+                )
+                for key in candidates
+            }
+            self.call_from_thread(self.onQueryCandidates, candidates, prepared)
         finally:
             self.selectQueryTask = None
     
+    def onQueryCandidates(
+        self, candidates: list[QueryKey], 
+        prepared: dict[QueryKey, PreparedQuery], 
+    ) -> None:
+        keep = {*candidates, *self.assignments.active(), self.querying}
+        for key in [*self.prepared_queries]:
+            if key not in keep:
+                del self.prepared_queries[key]
+        for key, p in prepared.items():
+            current = self.prepared_queries.get(key)
+            # unless the loop prepared it meanwhile
+            if current is None or current.version != p.version:
+                self.prepared_queries[key] = p
+        self.query_candidates = candidates
+        if self.querying is None and self.showNextQuery():
+            self.myUpdate()
+    
+    async def prepareQueryOffLoop(self, key: QueryKey) -> PreparedQuery:
+        '''
+        Fetches and renders in a worker thread, unless up to date.  
+        '''
+        prepared = self.prepared_queries.get(key)
+        version = self.tracks[key[0]].prompt_and_examples.version
+        if prepared is None or prepared.version != version:
+            prepared = await asyncio.to_thread(
+                self.buildPreparedQuery, key, prepared, 
+            )
+            self.prepared_queries[key] = prepared
+        return prepared
+    
+    def preparedForDisplay(self, key: QueryKey) -> PreparedQuery:
+        '''
+        Never fetches or renders on the event loop. Until it is 
+        prepared, the last preparation or placeholders, and the UI is 
+        updated again once it is.  
+        '''
+        prepared = self.prepared_queries.get(key)
+        version = self.tracks[key[0]].prompt_and_examples.version
+        if prepared is not None and prepared.version == version:
+            return prepared
+        if self.prepareQueryTask is None:
+            self.prepareQueryTask = asyncio.create_task(
+                self.prepareThenUpdate(key), 
+            )
+        return prepared or PreparedQuery('…', '…', '…', version='')
+    
+    async def prepareThenUpdate(self, key: QueryKey) -> None:
+        try:
+            await self.prepareQueryOffLoop(key)
+        finally:
+            self.prepareQueryTask = None
+        self.myUpdate()
+    
+    async def getClassifiee(self, id_: str) -> Classifiee:
+        classifiee = self.classifiees.peek(id_)
+        if classifiee is None:
+            classifiee = await asyncio.to_thread(self.classifiees.get, id_)
+        return classifiee
+    
+    def buildPreparedQuery(
+        self, key: QueryKey, prepared: PreparedQuery | None, 
+        classifiee: Classifiee | None = None, 
+    ) -> PreparedQuery:
+        '''
+        `prepared` if it is up to date, else a new one. Never mutates.  
+        '''
+        track_i, id_ = key
+        prompt_and_examples = self.tracks[track_i].prompt_and_examples
+        version = prompt_and_examples.version
+        if prepared is None:
+            if classifiee is None:
+                classifiee = self.classifiees.get(id_)
+            return PreparedQuery(
+                classifiee=classifiee, 
+                with_prompt=self.renderPrompt(
+                    prompt_and_examples, classifiee, omit_examples=True, 
+                ), 
+                with_examples=self.renderPrompt(
+                    prompt_and_examples, classifiee, 
+                ), 
+                version=version, 
+            )
+        if prepared.version != version:
+            return replace(
+                prepared, 
+                with_examples=self.renderPrompt(
+                    prompt_and_examples, prepared.classifiee, 
+                ), 
+                version=version, 
+            )
+        return prepared
+    
     @on(Button.Pressed, '#ask-why-btn')
-    async def action_ask_why(self) -> None:
-        if self.querying_id is None:
+    def action_ask_why(self) -> None:
+        if self.querying is None:
             return
-        if self.gpt_reasons is not None:
+        if self.gpt_reasons_revealed:
             return
+        self.gpt_reasons_revealed = True
         switcher: ContentSwitcher = self.query_one('#gpt-why-switcher', ContentSwitcher)
         switcher.current = 'gpt-why-response'
-        sWhyNo:  Static = self.query_one('#gpt-why-no',  Static)
-        sWhyYes: Static = self.query_one('#gpt-why-yes', Static)
-        sWhyNo .update('')
-        sWhyYes.update('')
-        querying_id = self.querying_id
-        statics = (sWhyNo, sWhyYes)
+        reasons = self.gpt_reasons or ['', '']
+        self.query_one('#gpt-why-no',  Static).update(reasons[0])
+        self.query_one('#gpt-why-yes', Static).update(reasons[1])
+        if self.interrogateTask is None and self.gpt_reasons is None:
+            self.startInterrogation()
+    
+    def startInterrogation(self, speculative: bool = False) -> None:
+        assert self.querying is not None
+        assert self.interrogateTask is None
+        self.interrogateTask = asyncio.create_task(
+            self.interrogate(self.querying, speculative), 
+        )
+    
+    async def interrogate(
+        self, querying: QueryKey, speculative: bool = False, 
+    ) -> None:
+        '''
+        Accumulates into `self.gpt_reasons`, shown once revealed.  
+        '''
+        statics = (
+            self.query_one('#gpt-why-no',  Static), 
+            self.query_one('#gpt-why-yes', Static), 
+        )
         def append(index_: int, chunk: str) -> None:
-            if self.querying_id != querying_id:
+            if self.querying != querying:
                 return
             if self.gpt_reasons is None:
                 self.gpt_reasons = ['', '']
             self.gpt_reasons[index_] += chunk.replace('\n', ' ')
-            statics[index_].update(self.gpt_reasons[index_])
+            if self.gpt_reasons_revealed:
+                statics[index_].update(self.gpt_reasons[index_])
         
-        await self.arbiter.interrogate(
-            model=self.model_name, 
-            prompt=self.prompt_and_examples.render(
-                self.idToClassifiee(querying_id),
-            ),
-            callbackNo =functools.partial(append, 0),
-            callbackYes=functools.partial(append, 1),
-            max_tokens=self.interrogate_max_tokens,
-            question=self.interrogate_question,
-        )
+        try:
+            prepared = await self.prepareQueryOffLoop(querying)
+            if self.querying != querying:
+                return  # not paid yet
+            await self.arbiter.interrogate(
+                model=self.model_name, 
+                prompt=prepared.with_examples,
+                callbackNo =functools.partial(append, 0),
+                callbackYes=functools.partial(append, 1),
+                max_tokens=self.interrogate_max_tokens,
+                question=self.interrogate_question,
+                decisions=self.topTwoClasses(querying),
+                speculative=speculative,
+            )
+        except CircuitOpenError as e:
+            self.log(str(e))
+            if self.querying == querying and self.gpt_reasons_revealed:
+                until = time.strftime(
+                    '%H:%M:%S', time.localtime(time.time() + e.retry_after), 
+                )
+                statics[0].update(f'API paused until {until}.')
+                statics[1].update('')
+                # so that asking again retries
+                self.gpt_reasons_revealed = False
+        finally:
+            if self.interrogateTask is asyncio.current_task():
+                self.interrogateTask = None
     
     def action_toggle_pause(self) -> None:
         bOff = self.query_one('#off-radio', RadioButton)
@@ -398,75 +838,451 @@ class UI(App):
                 self.myUpdate()
     
     def arbitNext(self) -> bool:
-        assert self.all_ids is not None
         assert self.arbitTask is None
-        initial_cursor = self.cursor
-        while True:
-            id_ = self.all_ids[self.cursor]
-            annotations = self.persistent.get(id_)
-            if annotations.human_label_no_or_yes is not None:
-                self.persistent.set(id_, ItemAnnotations(
-                    gpt_verdict=float(annotations.human_label_no_or_yes),
-                    status=ItemStatus.Classified(),
-                    human_label_no_or_yes=annotations.human_label_no_or_yes,
-                ))
-                break
-            if annotations.status != ItemStatus.Classified():
-                break
-            self.cursor += 1
-            self.cursor %= len(self.all_ids)
-            if self.cursor == initial_cursor:
+        if self.work_queue is None:
+            next_ = self.nextIdFromCursor()
+            if next_ is None and not self.all_ids.ready(self.cursor + 1):
+                self.arbitTask = asyncio.create_task(self.drawThenArbitNext())
+                return True
+            if next_ is None:
                 self.onAllFinished()
                 return False
-        birthline = (
-            self.last_gpt_time + 1.0 / self.throttle_qps
-            if self.throttle_active else 0.0
+            id_, tracks = next_
+        else:
+            # leased in the task, off the event loop
+            id_ = None
+            tracks = [self.main_track]
+        breaker = self.arbiter.getCircuitBreaker()
+        if breaker is not None and breaker.isOpen():
+            self.pauseForBreaker(breaker.retryAfter())
+            return False
+        ledger = self.arbiter.getLedger()
+        if ledger is not None and ledger.wouldExceedBudget(sum(
+            max(
+                self.arbiter.getCostPerItem(), 
+                self.preflightCostPerItem(track) or 0.0, 
+            ) for track in tracks
+        )):
+            self.onBudgetExhausted()
+            return False
+        self.arbitTask = asyncio.create_task(
+            self.arbit(id_, tracks, birthline=self.nextBirthline())
+            if id_ is not None else 
+            self.arbitLeased(birthline=self.nextBirthline())
         )
-        self.arbitTask = asyncio.create_task(self.arbit(
-            id_, birthline=birthline,
-        ))
+        self.prefetchAhead()
         # self.log(f'task created with {birthline = }')
         return True
+    
+    async def drawThenArbitNext(self) -> None:
+        '''
+        Draws the next ids from the source in a worker thread, as it 
+        may be a slow iterator, e.g. over a database.  
+        '''
+        assert self.all_ids is not None
+        await asyncio.to_thread(
+            self.all_ids.at, self.cursor + self.prefetch_ahead * 4 + 1, 
+        )
+        self.arbitTask = None
+        if self.query_one('#off-radio', RadioButton).value:
+            return
+        self.arbitNext()
+    
+    async def arbitLeased(self, birthline: float) -> None:
+        '''
+        `arbit` on the next item leased from the work queue.  
+        '''
+        assert self.work_queue is not None
+        leased = await asyncio.to_thread(
+            self.work_queue.lease, self.worker_id, 1, self.lease_seconds, 
+        )
+        if not leased:
+            self.arbitTask = None
+            self.set_timer(1.0, self.retryArbitNext)
+            return
+        id_, = leased
+        await self.arbit(id_, [self.main_track], birthline)
+    
+    def nextBirthline(self) -> float:
+        '''
+        When the throttle allows the next API call.  
+        '''
+        return (
+            self.last_gpt_time + 1.0 / self.throttle_qps
+            if self.throttle_active else 0.0
+        )
+    
+    def pauseForBreaker(self, retry_after: float) -> None:
+        '''
+        Backpressure: no dispatch while the circuit breaker is open.  
+        '''
+        if self.work_queue is not None:
+            self.run_worker(
+                asyncio.to_thread(self.work_queue.release, self.worker_id), 
+            )
+        self.set_timer(max(retry_after, 1.0), self.retryArbitNext)
+        self.myUpdate()
+    
+    def retryArbitNext(self) -> None:
+        if self.arbitTask is not None:
+            return
+        if self.query_one('#on-radio', RadioButton).value:
+            self.arbitNext()
+    
+    def nextIdFromCursor(self) -> tuple[str, list[Track]] | None:
+        '''
+        Moves the cursor to the next item that needs judging, 
+        and returns it with the tracks that need it.  
+        `None` if all items are classified in all tracks, or if the 
+        cursor reached ids not drawn yet. Never draws.  
+        '''
+        assert self.all_ids is not None
+        initial_cursor = self.cursor
+        while True:
+            if not self.all_ids.ready(self.cursor + 1):
+                return None
+            id_ = self.all_ids.at(self.cursor)
+            if id_ is None:
+                return None
+            tracks: list[Track] = []
+            for track in self.tracks:
+                annotations = track.persistent.get(id_)
+                if annotations.human_label_no_or_yes is not None:
+                    label = annotations.human_label_no_or_yes
+                    track.persistent.set(id_, ItemAnnotations.fromProbs(
+                        [float(i == label) for i in range(len(track.class_names))],
+                        status=ItemStatus.Classified(),
+                        human_label_no_or_yes=label,
+                        is_binary=track.is_binary,
+                    ))
+                    tracks.append(track)
+                elif annotations.status != ItemStatus.Classified():
+                    tracks.append(track)
+            if tracks:
+                return id_, tracks
+            self.cursor = self.all_ids.nextIndex(self.cursor)
+            if self.cursor == initial_cursor:
+                return None
 
-    async def arbit(self, id_: str, birthline: float) -> None:
+    async def arbit(
+        self, id_: str, tracks: list[Track], birthline: float, 
+    ) -> None:
+        '''
+        Judges `id_` for each of `tracks` in turn. 
+        The throttle spaces out every API call, whichever the track.  
+        '''
         assert self.all_ids is not None
         try:
-            dt = birthline - time.time()
-            # self.log(f'{dt = }')
-            if dt > 0.0:
-                await asyncio.sleep(dt)
-            self.last_gpt_time = time.time()
-            # self.log('judging...')
-            result = await self.arbiter.judge(
-                model=self.model_name, 
-                prompt=self.prompt_and_examples.render(
-                    self.idToClassifiee(id_),
-                ),
-                max_tokens=1,
+            classifiee = await self.getClassifiee(id_)
+            pending: list[tuple[Track, str, PromptAndExamples, tp.Any]] = []
+            for track in tracks:
+                h = track.dedup.register(id_, classifiee)
+                prompt_and_examples = track.prompt_and_examples
+                pending.append((track, h, prompt_and_examples, track.dedup.lookup(
+                    h, prompt_and_examples.version, 
+                )))
+            rendered = await asyncio.to_thread(
+                self.renderForJudging, classifiee, [
+                    (track, prompt_and_examples) 
+                    for track, _, prompt_and_examples, probs in pending 
+                    if probs is None
+                ], 
             )
-            # self.log('judge ok.')
+            prompts = iter(rendered)
+            for track, h, prompt_and_examples, probs in pending:
+                version = prompt_and_examples.version
+                epoch = len(prompt_and_examples.examples)
+                if probs is None:
+                    prompt, saved_tokens = next(prompts)
+                    dt = birthline - time.time()
+                    # self.log(f'{dt = }')
+                    if dt > 0.0:
+                        await asyncio.sleep(dt)
+                    self.last_gpt_time = time.time()
+                    # self.log('judging...')
+                    probs = await self.judgeProbs(track, prompt, version)
+                    # self.log('judge ok.')
+                    self.compaction_saved_tokens += saved_tokens
+                    birthline = self.nextBirthline()
+                await self.recordVerdict(track, id_, h, version, epoch, probs)
         except asyncio.CancelledError:
             return
-        self.last_arbit_info = (self.persistent.get(id_), result)
-        self.persistent.set(id_, ItemAnnotations(
-            gpt_verdict=result,
-            status=ItemStatus.Classified(),
-            human_label_no_or_yes=None,
-        ))
-        self.cursor += 1
-        self.cursor %= len(self.all_ids)
+        except CircuitOpenError as e:
+            self.log(str(e))
+            self.arbitTask = None
+            self.pauseForBreaker(e.retry_after)
+            return
+        if self.all_ids.ready(self.cursor + 1):
+            # else `arbitNext` draws, and moves past this id then
+            self.cursor = self.all_ids.nextIndex(self.cursor)
         self.arbitTask = None
         self.myUpdate()
         if self.query_one('#off-radio', RadioButton).value:
             return
         # self.log("self.arbitNext()")
         self.arbitNext()
-        if self.selectQueryTask is None and self.querying_id is None:
+        if self.selectQueryTask is None and self.querying is None:
+            self.maybeStartSelectQuery()
+    
+    async def recordVerdict(
+        self, track: Track, id_: str, h: str, version: str, epoch: int, 
+        probs: tp.Sequence[float], 
+    ) -> None:
+        # a label may have landed during the call
+        distance = track.prompt_and_examples.versionDistance(version)
+        new_anno = ItemAnnotations.fromProbs(
+            probs, 
+            ItemStatus.Classified() if distance == 0 else 
+            ItemStatus.Outdated(distance or 1), 
+            is_binary=track.is_binary, prompt_version=version, 
+        )
+        result = new_anno.gpt_verdict
+        assert result is not None
+        if track is self.main_track:
+            self.last_arbit_info = (track.persistent.get(id_), result)
+        track.persistent.set(id_, new_anno)
+        committed = [id_]
+        if version == track.prompt_and_examples.version:
+            for other in track.dedup.record(h, version, tuple(probs)):
+                anno = track.persistent.get(other)
+                if (
+                    anno.human_label_no_or_yes is None and 
+                    anno.status != ItemStatus.Classified()
+                ):
+                    track.persistent.set(other, new_anno)
+                    committed.append(other)
+        if self.work_queue is not None:
+            await asyncio.to_thread(
+                self.commitToWorkQueue, committed, result, version, epoch, 
+            )
+    
+    def commitToWorkQueue(
+        self, ids: list[str], gpt_verdict: float, version: str, epoch: int, 
+    ) -> None:
+        '''
+        In a worker thread.  
+        '''
+        assert self.work_queue is not None
+        for id_ in ids:
+            self.work_queue.commit(
+                self.worker_id, id_, gpt_verdict, version, epoch, 
+            )
+    
+    async def judgeProbs(
+        self, track: Track, prompt: str, prompt_version: str | None = None, 
+    ) -> tp.Sequence[float]:
+        if track.is_binary:
+            p = await self.arbiter.judge(
+                model=self.model_name, 
+                prompt=prompt,
+                max_tokens=1,
+                prompt_version=prompt_version,
+            )
+            return (1 - p, p)
+        return await self.arbiter.judgeMulti(
+            model=self.model_name, 
+            prompt=prompt,
+            classes=track.class_names,
+            max_tokens=1,
+            prompt_version=prompt_version,
+        )
+    
+    def prefetchAhead(self) -> None:
+        '''
+        Fetches classifiees of the next items the judging loop will visit.
+        '''
+        assert self.all_ids is not None
+        ahead: list[str] = []
+        for offset in range(self.prefetch_ahead * 4):
+            if not self.all_ids.ready(self.cursor + offset):
+                break
+            id_ = self.all_ids.at(self.cursor + offset)
+            if id_ is None:
+                break
+            if any(track.needsJudging(id_) for track in self.tracks):
+                ahead.append(id_)
+                if len(ahead) >= self.prefetch_ahead:
+                    break
+        self.classifiees.prefetch(ahead)
+    
+    def publishPromptVersion(self) -> None:
+        assert self.work_queue is not None
+        prompt_and_examples = self.main_track.prompt_and_examples
+        self.work_queue.publish(
+            prompt_and_examples.version, 
+            len(prompt_and_examples.examples), 
+        )
+    
+    def labelInWorkQueue(self, id_: str, label: int) -> None:
+        '''
+        In a worker thread.  
+        '''
+        assert self.work_queue is not None
+        self.work_queue.label(id_, label)
+        self.publishPromptVersion()
+    
+    async def heartbeatWorkQueue(self) -> None:
+        '''
+        Keeps the lease of the item being judged.  
+        '''
+        assert self.work_queue is not None
+        await asyncio.to_thread(
+            self.work_queue.heartbeat, self.worker_id, self.lease_seconds, 
+        )
+    
+    async def syncWorkQueue(self) -> None:
+        '''
+        Pulls verdicts committed by other workers into `self.persistent`.  
+        '''
+        assert self.work_queue is not None
+        changes, self.work_queue_seq = await asyncio.to_thread(
+            self.work_queue.changesSince, self.work_queue_seq, 
+        )
+        prompt_and_examples = self.main_track.prompt_and_examples
+        version = prompt_and_examples.version
+        epoch = len(prompt_and_examples.examples)
+        for change in changes:
+            if change.gpt_verdict is None or change.judged_epoch is None:
+                continue
+            anno = self.persistent.get(change.id_)
+            if anno.human_label_no_or_yes is not None:
+                continue
+            status = (
+                ItemStatus.Classified() 
+                if change.judged_version == version else 
+                ItemStatus.Outdated(max(epoch - change.judged_epoch, 1))
+            )
+            self.persistent.set(change.id_, ItemAnnotations(
+                gpt_verdict=change.gpt_verdict,
+                status=status,
+                human_label_no_or_yes=None,
+                prompt_version=change.judged_version,
+            ))
+        if not changes:
+            return
+        self.myUpdate()
+        if self.selectQueryTask is None and self.querying is None:
             self.maybeStartSelectQuery()
     
     def onAllFinished(self) -> None:
         self.exit(message='All items have been classified.')
     
+    def selectExamples(
+        self, prompt_and_examples: PromptAndExamples, classifiee: Classifiee, 
+    ) -> list[QAPair]:
+        if self.example_selector is None or self.example_budget_tokens is None:
+            return prompt_and_examples.examples
+        return self.example_selector.select(
+            prompt_and_examples.examples, classifiee, 
+            self.example_budget_tokens, tuple(prompt_and_examples.classes), 
+            prompt_and_examples.compactedExample, 
+        )
+    
+    def renderPrompt(
+        self, prompt_and_examples: PromptAndExamples, classifiee: Classifiee, 
+        omit_examples: bool = False, 
+    ) -> str:
+        '''
+        Compacts, selects examples and renders. For a long classifiee, 
+        that takes long: call it in a worker thread.  
+        '''
+        return prompt_and_examples.render(
+            classifiee, omit_examples=omit_examples, 
+            examples=None if omit_examples else self.selectExamples(
+                prompt_and_examples, classifiee, 
+            ), 
+        )
+    
+    def renderForJudging(
+        self, classifiee: Classifiee, 
+        snapshots: list[tuple[Track, PromptAndExamples]], 
+    ) -> list[tuple[str, int]]:
+        '''
+        In a worker thread. Per track, the prompt and the input tokens 
+        compaction saved.  
+        '''
+        n_classifiee_tokens = self.classifiee_token_stats.add(classifiee)
+        return [
+            (
+                self.renderPrompt(prompt_and_examples, classifiee), 
+                self.compactionSavings(track, n_classifiee_tokens), 
+            )
+            for track, prompt_and_examples in snapshots
+        ]
+    
+    def tokenProfile(self, track: Track) -> PromptTokenProfile:
+        if (
+            track.token_profile is None or 
+            track.token_profile[0] is not track.prompt_and_examples
+        ):
+            track.token_profile = (
+                track.prompt_and_examples, 
+                PromptTokenProfile.of(
+                    track.prompt_and_examples, 
+                    self.selectExamples(track.prompt_and_examples, ''), 
+                ), 
+            )
+        return track.token_profile[1]
+    
+    def preflightCostPerItem(self, track: Track) -> float | None:
+        '''
+        Projected from the rendered prompt size, not from past responses.
+        '''
+        pricing = PRICING.get(self.model_name)
+        mean_classifiee = self.classifiee_token_stats.mean()
+        if pricing is None or mean_classifiee is None:
+            return None
+        compaction = track.prompt_and_examples.compaction
+        if (
+            compaction is not None and 
+            compaction.classifiee_budget_tokens is not None
+        ):
+            mean_classifiee = min(
+                mean_classifiee, compaction.classifiee_budget_tokens, 
+            )
+        return pricing.estimateFromCounts(
+            self.tokenProfile(track).fixed + mean_classifiee, 1, 
+        )
+    
+    def compactionSavings(self, track: Track, n_classifiee_tokens: int) -> int:
+        '''
+        Input tokens one judgment saved by compaction. Of the classifiee, 
+        only what truncation cut counts.  
+        '''
+        compaction = track.prompt_and_examples.compaction
+        if compaction is None:
+            return 0
+        saved = self.tokenProfile(track).saved
+        if compaction.classifiee_budget_tokens is not None:
+            saved += max(
+                n_classifiee_tokens - compaction.classifiee_budget_tokens, 0, 
+            )
+        return saved
+    
+    def marginalCostPerExample(self, n_items: int) -> float | None:
+        '''
+        What one more `QAPair` in the prompt costs over `n_items` judgments.
+        '''
+        pricing = PRICING.get(self.model_name)
+        if pricing is None:
+            return None
+        return n_items * pricing.estimateFromCounts(
+            self.tokenProfile(self.main_track).meanPerExample(), 0, 
+        )
+    
+    def samplePreflightClassifiees(self) -> None:
+        assert self.all_ids is not None
+        for id_ in self.all_ids.sample(self.preflight_sample_size):
+            self.classifiee_token_stats.add(self.classifiees.get(id_))
+        self.call_from_thread(self.myUpdate)
+    
+    def onBudgetExhausted(self) -> None:
+        self.query_one('#off-radio', RadioButton).value = True
+        self.notify(
+            'Budget cap reached. Judging paused.', 
+            severity='warning', 
+        )
+    
     def modifyThrottle(self, delta: float) -> None:
         self.throttle_qps *= math.exp(delta * .5)
     
@@ -511,12 +1327,90 @@ class UI(App):
         )
     
     def on_mount(self) -> None:
+        if self.work_queue is not None:
+            self.publishPromptVersion()
+            self.set_interval(1.0, self.syncWorkQueue)
+            self.set_interval(self.lease_seconds / 3, self.heartbeatWorkQueue)
+        if self.labeling_port is not None:
+            self.labeling_server = LabelingServer(
+                self, self.labeling_host, self.labeling_port, 
+            )
+            self.labeling_server.start()
+        if self.warm_up_connections > 0:
+            self.warmUpTask = asyncio.create_task(
+                self.arbiter.warmUp(self.warm_up_connections), 
+            )
+        histogram: Histogram = self.query_one('#decisions-histogram', Histogram)
+        visited = self.persistent.items()
+        histogram.data = [
+            anno.gpt_verdict for _, anno in visited
+            if isHistogrammed(anno)
+        ]
+        for track in self.tracks:
+            track.countClassified()
+            track.persistent.observe(track.onAnnotationChanged)
+        stackedBar: StackedBar = self.query_one('#stacked-bar', StackedBar)
+        assert self.all_ids is not None
+        stackedBar.data = self.all_ids.symbols()
+        shareBar = None
+        if not self.main_track.is_binary:
+            shareBar = self.query_one('#decisions-share', ShareBar)
+            for _, anno in visited:
+                if isHistogrammed(anno):
+                    shareBar.add(anno.decision())
+        self.persistent.observe(functools.partial(
+            self.onAnnotationChanged, histogram, stackedBar, shareBar, 
+        ))
         self.maybeStartSelectQuery()
+        self.preflightTask = asyncio.create_task(
+            asyncio.to_thread(self.samplePreflightClassifiees), 
+        )
         self.updateThrottleDisplay()
         self.myUpdate()
         onOff: RadioSet = self.query_one('#on-off', RadioSet)
         onOff.focus()
     
+    def growStackedBar(self, stackedBar: StackedBar) -> None:
+        '''
+        The queue grows, e.g. when the source size is unknown, by ids 
+        drawn at the end of the drawn ones. Only those are inserted.  
+        '''
+        assert self.all_ids is not None
+        grown = len(self.all_ids) - stackedBar.length
+        if grown == 0:
+            return
+        if grown < 0:
+            stackedBar.data = self.all_ids.symbols()
+            return
+        n_drawn = len(self.all_ids.drawn)
+        stackedBar.insert(
+            n_drawn - grown, self.all_ids.symbols()[n_drawn - grown:n_drawn], 
+        )
+    
+    def onAnnotationChanged(
+        self, histogram: Histogram, stackedBar: StackedBar, 
+        shareBar: ShareBar | None, 
+        id_: str, old: ItemAnnotations, new: ItemAnnotations, 
+    ) -> None:
+        assert self.all_ids is not None
+        old_symbol = old.status.getSymbol()
+        new_symbol = new.status.getSymbol()
+        if old_symbol != new_symbol:
+            self.growStackedBar(stackedBar)
+            position = self.all_ids.position(id_)
+            if position is not None and position < stackedBar.length:
+                stackedBar.move(position, old_symbol, new_symbol)
+        if isHistogrammed(old):
+            assert old.gpt_verdict is not None
+            histogram.remove(old.gpt_verdict)
+            if shareBar is not None:
+                shareBar.remove(old.decision())
+        if isHistogrammed(new):
+            assert new.gpt_verdict is not None
+            histogram.add(new.gpt_verdict)
+            if shareBar is not None:
+                shareBar.add(new.decision())
+    
     def myUpdate(self) -> None:
         assert self.all_ids is not None
         sModelName: Static = self.query_one('#model-name', Static)
@@ -524,96 +1418,113 @@ class UI(App):
         self.onYesNoChanged()
         switcherQuery: ContentSwitcher = self.query_one('#query-switcher', ContentSwitcher)
         switcherQuery.current = (
-            'query-empty' if self.querying_id is None else 
+            'query-empty' if self.querying is None else 
             'query-section'
         )
-        if self.querying_id is not None:
+        if self.querying is not None:
+            track_i, querying_id = self.querying
+            track = self.tracks[track_i]
             sQueryURL: Link = self.query_one('#query-url', Link)
-            url = 'youtu.be/' + self.querying_id
+            url = 'youtu.be/' + querying_id
             sQueryURL.update(url)
             sQueryURL.url = 'https://' + url
 
-            classifiee = self.idToClassifiee(self.querying_id)
+            prepared = self.preparedForDisplay(self.querying)
             sQueryTextClassifiee: Static = self.query_one(
                 '#query-text-classifiee', Static, 
             )
-            sQueryTextClassifiee.update(classifiee)
+            sQueryTextClassifiee.update(prepared.classifiee)
             sQueryWithPrompt: Static = self.query_one(
                 '#query-with-prompt', Static, 
             )
-            sQueryWithPrompt.update(
-                self.prompt_and_examples.render(
-                    classifiee, omit_examples=True, 
-                )
-            )
+            sQueryWithPrompt.update(prepared.with_prompt)
             sQueryWithExamples: Static = self.query_one(
                 '#query-with-examples', Static, 
             )
-            sQueryWithExamples.update(
-                self.prompt_and_examples.render(
-                    classifiee, omit_examples=False, 
-                )
-            )
+            sQueryWithExamples.update(prepared.with_examples)
 
-            anno = self.persistent.get(self.querying_id)
+            anno = track.persistent.get(querying_id)
             sStaleDisplay: Static = self.query_one('#staleness-display', Static)
             sStaleDisplay.update(str(anno.status.staleness))
             assert anno.gpt_verdict is not None
             sNo:  Static = self.query_one('#gpt-no-response',  Static)
             sYes: Static = self.query_one('#gpt-yes-response', Static)
-            sNo.update(
-                f'GPT said "No" ({1 - anno.gpt_verdict:.1%}).'
-            )
-            sYes.update(
-                f'GPT said "Yes" ({anno.gpt_verdict:.1%}).'
-            )
+            probs = anno.probs()
+            for static, class_ in zip(
+                (sNo, sYes), self.topTwoClasses(self.querying), 
+            ):
+                p = probs[track.class_names.index(class_)]
+                static.update(escape(f'GPT said "{class_}" ({p:.1%}).'))
         switcherWhy: ContentSwitcher = self.query_one('#gpt-why-switcher', ContentSwitcher)
         switcherWhy.current = (
-            'ask-why-btn' if self.gpt_reasons is None else 
-            'gpt-why-response'
+            'gpt-why-response' if self.gpt_reasons_revealed else 
+            'ask-why-btn'
         )
-        if self.gpt_reasons is not None:
+        if self.gpt_reasons_revealed and self.gpt_reasons is not None:
             sWhyNo:  Static = self.query_one('#gpt-why-no',  Static)
             sWhyYes: Static = self.query_one('#gpt-why-yes', Static)
             sWhyNo.update(self.gpt_reasons[0])
             sWhyYes.update(self.gpt_reasons[1])
+        classified = self.main_track.n_classified
+        n_remaining = len(self.all_ids) - classified
+        remaining_of = {
+            track.name: len(self.all_ids) - track.n_classified 
+            for track in self.tracks
+        }
+        n_remaining_judgments = sum(remaining_of.values())
         sCost: Static = self.query_one('#cost-display', Static)
+        preflights = [self.preflightCostPerItem(t) for t in self.tracks]
         estimated_total = format(
-            self.arbiter.getCostPerItem() * len(self.all_ids),
+            self.arbiter.getCostPerItem() * len(self.all_ids) * len(self.tracks)
+            if None in preflights else 
+            self.arbiter.getRunningCost() + sum(
+                preflight * remaining_of[track.name] 
+                for preflight, track in zip(preflights, self.tracks)
+            ),
             '.2f',
         )
         running = format(
             self.arbiter.getRunningCost(),
             f'{len(estimated_total)}.2f',
         )
-        sCost.update(f'''
+        cost_text = f'''
 [u]$ {running}[/u]
 $ {estimated_total}
-'''.strip(), layout=True)
+'''.strip()
+        marginal = self.marginalCostPerExample(n_remaining)
+        if marginal is not None:
+            cost_text += f'\n+$ {marginal:.2f} / ex'
+        ledger = self.arbiter.getLedger()
+        if ledger is not None:
+            remaining = ledger.projectRemaining(
+                self.model_name, n_remaining_judgments, 
+            )
+            cost_text += f'\nΣ $ {ledger.totalUSD():.2f}'
+            if ledger.budget_USD is not None:
+                cost_text += f' / {ledger.budget_USD:.2f}'
+            cost_text += f'\n→ $ {remaining:.2f}'
+        speculative = self.arbiter.getSpeculativeCost()
+        if speculative > 0.0:
+            cost_text += f'\n? $ {speculative:.2f} spec'
+        hedge_stats = self.arbiter.getHedgeStats()
+        if hedge_stats is not None and hedge_stats.n_hedged > 0:
+            cost_text += (
+                f'\n2x $ {hedge_stats.extra_USD:.2f}'
+                f' -{hedge_stats.saved_seconds:.0f}s'
+            )
+        if self.compaction_saved_tokens > 0:
+            pricing = PRICING.get(self.model_name)
+            cost_text += f'\n✂ -{self.compaction_saved_tokens / 1000:.0f}k tok'
+            if pricing is not None:
+                cost_text += ' -$ {:.2f}'.format(pricing.estimateFromCounts(
+                    self.compaction_saved_tokens, 0, 
+                ))
+        sCost.update(cost_text, layout=True)
         stackedBar: StackedBar = self.query_one('#stacked-bar', StackedBar)
-        stackedBar.data = ''.join(
-            self.persistent.get(id_).status.getSymbol()
-            for id_ in self.all_ids
-        )
+        self.growStackedBar(stackedBar)
         stackedBar.data_cursor = self.cursor
-        histogram: Histogram = self.query_one('#decisions-histogram', Histogram)
-        new_data = []
-        for id_ in self.all_ids:
-            anno = self.persistent.get(id_)
-            if anno.status == ItemStatus.Unvisited():
-                continue
-            if anno.human_label_no_or_yes is not None:
-                continue
-            p = anno.gpt_verdict
-            assert p is not None
-            new_data.append(p)
-        histogram.data = new_data
         cProgressBox: Container = self.query_one('#progress-box', Container)
         total = len(self.all_ids)
-        classified = sum(
-            1 for id_ in self.all_ids
-            if self.persistent.get(id_).status == ItemStatus.Classified()
-        )
         is_even = classified % 2 == 0
         opening = '' if is_even else '[#000 on #ddd]'
         closing = '' if is_even else '[/]'
@@ -627,13 +1538,46 @@ $ {estimated_total}
                 case _:
                     last_k = str(last_anno.status.staleness)
             last_p = last_anno.gpt_verdict
-            assert last_p is not None
-            delta = new_verdict - last_p
-            last_info = f'Last: k={last_k} p={last_p:.0%}{delta:+.0%}. '
-        cProgressBox.border_subtitle = last_info + progress
+            if last_p is None:
+                last_info = f'Last: k={last_k} p={new_verdict:.0%}. '
+            else:
+                delta = new_verdict - last_p
+                last_info = f'Last: k={last_k} p={last_p:.0%}{delta:+.0%}. '
+        dedup_info = ''
+        n_saved_calls = sum(t.dedup.n_saved_calls for t in self.tracks)
+        if n_saved_calls:
+            dedup_info = (
+                f'Dup: {self.main_track.dedup.dedupRatio():.0%} '
+                f'({n_saved_calls} saved). '
+            )
+        tracks_info = ''.join(
+            f'{track.name}: {track.n_classified}. '
+            for track in self.tracks[1:]
+        )
+        breaker_info = ''
+        breaker = self.arbiter.getCircuitBreaker()
+        if breaker is not None and (breaker.n_retries or breaker.n_trips):
+            breaker_info = f'API: {breaker.summary()}. '
+            if breaker.isOpen():
+                breaker_info = (
+                    f'[#000 on #f80]API paused {breaker.retryAfter():.0f}s[/] '
+                    + breaker_info
+                )
+        connection_stats = self.arbiter.getConnectionStats()
+        if connection_stats is not None and connection_stats.n_requests:
+            breaker_info += f'Conn: {connection_stats.reuseRate():.0%} reused. '
+        cProgressBox.border_subtitle = (
+            last_info + dedup_info + breaker_info + tracks_info + progress
+        )
         # self.refresh(repaint=True)    # somehow mitigates the log interruption issue (#1) but makes the issue opaque
     
     def exit(self, result=None, return_code=None, message=None) -> None:
         if self.arbitTask is not None:
             self.arbitTask.cancel()
+        self.classifiees.shutdown()
+        ledger = self.arbiter.getLedger()
+        if ledger is not None:
+            ledger.save()
+        if self.labeling_server is not None:
+            self.labeling_server.stop()
         return super().exit(result, return_code, message)
@@ -2,5 +2,20 @@ from .UI import UI as ArbiterHiLUI
 from .arbiter_dummy import ArbiterDummy
 from .arbiter_gpt import ArbiterGPT
 from .openai_client import initClients
+from .cost_ledger import CostLedger
+from .interrogation_cache import InterrogationCache
+from .hedging import Hedger
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .connection_stats import ConnectionStats
+from .work_queue import WorkQueue
+from .headless_worker import HeadlessWorker
+from .track import Track
+from .persistent_memmap import MemmapPersistent
+from .telemetry import Telemetry
 
-__all__ = ["ArbiterHiLUI", "ArbiterDummy", "ArbiterGPT", "initClients"]
+__all__ = [
+    "ArbiterHiLUI", "ArbiterDummy", "ArbiterGPT", "initClients", 
+    "CostLedger", "InterrogationCache", "Hedger", "CircuitBreaker", 
+    "CircuitOpenError", "ConnectionStats", "WorkQueue", "HeadlessWorker",
+    "Track", "MemmapPersistent", "Telemetry",
+]
@@ -2,22 +2,35 @@ import typing as tp
 import random
 import asyncio
 
+from .shared import NO_OR_YES
 from .arbiter_interface import ArbiterInterface
 
 class ArbiterDummy(ArbiterInterface):
     async def judge(
         self, model: str, prompt: str, 
         max_tokens: int,
+        prompt_version: str | None = None,
     ) -> float:
         await asyncio.sleep(0.1)
         return random.random()
     
+    async def judgeMulti(
+        self, model: str, prompt: str, classes: tp.Sequence[str], 
+        max_tokens: int = 1,
+        prompt_version: str | None = None,
+    ) -> list[float]:
+        await asyncio.sleep(0.1)
+        weights = [random.expovariate(1.0) for _ in classes]
+        return [w / sum(weights) for w in weights]
+    
     async def interrogate(
         self, model: str, prompt: str, 
         callbackNo:  tp.Callable[[str], None],
         callbackYes: tp.Callable[[str], None],
         max_tokens: int,
         question: str,
+        speculative: bool = False,
+        decisions: tp.Sequence[str] = NO_OR_YES,
     ) -> None:
         callbackYes("Because I said so.")
 
@@ -1,4 +1,6 @@
 import asyncio
+import threading
+import time
 from datetime import timedelta
 import typing as tp
 
@@ -15,6 +17,16 @@ from cachier import cachier
 from .shared import NO_OR_YES
 from .arbiter_interface import ArbiterInterface
 from .pricing import PRICING
+from .cost_ledger import CostLedger
+from .interrogation_cache import InterrogationCache
+from .hedging import Hedger, HedgeStats
+from .circuit_breaker import CircuitBreaker
+from .connection_stats import ConnectionStats, warmUpSync, warmUpAsync
+from .telemetry import (
+    Telemetry, retriesInThisThread, resetRetriesInThisThread, 
+)
+
+T = tp.TypeVar('T')
 
 class ArbiterGPT(ArbiterInterface):
     def __init__(
@@ -22,50 +34,141 @@ class ArbiterGPT(ArbiterInterface):
         client: OpenAI, 
         asyncClient: AsyncOpenAI, 
         cache_stale_after: timedelta = timedelta(weeks=6),
+        ledger: CostLedger | None = None,
+        interrogation_cache: InterrogationCache | None = None,
+        hedger: Hedger | None = None,
+        breaker: CircuitBreaker | None = None,
+        connection_stats: ConnectionStats | None = None,
+        telemetry: Telemetry | None = None,
     ):
         '''
-        `cache_stale_after` can be `timedelta.max` if `model` in `self.judge()` will always point to a specific checkpoint.
+        `cache_stale_after` can be `timedelta.max` if `model` in `self.judge()` will always point to a specific checkpoint.  
+        `ledger` persists spend across sessions and tells cache hits apart.  
+        `interrogation_cache` replays earlier "Ask GPT why" responses.  
+        `hedger` duplicates slow judge calls, e.g. slower than p95.  
+        `breaker`: the one passed to `initClients()`, so that the UI 
+        can pause dispatch while it is open.  
+        `connection_stats`: the one passed to `initClients()`.  
+        `telemetry` records tokens, latency, retries and cache hits of 
+        every judgment.  
         '''
         self.client = client
         self.asyncClient = asyncClient
+        self.ledger = ledger
+        self.interrogation_cache = interrogation_cache
+        self.hedger = hedger
+        self.breaker = breaker
+        self.connection_stats = connection_stats
+        self.telemetry = telemetry
+        self.local = threading.local()
     
         c = cachier(separate_files=True, stale_after=cache_stale_after)
         j = c(self.judgeSync)
         self.judgeSync = j   # type: ignore
+        jm = c(self.judgeMultiSync)
+        self.judgeMultiSync = jm   # type: ignore
 
         self.running_cost = 0.0
+        self.speculative_cost = 0.0
         self.unit_cost = 0.0
     
     async def judge(
         self, model: str, prompt: str, 
         max_tokens: int = 1,
+        prompt_version: str | None = None,
     ) -> float:
         '''
         `max_tokens` can be larger if you want to debug by knowing what it wants to say.
         '''
         return await asyncio.to_thread(
-            self.judgeSync, model, prompt, max_tokens, 
+            self.judgeSyncCounted, model, prompt, max_tokens, prompt_version, 
         )
     
-    def judgeSync(
+    def judgeSyncCounted(
         self, model: str, prompt: str, 
         max_tokens: int = 1,
+        prompt_version: str | None = None,
     ) -> float:
+        return self.counted(model, prompt_version, lambda: self.judgeSync(
+            model, prompt, max_tokens, 
+        ))
+    
+    def counted(
+        self, model: str, prompt_version: str | None, 
+        call: tp.Callable[[], T], 
+    ) -> T:
+        '''
+        Tells cache hits apart for the ledger, and records telemetry.
+        '''
+        self.local.did_call_api = False
+        self.local.usage = None
+        self.local.USD = 0.0
+        self.local.n_retries = 0
+        start = time.monotonic()
+        result = call()
+        latency = time.monotonic() - start
+        if not self.local.did_call_api and self.ledger is not None:
+            self.ledger.recordCacheHit(model)
+        if self.telemetry is not None:
+            usage = self.local.usage
+            details = None if usage is None else usage.prompt_tokens_details
+            self.telemetry.record(
+                model, prompt_version, 
+                input_tokens=0 if usage is None else usage.prompt_tokens, 
+                cached_tokens=(
+                    0 if details is None else details.cached_tokens or 0
+                ), 
+                output_tokens=0 if usage is None else usage.completion_tokens, 
+                latency=latency, 
+                n_retries=self.local.n_retries, 
+                cache_hit=not self.local.did_call_api, 
+                USD=self.local.USD, 
+            )
+        return result
+    
+    def complete(
+        self, model: str, prompt: str, max_tokens: int, top_logprobs: int, 
+    ) -> ChatCompletion:
         history = [ChatCompletionUserMessageParam(
             content=prompt, 
             role='user', 
         )]
-        response: ChatCompletion = self.client.chat.completions.create(
-            model=model, 
-            messages=history, 
-            max_tokens=max_tokens,
-            temperature=0,    # should be inconsequential. 
-            logprobs=True,
-            top_logprobs=5,
-        )
+        def create() -> tuple[ChatCompletion, int]:
+            # under a hedger, this runs in one of its threads. 
+            # So the retries travel back with the response. 
+            resetRetriesInThisThread()
+            response = self.client.chat.completions.create(
+                model=model, 
+                messages=history, 
+                max_tokens=max_tokens,
+                temperature=0,    # should be inconsequential. 
+                logprobs=True,
+                top_logprobs=top_logprobs,
+            )
+            return response, retriesInThisThread()
+        if self.hedger is None:
+            response, n_retries = create()
+        else:
+            response, n_retries = self.hedger.call(
+                create, lambda loser: self.recordHedgeUsage(model, loser[0]), 
+            )
         assert isinstance(response, ChatCompletion) # for static type
-        self.unit_cost = PRICING[model].estimate(response.usage)
+        self.local.did_call_api = True
+        self.local.n_retries = n_retries
+        if self.ledger is None:
+            self.unit_cost = PRICING[model].estimate(response.usage)
+        else:
+            self.unit_cost = self.ledger.recordUsage(model, response.usage)
+        self.local.usage = response.usage
+        self.local.USD = self.unit_cost
         self.running_cost += self.unit_cost
+        return response
+    
+    def judgeSync(
+        self, model: str, prompt: str, 
+        max_tokens: int = 1,
+    ) -> float:
+        response = self.complete(model, prompt, max_tokens, top_logprobs=5)
         choice = response.choices[0]
         lp = choice.logprobs
         assert lp is not None
@@ -82,6 +185,62 @@ class ArbiterGPT(ArbiterInterface):
             print(f'{c[0].top_logprobs = }')
             assert False
         return yes / (yes + no)
+    
+    async def judgeMulti(
+        self, model: str, prompt: str, classes: tp.Sequence[str], 
+        max_tokens: int = 1,
+        prompt_version: str | None = None,
+    ) -> list[float]:
+        return await asyncio.to_thread(
+            self.judgeMultiSyncCounted, model, prompt, tuple(classes), 
+            max_tokens, prompt_version, 
+        )
+    
+    def judgeMultiSyncCounted(
+        self, model: str, prompt: str, classes: tuple[str, ...], 
+        max_tokens: int = 1,
+        prompt_version: str | None = None,
+    ) -> list[float]:
+        return self.counted(model, prompt_version, lambda: self.judgeMultiSync(
+            model, prompt, classes, max_tokens, 
+        ))
+    
+    def judgeMultiSync(
+        self, model: str, prompt: str, classes: tuple[str, ...], 
+        max_tokens: int = 1,
+    ) -> list[float]:
+        '''
+        Reads class probabilities from the first output token. 
+        Tokens are matched ignoring surrounding whitespace.
+        '''
+        response = self.complete(
+            model, prompt, max_tokens, 
+            top_logprobs=min(20, len(classes) + 5), 
+        )
+        lp = response.choices[0].logprobs
+        assert lp is not None
+        c = lp.content
+        assert c is not None
+        probs = [0.0] * len(classes)
+        for top in c[0].top_logprobs:
+            try:
+                i = classes.index(top.token.strip())
+            except ValueError:
+                continue
+            probs[i] += float(np.exp(top.logprob))
+        total = sum(probs)
+        if total == 0:
+            print(f'{c[0].top_logprobs = }')
+            assert False
+        return [p / total for p in probs]
+
+    def recordHedgeUsage(self, model: str, loser: ChatCompletion) -> float:
+        if self.ledger is None:
+            cost = PRICING[model].estimate(loser.usage)
+        else:
+            cost = self.ledger.recordUsage(model, loser.usage, kind='hedge')
+        self.running_cost += cost
+        return cost
 
     async def interrogate(
         self, model: str, prompt: str, 
@@ -89,8 +248,22 @@ class ArbiterGPT(ArbiterInterface):
         callbackYes: tp.Callable[[str], None],
         max_tokens: int,
         question: str,
+        speculative: bool = False,
+        decisions: tp.Sequence[str] = NO_OR_YES,
     ) -> None:
+        kind = 'speculative' if speculative else 'interrogate'
+        cache = self.interrogation_cache
         async def f(decision: str, callback: tp.Callable[[str], None]) -> None:
+            key = None
+            if cache is not None:
+                key = cache.key(model, prompt, question, decision, max_tokens)
+                cached = cache.get(key)
+                if cached is not None:
+                    if self.ledger is not None:
+                        self.ledger.recordCacheHit(model, kind=kind)
+                    callback(cached)
+                    return
+            response: list[str] = []
             history = [
                 ChatCompletionUserMessageParam(
                     content=prompt, 
@@ -116,17 +289,29 @@ class ArbiterGPT(ArbiterInterface):
                 ),
             ):
                 assert isinstance(chunk, ChatCompletionChunk)
-                self.running_cost += PRICING[model].estimate(
-                    chunk.usage, # empty except last
-                )
+                if self.ledger is None:
+                    cost = PRICING[model].estimate(
+                        chunk.usage, # empty except last
+                    )
+                else:
+                    cost = self.ledger.recordUsage(
+                        model, chunk.usage, kind=kind, 
+                    )
+                self.running_cost += cost
+                if speculative:
+                    self.speculative_cost += cost
                 try:
                     choice = chunk.choices[0]
                 except IndexError:  # meta, e.g. last chunk with usage
                     continue
-                callback(choice.delta.content or '')
+                content = choice.delta.content or ''
+                response.append(content)
+                callback(content)
+            if cache is not None and key is not None:
+                cache.put(key, ''.join(response))
         
         await asyncio.gather(*[
-            f(decision, callback) for decision, callback in zip(NO_OR_YES, (
+            f(decision, callback) for decision, callback in zip(decisions, (
                 callbackNo, 
                 callbackYes, 
             ))
@@ -137,6 +322,30 @@ class ArbiterGPT(ArbiterInterface):
     
     def getCostPerItem(self) -> float:
         return self.unit_cost
+    
+    def getSpeculativeCost(self) -> float:
+        return self.speculative_cost
+    
+    def getCircuitBreaker(self) -> CircuitBreaker | None:
+        return self.breaker
+    
+    def getConnectionStats(self) -> ConnectionStats | None:
+        return self.connection_stats
+    
+    async def warmUp(self, n_connections: int) -> None:
+        await asyncio.gather(
+            asyncio.to_thread(warmUpSync, self.client, n_connections), 
+            # interrogation streams two completions at once
+            warmUpAsync(self.asyncClient, 2), 
+        )
+    
+    def getHedgeStats(self) -> HedgeStats | None:
+        if self.hedger is None:
+            return None
+        return self.hedger.stats
+    
+    def getLedger(self) -> CostLedger | None:
+        return self.ledger
 
 def test():
     client = OpenAI()
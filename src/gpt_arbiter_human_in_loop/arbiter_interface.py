@@ -1,14 +1,34 @@
 import typing as tp
 from abc import ABC, abstractmethod
 
+from .shared import NO_OR_YES
+
+from .cost_ledger import CostLedger
+from .hedging import HedgeStats
+from .circuit_breaker import CircuitBreaker
+from .connection_stats import ConnectionStats
+
 class ArbiterInterface(ABC):
     @abstractmethod
     async def judge(
         self, model: str, prompt: str, 
         max_tokens: int,
+        prompt_version: str | None = None,
     ) -> float:
         '''
         `max_tokens` can be larger if you want to debug by knowing what it wants to say.
+        `prompt_version`: only for telemetry.
+        '''
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def judgeMulti(
+        self, model: str, prompt: str, classes: tp.Sequence[str], 
+        max_tokens: int = 1,
+        prompt_version: str | None = None,
+    ) -> list[float]:
+        '''
+        K-way. Returns a probability per class.
         '''
         raise NotImplementedError
     
@@ -19,7 +39,15 @@ class ArbiterInterface(ABC):
         callbackYes: tp.Callable[[str], None],
         max_tokens: int,
         question: str,
+        speculative: bool = False,
+        decisions: tp.Sequence[str] = NO_OR_YES,
     ) -> None:
+        '''
+        `speculative`: started before the human asked for it. 
+        Its cost is tracked separately.
+        `decisions`: the two decisions to ask about. `callbackNo` gets 
+        the rationale for `decisions[0]`, `callbackYes` for `decisions[1]`.
+        '''
         raise NotImplementedError
     
     @abstractmethod
@@ -35,3 +63,40 @@ class ArbiterInterface(ABC):
         Returns the recent cost per item in USD.
         '''
         raise NotImplementedError
+
+    def getSpeculativeCost(self) -> float:
+        '''
+        Returns the part of the running cost spent on speculative 
+        interrogations.
+        '''
+        return 0.0
+
+    def getCircuitBreaker(self) -> CircuitBreaker | None:
+        '''
+        Returns the circuit breaker guarding the API, if any.
+        '''
+        return None
+
+    def getConnectionStats(self) -> ConnectionStats | None:
+        '''
+        Returns HTTP connection reuse stats, if instrumented.
+        '''
+        return None
+
+    async def warmUp(self, n_connections: int) -> None:
+        '''
+        Opens connections before the judging loop starts.
+        '''
+        return
+
+    def getHedgeStats(self) -> HedgeStats | None:
+        '''
+        Returns request hedging stats, if hedging is on.
+        '''
+        return None
+
+    def getLedger(self) -> CostLedger | None:
+        '''
+        Returns the persistent cost ledger, if any.
+        '''
+        return None
@@ -0,0 +1,136 @@
+'''
+A circuit breaker shared by all calls through one pair of clients.
+
+- Closed: calls go through. Outcomes of the last `window` calls are kept.
+- Open: once the error rate reaches `error_rate`, calls fail fast with
+  `CircuitOpenError` for `cooldown` seconds. Retry loops stop sleeping.
+- Half-open: up to `n_probes` calls go through as probes. If they all
+  succeed, the breaker closes. Any failure opens it again.
+'''
+
+from __future__ import annotations
+
+import time
+import logging
+import threading
+from enum import Enum
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+class BreakerState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f'Circuit open. Retry after {retry_after:.1f} s.')
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    def __init__(
+        self, error_rate: float = 0.5, window: int = 20,
+        min_calls: int = 5, cooldown: float = 30.0, n_probes: int = 1,
+    ) -> None:
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.n_probes = n_probes
+        self.lock = threading.Lock()
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.state = BreakerState.CLOSED
+        self.opened_at = 0.0
+        self.n_probes_in_flight = 0
+        self.n_probe_successes = 0
+        self.n_retries = 0
+        self.n_rejected = 0
+        self.n_trips = 0
+
+    def retryAfter(self) -> float:
+        '''
+        Seconds until the breaker half-opens. 0 unless open.
+        '''
+        if self.state != BreakerState.OPEN:
+            return 0.0
+        return max(self.opened_at + self.cooldown - time.monotonic(), 0.0)
+
+    def updateState(self) -> None:
+        if self.state == BreakerState.OPEN and self.retryAfter() == 0.0:
+            self.state = BreakerState.HALF_OPEN
+            self.n_probes_in_flight = 0
+            self.n_probe_successes = 0
+            log.info('Circuit half-open. Probing.')
+
+    def isOpen(self) -> bool:
+        with self.lock:
+            self.updateState()
+            return self.state == BreakerState.OPEN
+
+    def acquire(self) -> None:
+        '''
+        Call before each attempt. Raises `CircuitOpenError` to fail fast.
+        '''
+        with self.lock:
+            self.updateState()
+            match self.state:
+                case BreakerState.CLOSED:
+                    return
+                case BreakerState.HALF_OPEN:
+                    if self.n_probes_in_flight < self.n_probes:
+                        self.n_probes_in_flight += 1
+                        return
+                    retry_after = 1.0
+                case BreakerState.OPEN:
+                    retry_after = self.retryAfter()
+            self.n_rejected += 1
+        raise CircuitOpenError(retry_after)
+
+    def recordSuccess(self) -> None:
+        with self.lock:
+            self.outcomes.append(True)
+            if self.state == BreakerState.HALF_OPEN:
+                self.n_probe_successes += 1
+                if self.n_probe_successes >= self.n_probes:
+                    self.state = BreakerState.CLOSED
+                    self.outcomes.clear()
+                    log.info('Circuit closed.')
+
+    def recordFailure(self) -> None:
+        with self.lock:
+            self.outcomes.append(False)
+            match self.state:
+                case BreakerState.HALF_OPEN:
+                    self.trip()
+                case BreakerState.CLOSED:
+                    n_failures = self.outcomes.count(False)
+                    if (
+                        len(self.outcomes) >= self.min_calls and
+                        n_failures / len(self.outcomes) >= self.error_rate
+                    ):
+                        self.trip()
+
+    def trip(self) -> None:
+        self.state = BreakerState.OPEN
+        self.opened_at = time.monotonic()
+        self.n_trips += 1
+        log.warning(f'Circuit open for {self.cooldown} s. {self.summary()}')
+
+    def release(self) -> None:
+        '''
+        For attempts that ended without telling anything about the 
+        provider's health, e.g. a bad request.
+        '''
+        with self.lock:
+            if self.state == BreakerState.HALF_OPEN:
+                self.n_probes_in_flight = max(self.n_probes_in_flight - 1, 0)
+
+    def recordRetry(self) -> None:
+        with self.lock:
+            self.n_retries += 1
+
+    def summary(self) -> str:
+        return (
+            f'{self.state.value}, {self.n_retries} retries, '
+            f'{self.n_rejected} rejected, {self.n_trips} trips'
+        )
@@ -0,0 +1,108 @@
+'''
+A bounded LRU cache around `idToClassifiee`, with background prefetch.
+'''
+
+import typing as tp
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from .shared import Classifiee
+
+class ClassifieeCache:
+    def __init__(
+        self,
+        idToClassifiee: tp.Callable[[str], Classifiee],
+        idsToClassifiees: tp.Callable[
+            [tp.Sequence[str]], tp.Sequence[Classifiee],
+        ] | None = None,
+        capacity: int = 1024,
+        n_threads: int = 1,
+    ) -> None:
+        '''
+        `idsToClassifiees`: optional batch fetch, used by prefetch.
+        '''
+        self.idToClassifiee = idToClassifiee
+        self.idsToClassifiees = idsToClassifiees
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.cache: OrderedDict[str, Classifiee] = OrderedDict()
+        self.in_flight: dict[str, Future[None]] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=n_threads, thread_name_prefix='classifiee',
+        )
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def peek(self, id_: str) -> Classifiee | None:
+        '''
+        Never blocks. `None` if not cached yet.
+        '''
+        with self.lock:
+            try:
+                classifiee = self.cache[id_]
+            except KeyError:
+                return None
+            self.cache.move_to_end(id_)
+            self.n_hits += 1
+            return classifiee
+
+    def get(self, id_: str) -> Classifiee:
+        classifiee = self.peek(id_)
+        if classifiee is not None:
+            return classifiee
+        with self.lock:
+            future = self.in_flight.get(id_)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass    # fall back to fetching it here
+            classifiee = self.peek(id_)
+            if classifiee is not None:
+                return classifiee
+        with self.lock:
+            self.n_misses += 1
+        classifiee = self.idToClassifiee(id_)
+        self.put(id_, classifiee)
+        return classifiee
+
+    def put(self, id_: str, classifiee: Classifiee) -> None:
+        with self.lock:
+            self.cache[id_] = classifiee
+            self.cache.move_to_end(id_)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+
+    def prefetch(self, ids: tp.Iterable[str]) -> None:
+        with self.lock:
+            todo = [
+                id_ for id_ in dict.fromkeys(ids)
+                if id_ not in self.cache and id_ not in self.in_flight
+            ]
+            if not todo:
+                return
+            if self.idsToClassifiees is None:
+                batches = [[id_] for id_ in todo]
+            else:
+                batches = [todo]
+            for batch in batches:
+                future = self.executor.submit(self.fetchBatch, batch)
+                for id_ in batch:
+                    self.in_flight[id_] = future
+
+    def fetchBatch(self, ids: list[str]) -> None:
+        try:
+            if self.idsToClassifiees is None:
+                classifiees = [self.idToClassifiee(id_) for id_ in ids]
+            else:
+                classifiees = self.idsToClassifiees(ids)
+            for id_, classifiee in zip(ids, classifiees, strict=True):
+                self.put(id_, classifiee)
+        finally:
+            with self.lock:
+                for id_ in ids:
+                    self.in_flight.pop(id_, None)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,75 @@
+'''
+Shortens classifiees, and the questions of examples, before they are
+rendered into the prompt.
+
+- Whitespace runs collapse, and optionally markup tags are dropped.
+- Over a token budget, the middle is cut: the head and the tail are
+  kept, with a marker of how much was omitted.
+
+The policy is part of `PromptAndExamples`, and so of its version.
+Verdicts and cached responses under one policy are never mistaken for
+another's. The prompt file keeps the raw texts.
+'''
+
+from __future__ import annotations
+
+import re
+import functools
+
+from pydantic import BaseModel, ConfigDict
+
+SPACES = re.compile(r'[ \t\f\v]+')
+TRAILING_SPACES = re.compile(r' +\n')
+BLANK_LINES = re.compile(r'\n{3,}')
+MARKUP = re.compile(r'<[^<>\n]{1,200}>')
+OMISSION = '\n[... {} characters omitted ...]\n'
+
+class CompactionPolicy(BaseModel):
+    classifiee_budget_tokens: int | None = None
+    example_budget_tokens: int | None = None
+    # share of the budget kept from the start. The rest is from the end.
+    head_fraction: float = 0.5
+    collapse_whitespace: bool = True
+    strip_markup: bool = False
+
+    model_config = ConfigDict(
+        frozen=True,
+    )
+
+    def compactClassifiee(self, text: str) -> str:
+        return compact(self, text, self.classifiee_budget_tokens)
+
+    def compactExample(self, text: str) -> str:
+        # the same examples go into every prompt
+        return compactCached(self, text, self.example_budget_tokens)
+
+def compact(
+    policy: CompactionPolicy, text: str, budget_tokens: int | None,
+) -> str:
+    # token_estimate imports shared, which imports this module
+    from .token_estimate import estimateTokens
+    if policy.strip_markup:
+        text = MARKUP.sub(' ', text)
+    if policy.collapse_whitespace:
+        text = SPACES.sub(' ', text)
+        text = TRAILING_SPACES.sub('\n', text)
+        text = BLANK_LINES.sub('\n\n', text).strip()
+    if budget_tokens is None:
+        return text
+    n_tokens = estimateTokens(text)
+    if n_tokens <= budget_tokens:
+        return text
+    # start from this text's own chars per token, and shrink until it fits
+    keep = int(len(text) * budget_tokens / n_tokens)
+    while True:
+        head = int(keep * policy.head_fraction)
+        tail = keep - head
+        cut = (
+            text[:head] + OMISSION.format(len(text) - keep) +
+            text[len(text) - tail:]
+        )
+        if keep == 0 or estimateTokens(cut) <= budget_tokens:
+            return cut
+        keep = int(keep * 0.9)
+
+compactCached = functools.lru_cache(maxsize=1024)(compact)
@@ -0,0 +1,106 @@
+'''
+Connection reuse stats for the httpx clients under the OpenAI clients,
+from httpcore trace events, plus connection warm-up.
+'''
+
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+import threading
+import typing as tp
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+if tp.TYPE_CHECKING:
+    import httpx
+
+log = logging.getLogger(__name__)
+
+class ConnectionStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.n_requests = 0
+        self.n_new_connections = 0
+        self.n_tls_handshakes = 0
+        self.connect_seconds = 0.0
+
+    def reuseRate(self) -> float:
+        with self.lock:
+            if self.n_requests == 0:
+                return 0.0
+            return 1.0 - self.n_new_connections / self.n_requests
+
+    def summary(self) -> str:
+        return (
+            f'{self.reuseRate():.0%} reused, '
+            f'{self.n_new_connections} opened in {self.connect_seconds:.1f}s'
+        )
+
+    def onTraceEvent(
+        self, event: str, started_at: dict[str, float],
+    ) -> None:
+        '''
+        `event` is e.g. "connection.connect_tcp.started".
+        '''
+        now = time.monotonic()
+        phase, _, edge = event.rpartition('.')
+        if phase not in ('connection.connect_tcp', 'connection.start_tls'):
+            return
+        if edge == 'started':
+            started_at[phase] = now
+            return
+        if edge != 'complete':
+            return
+        with self.lock:
+            if phase == 'connection.connect_tcp':
+                self.n_new_connections += 1
+            else:
+                self.n_tls_handshakes += 1
+            self.connect_seconds += now - started_at.pop(phase, now)
+
+    def onRequest(self, request: httpx.Request) -> None:
+        with self.lock:
+            self.n_requests += 1
+        started_at: dict[str, float] = {}
+        def trace(event: str, info: dict) -> None:
+            self.onTraceEvent(event, started_at)
+        request.extensions['trace'] = trace
+
+    async def onRequestAsync(self, request: httpx.Request) -> None:
+        with self.lock:
+            self.n_requests += 1
+        started_at: dict[str, float] = {}
+        async def trace(event: str, info: dict) -> None:
+            self.onTraceEvent(event, started_at)
+        request.extensions['trace'] = trace
+
+def warmUpSync(client: openai.OpenAI, n_connections: int) -> None:
+    '''
+    Opens connections ahead of the judging loop with concurrent 
+    `GET /models` requests, which cost nothing. Blocks.
+    Failures are logged, not raised.
+    '''
+    def ping() -> None:
+        try:
+            client.models.list()
+        except openai.OpenAIError as e:
+            log.warning(f'Warm-up request failed: {e}')
+    with ThreadPoolExecutor(max_workers=max(n_connections, 1)) as executor:
+        for _ in range(n_connections):
+            executor.submit(ping)
+
+async def warmUpAsync(
+    asyncClient: openai.AsyncOpenAI, n_connections: int,
+) -> None:
+    '''
+    Like `warmUpSync`. The async pool belongs to the running loop.
+    '''
+    async def ping() -> None:
+        try:
+            await asyncClient.models.list()
+        except openai.OpenAIError as e:
+            log.warning(f'Warm-up request failed: {e}')
+    await asyncio.gather(*[ping() for _ in range(n_connections)])
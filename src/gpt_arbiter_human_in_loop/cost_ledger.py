@@ -0,0 +1,207 @@
+'''
+A per-model ledger of tokens and USD that persists across sessions.  
+Cache hits are counted, but cost nothing.  
+Spend is grouped by kind, e.g. "judge", "interrogate" and 
+"speculative", so that interrogations do not skew the per-item 
+projection.  
+Processes may share one ledger file, e.g. a `UI` and headless workers. 
+Each save adds this process's new spend to the file under a file lock, 
+and reads back everyone's.  
+'''
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import atexit
+import threading
+import contextlib
+import typing as tp
+
+from pydantic import BaseModel
+from openai.types.completion_usage import CompletionUsage
+
+from .pricing import PRICING
+
+class ModelSpend(BaseModel):
+    n_calls: int = 0
+    n_cache_hits: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    USD: float = 0.0
+
+    def meanUSDPerCall(self) -> float:
+        if self.n_calls == 0:
+            return 0.0
+        return self.USD / self.n_calls
+
+    def cacheHitRate(self) -> float:
+        total = self.n_calls + self.n_cache_hits
+        if total == 0:
+            return 0.0
+        return self.n_cache_hits / total
+
+    def plus(self, other: ModelSpend) -> ModelSpend:
+        return ModelSpend(**{
+            name: getattr(self, name) + getattr(other, name)
+            for name in ModelSpend.model_fields
+        })
+
+Spends = dict[str, dict[str, ModelSpend]]
+
+def loadSpends(path: str) -> Spends:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw: dict = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {
+        kind: {
+            model: ModelSpend.model_validate(v)
+            for model, v in models.items()
+        }
+        for kind, models in raw.items()
+    }
+
+def mergeSpends(a: Spends, b: Spends) -> Spends:
+    merged = {kind: dict(models) for kind, models in a.items()}
+    for kind, models in b.items():
+        for model, spend in models.items():
+            old = merged.setdefault(kind, {}).get(model, ModelSpend())
+            merged[kind][model] = old.plus(spend)
+    return merged
+
+@contextlib.contextmanager
+def fileLock(path: str) -> tp.Iterator[None]:
+    '''
+    Exclusive across processes, while the `with` block runs.
+    '''
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class CostLedger:
+    def __init__(
+        self, /, path: str, budget_USD: float | None = None,
+        save_interval: float = 5.0,
+    ) -> None:
+        '''
+        `budget_USD`: hard cap over all sessions recorded in `path`.
+        The judging loop pauses before a call would exceed it.
+        `save_interval`: seconds between saves of the file. Records in 
+        between are only in memory, and are saved at exit. Other 
+        processes' spend is seen, and counts toward the budget, as of 
+        the last save.
+        '''
+        self.path = path
+        self.budget_USD = budget_USD
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.last_save = time.monotonic()
+        # everyone's, as of the last save, plus `unsaved`
+        self.spends: Spends = loadSpends(path)
+        # this process's, since the last save
+        self.unsaved: Spends = {}
+        atexit.register(self.save)
+
+    def save(self) -> None:
+        '''
+        Adds what was recorded since the last save to the file, 
+        and reads back what other processes added.
+        '''
+        with self.lock, fileLock(self.path + '.lock'):
+            merged = mergeSpends(loadSpends(self.path), self.unsaved)
+            if self.unsaved:
+                j = {
+                    kind: {k: v.model_dump() for k, v in models.items()}
+                    for kind, models in merged.items()
+                }
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(j, f, indent=2)
+                os.replace(tmp, self.path)
+            self.spends = merged
+            self.unsaved = {}
+            self.last_save = time.monotonic()
+
+    def maybeSave(self) -> None:
+        if time.monotonic() - self.last_save >= self.save_interval:
+            self.save()
+
+    def __record(self, kind: str, model: str, spend: ModelSpend) -> None:
+        for spends in (self.spends, self.unsaved):
+            models = spends.setdefault(kind, {})
+            models[model] = models.get(model, ModelSpend()).plus(spend)
+
+    def recordUsage(
+        self, model: str, usage: CompletionUsage | None,
+        kind: str = 'judge',
+    ) -> float:
+        '''
+        Returns the USD of this usage.
+        '''
+        if usage is None:
+            return 0.0
+        USD = PRICING[model].estimate(usage)
+        details = usage.prompt_tokens_details
+        cached = 0 if details is None else (details.cached_tokens or 0)
+        with self.lock:
+            self.__record(kind, model, ModelSpend(
+                n_calls=1,
+                input_tokens=usage.prompt_tokens - cached,
+                cached_tokens=cached,
+                output_tokens=usage.completion_tokens,
+                USD=USD,
+            ))
+        self.maybeSave()
+        return USD
+
+    def recordCacheHit(self, model: str, kind: str = 'judge') -> None:
+        with self.lock:
+            self.__record(kind, model, ModelSpend(n_cache_hits=1))
+        self.maybeSave()
+
+    def totalUSD(self) -> float:
+        with self.lock:
+            return sum(
+                s.USD for models in self.spends.values()
+                for s in models.values()
+            )
+
+    def get(self, model: str, kind: str = 'judge') -> ModelSpend:
+        with self.lock:
+            return self.spends.get(kind, {}).get(
+                model, ModelSpend(),
+            ).model_copy()
+
+    def projectRemaining(self, model: str, n_remaining: int) -> float:
+        '''
+        Projects the USD to judge `n_remaining` more items,
+        assuming past cost per call and past cache hit rate.
+        '''
+        spend = self.get(model)
+        return (
+            n_remaining * spend.meanUSDPerCall()
+            * (1 - spend.cacheHitRate())
+        )
+
+    def wouldExceedBudget(self, next_USD: float) -> bool:
+        if self.budget_USD is None:
+            return False
+        return self.totalUSD() + next_USD > self.budget_USD
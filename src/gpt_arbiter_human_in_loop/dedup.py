@@ -0,0 +1,54 @@
+'''
+Groups ids whose classifiees are byte-identical, so that each group 
+is judged once per prompt version.  
+'''
+
+import hashlib
+
+from .shared import Classifiee
+
+def classifieeHash(classifiee: Classifiee) -> str:
+    return hashlib.sha256(classifiee.encode('utf-8')).hexdigest()
+
+class ClassifieeDedup:
+    def __init__(self) -> None:
+        self.hash_of: dict[str, str] = {}
+        self.groups: dict[str, list[str]] = {}
+        # hash -> (prompt version, class probabilities)
+        self.verdicts: dict[str, tuple[str, tuple[float, ...]]] = {}
+        self.n_saved_calls = 0
+    
+    def register(self, id_: str, classifiee: Classifiee) -> str:
+        h = self.hash_of.get(id_)
+        if h is None:
+            h = classifieeHash(classifiee)
+            self.hash_of[id_] = h
+            self.groups.setdefault(h, []).append(id_)
+        return h
+    
+    def lookup(self, h: str, version: str) -> tuple[float, ...] | None:
+        try:
+            verdict_version, verdict = self.verdicts[h]
+        except KeyError:
+            return None
+        if verdict_version != version:
+            return None
+        self.n_saved_calls += 1
+        return verdict
+    
+    def record(
+        self, h: str, version: str, verdict: tuple[float, ...], 
+    ) -> list[str]:
+        '''
+        Returns all known ids sharing the classifiee.  
+        '''
+        self.verdicts[h] = (version, verdict)
+        return self.groups[h]
+    
+    def dedupRatio(self) -> float:
+        '''
+        Fraction of registered ids that are duplicates.  
+        '''
+        if not self.hash_of:
+            return 0.0
+        return 1 - len(self.groups) / len(self.hash_of)
@@ -0,0 +1,149 @@
+'''
+Choose which `QAPair`s go into the prompt under a token budget.
+
+Selection is a pure function of the examples (and, for
+`LexicalSimilarity`, the classifiee), so one prompt version always
+renders the same prompt: the judge cache keeps hitting.
+Chosen examples are rendered in their original order.
+Selectors that ignore the classifiee also keep the example block
+identical across items, which keeps the provider's prefix cache warm.
+'''
+
+from __future__ import annotations
+
+import re
+import math
+import threading
+import typing as tp
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from .shared import QAPair, Classifiee, NO_OR_YES
+from .token_estimate import exampleTokens
+
+class ExampleSelector(ABC):
+    @abstractmethod
+    def rank(
+        self, examples: tp.Sequence[QAPair], classifiee: Classifiee,
+    ) -> list[int]:
+        '''
+        Returns indices into `examples`, most informative first.
+        '''
+        raise NotImplementedError
+
+    def select(
+        self, examples: tp.Sequence[QAPair], classifiee: Classifiee,
+        budget_tokens: int, classes: tuple[str, ...] = NO_OR_YES,
+        compacted: tp.Callable[[QAPair], QAPair] | None = None,
+    ) -> list[QAPair]:
+        '''
+        `compacted`: how an example is rendered, e.g. 
+        `PromptAndExamples.compactedExample`. Its tokens are what count.
+        '''
+        chosen: list[int] = []
+        used = 0
+        for i in self.rank(examples, classifiee):
+            example = examples[i] if compacted is None else compacted(examples[i])
+            cost = exampleTokens(example, classes)
+            if used + cost > budget_tokens:
+                continue
+            chosen.append(i)
+            used += cost
+        return [examples[i] for i in sorted(chosen)]
+
+class MostRecent(ExampleSelector):
+    def rank(
+        self, examples: tp.Sequence[QAPair], classifiee: Classifiee,
+    ) -> list[int]:
+        return list(reversed(range(len(examples))))
+
+class ClassBalanced(ExampleSelector):
+    '''
+    Round-robin over classes, most recent first within each class.
+    '''
+    def rank(
+        self, examples: tp.Sequence[QAPair], classifiee: Classifiee,
+    ) -> list[int]:
+        by_class: dict[int, list[int]] = {}
+        for i in reversed(range(len(examples))):
+            by_class.setdefault(examples[i].no_or_yes, []).append(i)
+        queues = [by_class[c] for c in sorted(by_class)]
+        ranked: list[int] = []
+        for round_ in range(max((len(q) for q in queues), default=0)):
+            for q in queues:
+                if round_ < len(q):
+                    ranked.append(q[round_])
+        return ranked
+
+class Explained(ExampleSelector):
+    '''
+    Examples with a human explanation first, then the rest.
+    Most recent first within each group.
+    '''
+    def rank(
+        self, examples: tp.Sequence[QAPair], classifiee: Classifiee,
+    ) -> list[int]:
+        recent_first = list(reversed(range(len(examples))))
+        return sorted(
+            recent_first,
+            key=lambda i: examples[i].explanation is None,
+        )
+
+WORD = re.compile(r'\w+')
+
+def words(text: str) -> list[str]:
+    return WORD.findall(text.lower())
+
+class LexicalSimilarity(ExampleSelector):
+    '''
+    BM25 over example questions, queried with the classifiee.
+    The index is local and rebuilt only when the examples change.
+    Breaks prefix caching, as each item gets its own example block.
+    Prompts render in worker threads, so the index is locked.
+    '''
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.indexed: tuple[QAPair, ...] | None = None
+        self.term_freqs: list[Counter[str]] = []
+        self.doc_lens: list[int] = []
+        self.idf: dict[str, float] = {}
+
+    def index(self, examples: tp.Sequence[QAPair]) -> None:
+        key = tuple(examples)
+        if key == self.indexed:
+            return
+        self.indexed = key
+        self.term_freqs = [Counter(words(ex.question)) for ex in examples]
+        self.doc_lens = [sum(tf.values()) for tf in self.term_freqs]
+        doc_freq: Counter[str] = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        N = len(examples)
+        self.idf = {
+            term: math.log(1 + (N - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def rank(
+        self, examples: tp.Sequence[QAPair], classifiee: Classifiee,
+    ) -> list[int]:
+        with self.lock:
+            self.index(examples)
+            term_freqs, doc_lens, idf = self.term_freqs, self.doc_lens, self.idf
+        query = set(words(classifiee))
+        mean_len = sum(doc_lens) / max(len(doc_lens), 1)
+        def score(i: int) -> float:
+            tf = term_freqs[i]
+            norm = self.k1 * (
+                1 - self.b + self.b * doc_lens[i] / max(mean_len, 1)
+            )
+            return sum(
+                idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                for t in query if t in tf
+            )
+        # ties go to the more recent example
+        return sorted(
+            reversed(range(len(examples))), key=score, reverse=True,
+        )
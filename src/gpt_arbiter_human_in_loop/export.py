@@ -0,0 +1,300 @@
+'''
+Streams annotations out as JSONL or CSV, e.g. for downstream pipelines.
+
+    python -m gpt_arbiter_human_in_loop.export SOURCE [-o OUT] [options]
+
+`SOURCE` is one of:
+- a JSON `Persistent` file. It is loaded whole, like the `UI` does.
+  The `UI` writes it at exit, so export after the session.
+- a `MemmapPersistent` store directory. Read in chunks.
+- a `WorkQueue` SQLite file. Read in pages of changes.
+
+The last two can be exported while classification runs.
+
+With `--since STATE`, only items that changed since the export that
+wrote `STATE` are output, and `STATE` is updated afterwards. A change
+is a new verdict or label. Staleness growing alone is not a change.
+'''
+
+from __future__ import annotations
+
+import os
+import csv
+import sys
+import json
+import argparse
+import typing as tp
+from dataclasses import dataclass
+
+import numpy as np
+
+from .shared import ItemStatus, NO_OR_YES, PromptAndExamples
+from .persistent import ItemAnnotations
+from .persistent_memmap import MemmapPersistent, ANNOTATIONS_FILENAME
+from .work_queue import WorkQueue
+
+FIELDS = [
+    'id', 'decision', 'confidence', 'human_label', 'staleness',
+    'gpt_verdict', 'probs',
+]
+
+@dataclass(frozen=True)
+class ExportFilter:
+    '''
+    Human labels count as certain, so `min_confidence` keeps them.
+    e.g. "human label or p > 0.9" is `decision=1, min_confidence=0.9`.
+    '''
+    decision: int | None = None
+    min_confidence: float | None = None
+    max_staleness: int | None = None
+
+    def accepts(self, anno: ItemAnnotations) -> bool:
+        if anno.status == ItemStatus.Unvisited():
+            return False
+        label = anno.human_label_no_or_yes
+        if label is not None:
+            return self.decision is None or label == self.decision
+        if self.decision is not None and anno.decision() != self.decision:
+            return False
+        if (
+            self.min_confidence is not None and
+            max(anno.probs()) < self.min_confidence
+        ):
+            return False
+        if (
+            self.max_staleness is not None and
+            anno.status.staleness > self.max_staleness
+        ):
+            return False
+        return True
+
+def toRecord(
+    id_: str, anno: ItemAnnotations, class_names: tp.Sequence[str],
+) -> dict[str, tp.Any]:
+    label = anno.human_label_no_or_yes
+    decision = anno.decision() if label is None else label
+    return dict(
+        id=id_,
+        decision=class_names[decision],
+        confidence=1.0 if label is not None else max(anno.probs()),
+        human_label=None if label is None else class_names[label],
+        staleness=anno.status.staleness,
+        gpt_verdict=anno.gpt_verdict,
+        probs=None if anno.gpt_probs is None else list(anno.gpt_probs),
+    )
+
+def writeStateAtomically(path: str, write: tp.Callable[[str], None]) -> None:
+    tmp = path + '.tmp'
+    write(tmp)
+    os.replace(tmp, path)
+
+def fromJson(
+    path: str, since: str | None,
+) -> tp.Iterator[tuple[str, ItemAnnotations]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        raw: dict = json.load(f)
+    seen: dict[str, list] = {}
+    if since is not None and os.path.exists(since):
+        with open(since, 'r', encoding='utf-8') as f:
+            seen = json.load(f)
+    fingerprints: dict[str, list] = {}
+    for id_, v in raw.items():
+        anno = ItemAnnotations.model_validate(v)
+        fingerprint = [
+            anno.gpt_verdict, anno.human_label_no_or_yes, anno.gpt_probs,
+        ]
+        # through JSON, so that tuples compare with lists
+        fingerprint = json.loads(json.dumps(fingerprint))
+        fingerprints[id_] = fingerprint
+        if seen.get(id_) != fingerprint:
+            yield id_, anno
+    if since is not None:
+        def write(tmp: str) -> None:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(fingerprints, f)
+        writeStateAtomically(since, write)
+
+def fromMemmap(
+    path: str, since: str | None, chunk_size: int = 65536,
+) -> tp.Iterator[tuple[str, ItemAnnotations]]:
+    '''
+    The state is a snapshot of the records, compared chunk by chunk.
+    '''
+    store = MemmapPersistent(path, readonly=True)
+    with store.Context() as records:
+        assert store.ids is not None
+        previous = None
+        if since is not None and os.path.exists(since):
+            previous = np.load(since, mmap_mode='r')
+            assert previous.dtype == records.dtype
+            assert previous.shape == records.shape
+        snapshot = None
+        if since is not None:
+            snapshot = np.lib.format.open_memmap(
+                since + '.tmp', mode='w+',
+                dtype=records.dtype, shape=records.shape,
+            )
+        for start in range(0, len(records), chunk_size):
+            chunk = np.array(records[start:start + chunk_size])
+            if snapshot is not None:
+                snapshot[start:start + len(chunk)] = chunk
+            changed = chunk['status'] != -1
+            if previous is not None:
+                old = previous[start:start + len(chunk)]
+                same = (
+                    (chunk['label'] == old['label']) &
+                    (old['status'] != -1) &
+                    (
+                        (chunk['verdict'] == old['verdict']) |
+                        (np.isnan(chunk['verdict']) & np.isnan(old['verdict']))
+                    )
+                )
+                if 'probs' in chunk.dtype.names:
+                    same &= np.all(
+                        (chunk['probs'] == old['probs']) |
+                        np.isnan(chunk['probs']) & np.isnan(old['probs']),
+                        axis=1,
+                    )
+                changed &= ~same
+            for i in (np.flatnonzero(changed) + start).tolist():
+                yield store.ids[i].decode('utf-8'), store.decode(i)
+        if snapshot is not None:
+            snapshot.flush()
+            del snapshot
+            assert since is not None
+            os.replace(since + '.tmp', since)
+
+def fromWorkQueue(
+    path: str, since: str | None,
+) -> tp.Iterator[tuple[str, ItemAnnotations]]:
+    '''
+    Follows the queue's change sequence. The state is the last `seq`.
+    '''
+    work_queue = WorkQueue(path)
+    try:
+        version, epoch = work_queue.current()
+        seq = 0
+        if since is not None and os.path.exists(since):
+            with open(since, 'r', encoding='utf-8') as f:
+                seq = json.load(f)['seq']
+        while True:
+            changes, seq = work_queue.changesSince(seq)
+            if not changes:
+                break
+            for change in changes:
+                if change.human_label is not None:
+                    yield change.id_, ItemAnnotations(
+                        gpt_verdict=change.gpt_verdict,
+                        status=ItemStatus.Classified(),
+                        human_label_no_or_yes=change.human_label,
+                    )
+                    continue
+                if change.gpt_verdict is None or change.judged_epoch is None:
+                    continue
+                yield change.id_, ItemAnnotations(
+                    gpt_verdict=change.gpt_verdict,
+                    status=(
+                        ItemStatus.Classified()
+                        if change.judged_version == version else
+                        ItemStatus.Outdated(max(epoch - change.judged_epoch, 1))
+                    ),
+                    human_label_no_or_yes=None,
+                )
+        if since is not None:
+            def write(tmp: str) -> None:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({'seq': seq}, f)
+            writeStateAtomically(since, write)
+    finally:
+        work_queue.close()
+
+def isSqlite(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(16) == b'SQLite format 3\x00'
+
+def iterSource(
+    path: str, since: str | None = None,
+) -> tp.Iterator[tuple[str, ItemAnnotations]]:
+    if os.path.isdir(path):
+        assert os.path.exists(os.path.join(path, ANNOTATIONS_FILENAME))
+        return fromMemmap(path, since)
+    if isSqlite(path):
+        return fromWorkQueue(path, since)
+    return fromJson(path, since)
+
+def export(
+    source: str, out: tp.TextIO, format_: str = 'jsonl',
+    filter_: ExportFilter = ExportFilter(),
+    class_names: tp.Sequence[str] = NO_OR_YES, since: str | None = None,
+) -> int:
+    '''
+    Returns how many items were written.
+    `since` is only updated once the source is fully read.
+    '''
+    n = 0
+    writer = None
+    if format_ == 'csv':
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+    for id_, anno in iterSource(source, since):
+        if not filter_.accepts(anno):
+            continue
+        record = toRecord(id_, anno, class_names)
+        if writer is None:
+            out.write(json.dumps(record) + '\n')
+        else:
+            if record['probs'] is not None:
+                record['probs'] = json.dumps(record['probs'])
+            writer.writerow(record)
+        n += 1
+    return n
+
+def main(argv: tp.Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m gpt_arbiter_human_in_loop.export',
+        description='Stream annotations out as JSONL or CSV.',
+    )
+    parser.add_argument('source', help='annotations JSON, memmap store, or work queue')
+    parser.add_argument('-o', '--out', help='default: stdout')
+    parser.add_argument('-f', '--format', choices=('jsonl', 'csv'), default='jsonl')
+    parser.add_argument('--prompt', help='prompt file, for class names')
+    parser.add_argument('--decision', help='only items decided as this class (name or index)')
+    parser.add_argument('--min-confidence', type=float, help='unlabeled items need this top-class probability')
+    parser.add_argument('--max-staleness', type=int, help='drop unlabeled items judged more labels ago')
+    parser.add_argument('--since', metavar='STATE', help='only changes since the export that wrote STATE')
+    args = parser.parse_args(argv)
+
+    class_names: tp.Sequence[str] = NO_OR_YES
+    if args.prompt is not None:
+        class_names = PromptAndExamples.fromFile(args.prompt).classes
+    decision = None
+    if args.decision is not None:
+        lowered = [name.lower() for name in class_names]
+        if args.decision.lower() in lowered:
+            decision = lowered.index(args.decision.lower())
+        elif args.decision.isdigit() and int(args.decision) < len(class_names):
+            decision = int(args.decision)
+        else:
+            parser.error(
+                f'--decision: expected one of {", ".join(class_names)} '
+                f'or an index below {len(class_names)}, got {args.decision!r}'
+            )
+    filter_ = ExportFilter(
+        decision=decision,
+        min_confidence=args.min_confidence,
+        max_staleness=args.max_staleness,
+    )
+    out = sys.stdout if args.out is None else open(
+        args.out, 'w', encoding='utf-8', newline='',
+    )
+    try:
+        n = export(
+            args.source, out, args.format, filter_, class_names, args.since,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f'Exported {n} items.', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
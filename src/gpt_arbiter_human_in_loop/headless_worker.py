@@ -0,0 +1,220 @@
+'''
+A judging process without a UI, draining a shared `WorkQueue`.
+Run several, e.g. on several machines or with several API keys, next
+to one `UI` that labels and publishes the prompt version.
+
+SQLite calls wait on other processes' transactions, so they run in
+worker threads, like fetching and rendering. The event loop only
+awaits the API.
+'''
+
+import asyncio
+import logging
+import contextlib
+import typing as tp
+
+from .shared import PromptAndExamples, Classifiee
+from .arbiter_interface import ArbiterInterface
+from .work_queue import WorkQueue
+from .circuit_breaker import CircuitOpenError
+from .persistent_memmap import MemmapPersistent
+
+log = logging.getLogger(__name__)
+
+class HeadlessWorker:
+    def __init__(
+        self,
+        arbiter: ArbiterInterface,
+        work_queue: WorkQueue,
+        prompt_and_examples_filename: str,
+        idToClassifiee: tp.Callable[[str], Classifiee],
+        worker_id: str,
+        model_name: str = 'gpt-4o-mini',
+        batch_size: int = 8,
+        concurrency: int = 4,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 2.0,
+        store: MemmapPersistent | None = None,
+    ) -> None:
+        '''
+        `worker_id` must be unique among workers sharing `work_queue`.
+        The prompt file must be shared with the `UI`, e.g. on the same disk.
+        The arbiter's ledger budget, if any, stops the worker before a 
+        batch would exceed it.
+        `store`: a binary `MemmapPersistent` over the queue's ids, that 
+        this worker alone writes its verdicts into, e.g. for dashboards. 
+        Labels stay in the queue. Only their count is kept, as staleness.
+        '''
+        self.arbiter = arbiter
+        self.work_queue = work_queue
+        self.prompt_and_examples_filename = prompt_and_examples_filename
+        self.idToClassifiee = idToClassifiee
+        self.worker_id = worker_id
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.store = store
+        self.store_epoch: int | None = None
+
+        self.prompt_and_examples = PromptAndExamples.fromFile(
+            prompt_and_examples_filename
+        )
+        self.n_committed = 0
+
+    def syncPrompt(self) -> tuple[str, int] | None:
+        '''
+        Reloads the prompt file if the published version moved on.
+        Returns `None` until the file matches the published version.
+        '''
+        version, epoch = self.work_queue.current()
+        if version is None:
+            return None
+        if self.prompt_and_examples.version != version:
+            self.prompt_and_examples = PromptAndExamples.fromFile(
+                self.prompt_and_examples_filename
+            )
+            if self.prompt_and_examples.version != version:
+                return None
+        return version, epoch
+
+    async def heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(
+                self.work_queue.heartbeat, self.worker_id, self.lease_seconds,
+            )
+
+    async def judgeOne(
+        self, id_: str, version: str, epoch: int,
+        semaphore: asyncio.Semaphore,
+    ) -> float | None:
+        '''
+        Returns the verdict if it was committed.
+        '''
+        async with semaphore:
+            prompt_and_examples = self.prompt_and_examples
+            prompt = await asyncio.to_thread(
+                lambda: prompt_and_examples.render(self.idToClassifiee(id_)),
+            )
+            verdict = await self.arbiter.judge(
+                model=self.model_name,
+                prompt=prompt,
+                max_tokens=1,
+                prompt_version=version,
+            )
+        if not await asyncio.to_thread(
+            self.work_queue.commit,
+            self.worker_id, id_, verdict, version, epoch,
+        ):
+            return None
+        self.n_committed += 1
+        return verdict
+
+    def writeToStore(
+        self, ids: list[str], verdicts: list[float], version: str, epoch: int,
+    ) -> None:
+        assert self.store is not None
+        if self.store_epoch is not None and epoch > self.store_epoch:
+            self.store.outdate(epoch - self.store_epoch)
+        self.store_epoch = epoch
+        self.store.writeVerdicts(ids, verdicts, version)
+
+    def wouldExceedBudget(self) -> bool:
+        ledger = self.arbiter.getLedger()
+        return ledger is not None and ledger.wouldExceedBudget(
+            self.batch_size * self.arbiter.getCostPerItem(),
+        )
+
+    async def run(self, stop_when_idle: bool = False) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        heartbeatTask = asyncio.create_task(self.heartbeat())
+        await self.arbiter.warmUp(self.concurrency)
+        with contextlib.ExitStack() as stack:
+            if self.store is not None:
+                stack.enter_context(self.store.Context())
+            try:
+                await self.drain(semaphore, stop_when_idle)
+            finally:
+                heartbeatTask.cancel()
+                await asyncio.to_thread(self.work_queue.release, self.worker_id)
+                ledger = self.arbiter.getLedger()
+                if ledger is not None:
+                    await asyncio.to_thread(ledger.save)
+
+    async def drain(
+        self, semaphore: asyncio.Semaphore, stop_when_idle: bool,
+    ) -> None:
+        while True:
+            published = await asyncio.to_thread(self.syncPrompt)
+            if published is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            version, epoch = published
+            if await asyncio.to_thread(self.wouldExceedBudget):
+                log.warning(f'{self.worker_id}: budget cap reached, stopping')
+                return
+            ids = await asyncio.to_thread(
+                self.work_queue.lease,
+                self.worker_id, self.batch_size, self.lease_seconds,
+            )
+            if not ids:
+                if stop_when_idle:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            results = await asyncio.gather(*[
+                self.judgeOne(id_, version, epoch, semaphore)
+                for id_ in ids
+            ], return_exceptions=True)
+            committed = [
+                (id_, r) for id_, r in zip(ids, results)
+                if r is not None and not isinstance(r, BaseException)
+            ]
+            if self.store is not None and committed:
+                await asyncio.to_thread(
+                    self.writeToStore,
+                    [id_ for id_, _ in committed],
+                    [verdict for _, verdict in committed],
+                    version, epoch,
+                )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            breaker_errors = [
+                e for e in errors if isinstance(e, CircuitOpenError)
+            ]
+            for e in errors:
+                if not isinstance(e, CircuitOpenError):
+                    log.error(
+                        f'{self.worker_id}: judging failed',
+                        exc_info=e,
+                    )
+            if errors:
+                # give the leases back, so the items are not held
+                # until they expire
+                await asyncio.to_thread(
+                    self.work_queue.release, self.worker_id,
+                )
+            if breaker_errors:
+                retry_after = max(e.retry_after for e in breaker_errors)
+                log.warning(
+                    f'{self.worker_id}: circuit open, '
+                    f'pausing {retry_after:.0f} s'
+                )
+                await asyncio.sleep(max(retry_after, self.poll_interval))
+                continue
+            if errors:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            hedge_stats = self.arbiter.getHedgeStats()
+            breaker = self.arbiter.getCircuitBreaker()
+            connection_stats = self.arbiter.getConnectionStats()
+            log.info(
+                f'{self.worker_id}: {self.n_committed} committed, '
+                f'running cost ${self.arbiter.getRunningCost():.4f}'
+                + ('' if hedge_stats is None else f', {hedge_stats}')
+                + ('' if breaker is None else f', API {breaker.summary()}')
+                + ('' if connection_stats is None else (
+                    f', connections {connection_stats.summary()}'
+                ))
+            )
@@ -0,0 +1,129 @@
+'''
+Hedged requests: if a call is slower than a percentile of recent
+latencies, fire a duplicate and take whichever returns first.
+
+The sync OpenAI client cannot abort a request in flight, so the loser
+is cancelled only if it has not started, which is rare. Otherwise it
+runs to completion in the background: every hedged call pays for two
+full requests. The loser's cost is reported as hedging overhead.
+'''
+
+from __future__ import annotations
+
+import time
+import threading
+import typing as tp
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import (
+    ThreadPoolExecutor, Future, wait, FIRST_COMPLETED,
+    TimeoutError as FutureTimeoutError,
+)
+
+import numpy as np
+
+T = tp.TypeVar('T')
+
+@dataclass
+class HedgeStats:
+    n_calls: int = 0
+    n_hedged: int = 0
+    n_duplicate_won: int = 0
+    extra_USD: float = 0.0
+    saved_seconds: float = 0.0
+
+class Hedger:
+    def __init__(
+        self, percentile: float = 95.0, window: int = 200,
+        min_samples: int = 20, max_workers: int = 32,
+    ) -> None:
+        '''
+        No hedging until `min_samples` latencies are observed.
+        '''
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.stats = HedgeStats()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='hedge',
+        )
+
+    def threshold(self) -> float | None:
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            return float(np.percentile(self.latencies, self.percentile))
+
+    def timed(self, fn: tp.Callable[[], T]) -> tuple[T, float]:
+        '''
+        Returns the result and when it arrived.
+        '''
+        start = time.monotonic()
+        result = fn()
+        end = time.monotonic()
+        with self.lock:
+            self.latencies.append(end - start)
+        return result, end
+
+    def call(
+        self, fn: tp.Callable[[], T],
+        costOfLoser: tp.Callable[[T], float],
+    ) -> T:
+        '''
+        `costOfLoser` records and returns the USD cost of a duplicate
+        result that was not used. Both requests are paid for in full, 
+        as a started request is never cancelled.
+        '''
+        with self.lock:
+            self.stats.n_calls += 1
+        primary = self.executor.submit(self.timed, fn)
+        try:
+            result, _ = primary.result(timeout=self.threshold())
+            return result
+        except FutureTimeoutError:
+            pass
+        duplicate = self.executor.submit(self.timed, fn)
+        with self.lock:
+            self.stats.n_hedged += 1
+        pending = {primary, duplicate}
+        winner: Future[tuple[T, float]] | None = None
+        first_exception: BaseException | None = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: f is duplicate):
+                exception = future.exception()
+                if exception is None:
+                    winner = future
+                    break
+                first_exception = first_exception or exception
+        if winner is None:
+            assert first_exception is not None
+            raise first_exception
+        result, won_at = winner.result()
+        if winner is duplicate:
+            with self.lock:
+                self.stats.n_duplicate_won += 1
+        loser = primary if winner is duplicate else duplicate
+        if not loser.cancel():
+            loser.add_done_callback(lambda f: self.onLoserDone(
+                f, costOfLoser, won_at, winner is duplicate,
+            ))
+        return result
+
+    def onLoserDone(
+        self, loser: Future[tuple[T, float]],
+        costOfLoser: tp.Callable[[T], float],
+        won_at: float, did_duplicate_win: bool,
+    ) -> None:
+        if loser.cancelled() or loser.exception() is not None:
+            return
+        result, lost_at = loser.result()
+        cost = costOfLoser(result)
+        with self.lock:
+            self.stats.extra_USD += cost
+            if did_duplicate_win:
+                self.stats.saved_seconds += max(lost_at - won_at, 0.0)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
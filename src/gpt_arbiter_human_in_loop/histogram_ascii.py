@@ -1,14 +1,22 @@
 import typing as tp
 
+import numpy as np
 from textual.reactive import reactive
 from textual.widget import Widget
 from textual.widgets import Sparkline, Static
 from textual.containers import Container
 
+N_FINE_BINS = 1024
+
 class Histogram(Container):
-    data: reactive[list[float]] = reactive([])
+    '''
+    A histogram of values in [0, 1].
+    Values are kept as counts in `N_FINE_BINS` fixed bins, so adding or
+    removing one value is O(1), and redrawing is independent of how
+    many values there are.
+    '''
     axis_label: reactive[tuple[str, str]] = reactive(('', ''))
-    
+
     def __init__(self, axis_label: tuple[str, str], *args, **kw) -> None:
         '''
         '''
@@ -16,40 +24,78 @@ class Histogram(Container):
 
         self.sparkline = Sparkline()
         self.axisLabel = Static(classes='histogram-axis-label')
+        self.counts = np.zeros(N_FINE_BINS, dtype=np.int64)
+        self.is_redraw_scheduled = False
 
         self.axis_label = axis_label
-    
+
     def compose(self) -> tp.Iterable[Widget]:
         yield self.sparkline
         yield self.axisLabel
-    
+
     def watch_axis_label(self, _, new_axis_label: tuple[str, str]) -> None:
         W = self.size.width
         padding = W - len(new_axis_label[0]) - len(new_axis_label[1])
         self.axisLabel.update(
-            new_axis_label[0] + ' ' * padding + new_axis_label[1], 
+            new_axis_label[0] + ' ' * padding + new_axis_label[1],
         )
 
-    def watch_data(self, _, new_data: list[float]) -> None:
-        if not new_data:
-            self.sparkline.data = []
+    @staticmethod
+    def binOf(value: float) -> int:
+        return min(int(value * N_FINE_BINS), N_FINE_BINS - 1)
+
+    @property
+    def data(self) -> np.ndarray:
+        '''
+        Only the bin counts are kept.
+        '''
+        return self.counts
+
+    @data.setter
+    def data(self, values: tp.Sequence[float] | np.ndarray) -> None:
+        bins = np.minimum(
+            (np.asarray(values, dtype=np.float64) * N_FINE_BINS).astype(np.int64),
+            N_FINE_BINS - 1,
+        )
+        self.setCounts(np.bincount(bins, minlength=N_FINE_BINS))
+
+    def setCounts(self, counts: np.ndarray) -> None:
+        '''
+        `counts`: precomputed, over `N_FINE_BINS` equal bins of [0, 1].
+        '''
+        assert counts.shape == (N_FINE_BINS, )
+        self.counts = counts.astype(np.int64)
+        self.scheduleRedraw()
+
+    def add(self, value: float) -> None:
+        self.counts[self.binOf(value)] += 1
+        self.scheduleRedraw()
+
+    def remove(self, value: float) -> None:
+        self.counts[self.binOf(value)] -= 1
+        self.scheduleRedraw()
+
+    def scheduleRedraw(self) -> None:
+        # coalesce many updates into one redraw
+        if self.is_redraw_scheduled:
             return
+        self.is_redraw_scheduled = True
+        self.call_after_refresh(self.redraw)
+
+    def redraw(self) -> None:
+        self.is_redraw_scheduled = False
         W = self.size.width
         if W == 0:  # during init
             return
-        data_min = min(new_data)
-        data_max = max(new_data)
-        range_ = data_max - data_min
-        bin_size = range_ / W
-        sparkline_data = [0] * W
-        for value in new_data:
-            if range_ == 0:
-                bin = W // 2
-            else:
-                bin = min(int((value - data_min) / bin_size), W - 1)
-            sparkline_data[bin] += 1
-        self.sparkline.data = sparkline_data
-    
+        if not self.counts.any():
+            self.sparkline.data = []
+            return
+        # wider, edges would repeat and reduceat count bins twice.
+        # The sparkline stretches fewer columns to its width.
+        n_columns = min(W, N_FINE_BINS)
+        edges = np.linspace(0, N_FINE_BINS, n_columns + 1).astype(np.int64)
+        self.sparkline.data = np.add.reduceat(self.counts, edges[:-1]).tolist()
+
     def on_resize(self) -> None:
-        self.watch_data(self.data, self.data)
+        self.redraw()
         self.watch_axis_label(self.axis_label, self.axis_label)
@@ -0,0 +1,326 @@
+'''
+The order in which the judging loop visits ids, in bounded memory.
+
+- Unvisited ids come first, drawn lazily in random order.
+  - i.i.d. is important.
+  - A `Sequence` source is visited through a pseudo-random permutation
+    that is computed on the fly, in O(1) memory.
+  - Any other iterable goes through a shuffle buffer.
+    Use `BlockShuffledPages` for paged sources.
+- Visited ids follow, ordered by how probable GPT has new ideas about them.
+
+Only drawn and visited ids are held in memory.
+
+Draws may pull a slow source, e.g. a database. They are serialized by
+a lock, so they can run in worker threads. Reads never take it.
+'''
+
+from __future__ import annotations
+
+import math
+import random
+import threading
+import typing as tp
+
+from .shared import ItemStatus
+from .persistent import Persistent, ItemAnnotations
+
+def binaryEntropy(p: float) -> float:
+    return -p * math.log2(p) - (1 - p) * math.log2(
+        1 - p
+    ) if 0.0 < p < 1.0 else 0.0
+
+def entropy(probs: tp.Sequence[float]) -> float:
+    '''
+    Shannon entropy in bits. Equals `binaryEntropy` for 2 classes.
+    '''
+    return -sum(p * math.log2(p) for p in probs if p > 0.0)
+
+def revisitScore(anno: ItemAnnotations, Lambda: float) -> float:
+    '''
+    The math mirrors the query selection scoring.
+    '''
+    if anno.human_label_no_or_yes is not None:
+        return -2.0
+    k = anno.status.staleness
+    if k == 0:
+        return -1.0
+    return entropy(anno.probs()) * (1 - (1 - 1 / Lambda) ** k)
+
+def queryScore(anno: ItemAnnotations, Lambda: float) -> float:
+    '''
+    Average information gain of asking the human about this item.
+    '''
+    if anno.human_label_no_or_yes is not None:
+        return -1.0
+    match anno.status:
+        case ItemStatus.Unvisited():
+            return -1.0
+        case _:
+            k = anno.status.staleness
+    return entropy(anno.probs()) * (1 - 1 / Lambda) ** k
+
+class RandomPermutation:
+    '''
+    A pseudo-random bijection on range(n), in O(1) memory.
+    Feistel network with cycle walking.
+    '''
+    MULT = 0x9E3779B97F4A7C15
+    MASK_64 = (1 << 64) - 1
+
+    def __init__(
+        self, n: int, rng: random.Random | None = None, rounds: int = 4,
+    ) -> None:
+        rng = rng or random.Random()
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        bits += bits % 2
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [rng.getrandbits(64) for _ in range(rounds)]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def roundFunction(self, x: int, key: int) -> int:
+        h = ((x ^ key) * self.MULT) & self.MASK_64
+        h ^= h >> 29
+        return h & self.mask
+
+    def feistel(self, x: int) -> int:
+        left, right = x >> self.half, x & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self.roundFunction(right, key)
+        return (left << self.half) | right
+
+    def __getitem__(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        x = self.feistel(i)
+        while x >= self.n:
+            x = self.feistel(x)
+        return x
+
+    def __iter__(self) -> tp.Iterator[int]:
+        for i in range(self.n):
+            yield self[i]
+
+def shuffleBuffered(
+    source: tp.Iterable[str], buffer_size: int,
+    rng: random.Random | None = None,
+) -> tp.Iterator[str]:
+    '''
+    Approximately random order.
+    Correlation in `source` shorter than `buffer_size` is removed.
+    '''
+    rng = rng or random.Random()
+    buffer: list[str] = []
+    for id_ in source:
+        if len(buffer) < buffer_size:
+            buffer.append(id_)
+            continue
+        j = rng.randrange(buffer_size)
+        yield buffer[j]
+        buffer[j] = id_
+    rng.shuffle(buffer)
+    yield from buffer
+
+class BlockShuffledPages:
+    '''
+    Block shuffle for paged id sources.
+    Pages are opened in random order, `n_open` at a time, and ids are
+    drawn uniformly from the union of open pages.
+    '''
+    def __init__(
+        self, n_pages: int, getPage: tp.Callable[[int], tp.Sequence[str]],
+        n_open: int = 8, rng: random.Random | None = None,
+    ) -> None:
+        self.n_pages = n_pages
+        self.getPage = getPage
+        self.n_open = n_open
+        self.rng = rng or random.Random()
+
+    def __iter__(self) -> tp.Iterator[str]:
+        page_order = iter(RandomPermutation(self.n_pages, self.rng))
+        pool: list[str] = []
+        def refill() -> bool:
+            try:
+                page_i = next(page_order)
+            except StopIteration:
+                return False
+            pool.extend(self.getPage(page_i))
+            return True
+        for _ in range(self.n_open):
+            refill()
+        page_size = max(len(pool) // max(self.n_open, 1), 1)
+        while pool:
+            j = self.rng.randrange(len(pool))
+            pool[j], pool[-1] = pool[-1], pool[j]
+            yield pool.pop()
+            if len(pool) < page_size * (self.n_open - 1):
+                refill()
+
+class IdQueue:
+    def __init__(
+        self, source: tp.Iterable[str], persistent: Persistent,
+        Lambda: float, shuffle_buffer: int = 100_000,
+        total: int | None = None, rng: random.Random | None = None,
+        source_ids: tp.Container[str] | None = None,
+    ) -> None:
+        '''
+        `total`: the number of ids in `source`, if it has no `len()`.
+        Only used for display.
+        `rng`: seeds the order of unvisited ids, e.g. for replays.
+        `source_ids`: which annotated ids to revisit, e.g. not those of 
+        an older, larger source. It only needs to hold annotated ids. 
+        Defaults to those in `source` if it is a `Sequence`, found in 
+        one pass. A stream cannot be checked up front, so then all 
+        annotated ids are revisited.
+        '''
+        self.persistent = persistent
+        if total is None and isinstance(source, tp.Sized):
+            total = len(source)
+        self.total = total
+
+        visited = [*persistent.items()]
+        if source_ids is None and isinstance(source, tp.Sequence) and visited:
+            annotated = {id_ for id_, _ in visited}
+            source_ids = {id_ for id_ in source if id_ in annotated}
+        if source_ids is not None:
+            visited = [item for item in visited if item[0] in source_ids]
+        visited.sort(
+            key=lambda item: revisitScore(item[1], Lambda), reverse=True,
+        )
+        self.visited: list[str] = [id_ for id_, _ in visited]
+        self.visited_index = {id_: j for j, id_ in enumerate(self.visited)}
+        self.drawn: list[str] = []
+        self.drawn_index: dict[str, int] = {}
+        self.exhausted = False
+        self.draw_lock = threading.Lock()
+
+        if isinstance(source, tp.Sequence):
+            seq = source
+            shuffled: tp.Iterator[str] = (
+                seq[i] for i in RandomPermutation(len(seq), rng)
+            )
+        else:
+            shuffled = shuffleBuffered(source, shuffle_buffer, rng)
+        self.stream = (
+            id_ for id_ in shuffled
+            if persistent.get(id_).status == ItemStatus.Unvisited()
+        )
+
+    def draw(self) -> bool:
+        '''
+        Call with `draw_lock` held.
+        '''
+        try:
+            id_ = next(self.stream)
+        except StopIteration:
+            self.exhausted = True
+            return False
+        self.drawn_index[id_] = len(self.drawn)
+        self.drawn.append(id_)
+        return True
+
+    def ready(self, i: int) -> bool:
+        '''
+        Whether `at(i)` returns without drawing.
+        '''
+        return i < len(self.drawn) or self.exhausted
+
+    def at(self, i: int) -> str | None:
+        '''
+        The id at queue position `i`, drawing lazily. `None` past the end.
+        '''
+        if not self.ready(i):
+            with self.draw_lock:
+                while i >= len(self.drawn) and not self.exhausted:
+                    self.draw()
+        n_drawn = len(self.drawn)
+        if i < n_drawn:
+            return self.drawn[i]
+        j = i - n_drawn
+        if j < len(self.visited):
+            return self.visited[j]
+        return None
+
+    def peek(self, i: int) -> str | None:
+        '''
+        Like `at()`, but never draws. `None` for not yet drawn positions.
+        '''
+        n_drawn = len(self.drawn)
+        if i < n_drawn:
+            return self.drawn[i]
+        j = i - n_drawn - self.nPending(n_drawn)
+        if 0 <= j < len(self.visited):
+            return self.visited[j]
+        return None
+
+    def position(self, id_: str) -> int | None:
+        '''
+        The inverse of `peek()`. `None` if not drawn yet.
+        '''
+        i = self.drawn_index.get(id_)
+        if i is not None:
+            return i
+        j = self.visited_index.get(id_)
+        if j is not None:
+            n_drawn = len(self.drawn)
+            return n_drawn + self.nPending(n_drawn) + j
+        return None
+
+    def nextIndex(self, i: int) -> int:
+        '''
+        Wraps around at the end.
+        '''
+        if self.at(i + 1) is None:
+            return 0
+        return i + 1
+
+    def nPending(self, n_drawn: int | None = None) -> int:
+        '''
+        How many unvisited ids are not drawn yet, as far as we know.
+        '''
+        if self.total is None:
+            return 0
+        if n_drawn is None:
+            n_drawn = len(self.drawn)
+        return max(self.total - n_drawn - len(self.visited), 0)
+
+    def __len__(self) -> int:
+        n_drawn = len(self.drawn)
+        return n_drawn + self.nPending(n_drawn) + len(self.visited)
+
+    def sample(self, k: int) -> list[str]:
+        '''
+        The head of the queue is a random sample of unvisited ids.
+        '''
+        ids = [self.at(i) for i in range(k)]
+        return [id_ for id_ in ids if id_ is not None]
+
+    def symbols(self) -> QueueSymbols:
+        return QueueSymbols(self)
+
+class QueueSymbols(tp.Sequence[str]):
+    '''
+    A lazy view of the status symbol at each queue position.
+    '''
+    def __init__(self, queue: IdQueue) -> None:
+        self.queue = queue
+        self.length = len(queue)
+
+    def __len__(self) -> int:
+        return self.length
+
+    @tp.overload
+    def __getitem__(self, i: int) -> str: ...
+    @tp.overload
+    def __getitem__(self, i: slice) -> tp.Sequence[str]: ...
+    def __getitem__(self, i: int | slice) -> str | tp.Sequence[str]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        id_ = self.queue.peek(i)
+        if id_ is None:
+            return ItemStatus.Unvisited().getSymbol()
+        return self.queue.persistent.get(id_).status.getSymbol()
@@ -0,0 +1,44 @@
+'''
+On-disk cache of interrogation responses, one file per entry.
+Keyed by (model, prompt, question, decision, max_tokens), so asking
+again, e.g. after a restart, neither pays nor waits.
+'''
+
+import os
+import json
+import hashlib
+
+class InterrogationCache:
+    def __init__(self, /, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.n_hits = 0
+        self.n_misses = 0
+
+    @staticmethod
+    def key(
+        model: str, prompt: str, question: str, decision: str,
+        max_tokens: int,
+    ) -> str:
+        j = json.dumps([model, prompt, question, decision, max_tokens])
+        return hashlib.sha256(j.encode('utf-8')).hexdigest()
+
+    def filename(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key: str) -> str | None:
+        try:
+            with open(self.filename(key), 'r', encoding='utf-8') as f:
+                response: str = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.n_misses += 1
+            return None
+        self.n_hits += 1
+        return response
+
+    def put(self, key: str, response: str) -> None:
+        filename = self.filename(key)
+        tmp = filename + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(response, f)
+        os.replace(tmp, filename)
@@ -0,0 +1,269 @@
+'''
+A local HTTP labeling service beside the `UI`, so several people can
+label one session concurrently.
+
+- Each labeler is assigned a different query candidate, under a lease.
+- Submits are applied by the `UI`, one at a time, on its event loop.
+- Binds to localhost by default. There is no authentication.
+
+Endpoints, all JSON except `/`:
+- `GET /`: a minimal labeling page.
+- `GET /next?labeler=NAME`: assigns and returns the next query.
+- `GET /why?labeler=NAME&track=I&id=ID`: interrogates the model on
+  a query assigned to the labeler. 503 with `retry_after` seconds
+  while the API circuit breaker is open.
+  Returns `[decision, reason]` pairs for the top two classes.
+- `POST /submit`: `{labeler, track, id, label, explanation}`.
+- `POST /release`: `{labeler, track, id}`, to skip a query.
+
+A query is an id in one track. `track` defaults to 0, the main track.
+'''
+
+from __future__ import annotations
+
+import json
+import time
+import threading
+import typing as tp
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from .circuit_breaker import CircuitOpenError
+
+if tp.TYPE_CHECKING:
+    from .UI import UI
+    from .track import QueryKey
+
+class Assignments:
+    '''
+    Which remote labeler holds which query. Expired leases are free again.
+    '''
+    def __init__(self, lease_seconds: float = 600.0) -> None:
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        self.held: dict[QueryKey, tuple[str, float]] = {}
+
+    def expire(self) -> None:
+        now = time.time()
+        for key, (_, expiry) in [*self.held.items()]:
+            if expiry < now:
+                del self.held[key]
+
+    def assign(self, key: QueryKey, labeler: str) -> None:
+        with self.lock:
+            self.held[key] = (labeler, time.time() + self.lease_seconds)
+
+    def holder(self, key: QueryKey) -> str | None:
+        with self.lock:
+            self.expire()
+            labeler, _ = self.held.get(key, (None, None))
+            return labeler
+
+    def heldBy(self, labeler: str) -> list[QueryKey]:
+        with self.lock:
+            self.expire()
+            return [
+                key for key, (holder, _) in self.held.items()
+                if holder == labeler
+            ]
+
+    def release(self, key: QueryKey) -> None:
+        with self.lock:
+            self.held.pop(key, None)
+
+    def active(self) -> set[QueryKey]:
+        with self.lock:
+            self.expire()
+            return {*self.held}
+
+class LabelingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, app: UI, host: str = '127.0.0.1', port: int = 8765) -> None:
+        super().__init__((host, port), LabelingHandler)
+        self.app = app
+        self.thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(
+            target=self.serve_forever, name='labeling-server', daemon=True,
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+class LabelingHandler(BaseHTTPRequestHandler):
+    server: LabelingServer
+
+    def log_message(self, format: str, *args: tp.Any) -> None:
+        # stderr belongs to the TUI
+        self.server.app.log(format % args)
+
+    def reply(self, status: int, body: tp.Any) -> None:
+        if isinstance(body, str):
+            data = body.encode('utf-8')
+            content_type = 'text/html; charset=utf-8'
+        else:
+            data = json.dumps(body).encode('utf-8')
+            content_type = 'application/json'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        app = self.server.app
+        match url.path:
+            case '/':
+                self.reply(200, PAGE)
+            case '/next':
+                labeler = query.get('labeler')
+                if not labeler:
+                    self.reply(400, {'error': 'missing labeler'})
+                    return
+                assigned = app.call_from_thread(app.assignQuery, labeler)
+                self.reply(200, assigned)
+            case '/why':
+                id_ = query.get('id')
+                if not id_:
+                    self.reply(400, {'error': 'missing id'})
+                    return
+                try:
+                    track = int(query.get('track', 0))
+                except ValueError:
+                    self.reply(400, {'error': 'bad track'})
+                    return
+                if not 0 <= track < len(app.tracks):
+                    self.reply(400, {'error': 'bad track'})
+                    return
+                # interrogations are paid, so only the holder may ask, as in /submit
+                if app.assignments.holder((track, id_)) != query.get('labeler'):
+                    self.reply(409, {'error': 'not assigned to you'})
+                    return
+                try:
+                    reasons = app.call_from_thread(
+                        app.interrogateFor, (track, id_),
+                    )
+                except CircuitOpenError as e:
+                    self.reply(503, {
+                        'error': 'API paused', 'retry_after': e.retry_after,
+                    })
+                    return
+                self.reply(200, {'reasons': reasons})
+            case _:
+                self.reply(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+            labeler = str(body['labeler'])
+            key = (int(body.get('track', 0)), str(body['id']))
+        except (ValueError, KeyError, TypeError):
+            self.reply(400, {'error': 'bad request'})
+            return
+        app = self.server.app
+        assignments = app.assignments
+        if assignments.holder(key) != labeler:
+            self.reply(409, {'error': 'not assigned to you'})
+            return
+        match urlparse(self.path).path:
+            case '/submit':
+                try:
+                    label = int(body['label'])
+                except (ValueError, KeyError, TypeError):
+                    self.reply(400, {'error': 'bad label'})
+                    return
+                if not 0 <= label < len(app.tracks[key[0]].class_names):
+                    self.reply(400, {'error': 'bad label'})
+                    return
+                explanation = (body.get('explanation') or '').strip() or None
+                ok = app.call_from_thread(
+                    app.submitLabel, key, label, explanation,
+                )
+                assignments.release(key)
+                if not ok:
+                    self.reply(409, {'error': 'already labeled'})
+                    return
+                self.reply(200, {'ok': True})
+            case '/release':
+                assignments.release(key)
+                self.reply(200, {'ok': True})
+            case _:
+                self.reply(404, {'error': 'not found'})
+
+PAGE = '''<!doctype html>
+<html><head><meta charset="utf-8"><title>GPT Arbiter</title>
+<style>
+body { font-family: sans-serif; max-width: 60em; margin: auto; }
+pre { white-space: pre-wrap; background: #eee; padding: .5em; }
+</style></head>
+<body>
+<p>Labeler: <input id="labeler"> <button onclick="next()">Next</button></p>
+<div id="query" hidden>
+  <p><b id="id"></b> (<span id="track"></span>) GPT said "<span id="decision"></span>" (<span id="verdict"></span>), staleness <span id="staleness"></span>.</p>
+  <pre id="classifiee"></pre>
+  <details><summary>With examples</summary><pre id="with-examples"></pre></details>
+  <p><button onclick="why()">Ask GPT why</button></p>
+  <div id="why"></div>
+  <p><input id="explanation" size="60" placeholder="Explanation (optional)"></p>
+  <p><span id="labels"></span> <button onclick="skip()">Skip</button></p>
+</div>
+<p id="status"></p>
+<script>
+let current = null;
+const $ = (id) => document.getElementById(id);
+const labeler = () => $('labeler').value.trim();
+async function post(path, body) {
+  const r = await fetch(path, {method: 'POST', body: JSON.stringify(
+    Object.assign({labeler: labeler(), track: current.track, id: current.id}, body))});
+  return [r.ok, await r.json()];
+}
+async function next() {
+  if (!labeler()) { $('status').textContent = 'Enter your name.'; return; }
+  const r = await fetch('/next?labeler=' + encodeURIComponent(labeler()));
+  current = await r.json();
+  $('query').hidden = current === null;
+  $('why').textContent = $('explanation').value = '';
+  if (current === null) { $('status').textContent = 'Nothing to label now.'; return; }
+  $('status').textContent = '';
+  $('id').textContent = current.id;
+  $('track').textContent = current.track_name;
+  $('decision').textContent = current.gpt_decision;
+  $('verdict').textContent = (current.gpt_confidence * 100).toFixed(1) + '%';
+  $('labels').replaceChildren(...current.classes.map((name, i) => {
+    const b = document.createElement('button');
+    b.textContent = name;
+    b.onclick = () => submit(i);
+    return b;
+  }));
+  $('staleness').textContent = current.staleness;
+  $('classifiee').textContent = current.classifiee;
+  $('with-examples').textContent = current.with_examples;
+}
+async function why() {
+  $('why').textContent = '...';
+  const r = await fetch('/why?labeler=' + encodeURIComponent(labeler()) +
+    '&track=' + current.track + '&id=' + encodeURIComponent(current.id));
+  const reply = await r.json();
+  if (!r.ok) { $('why').textContent = reply.error; return; }
+  $('why').replaceChildren(...reply.reasons.map(([decision, reason]) => {
+    const p = document.createElement('p');
+    p.textContent = decision + ': ' + reason;
+    return p;
+  }));
+}
+async function submit(label) {
+  const [ok, reply] = await post('/submit', {label: label, explanation: $('explanation').value});
+  $('status').textContent = ok ? 'Submitted.' : reply.error;
+  next();
+}
+async function skip() { await post('/release', {}); next(); }
+</script>
+</body></html>
+'''
@@ -0,0 +1,84 @@
+'''
+Nearest neighbours over caller-supplied item vectors, for
+similarity-aware staleness.
+
+By default, each label makes every judged item one step more stale.
+With a `NeighborIndex`, a label only does that to the `k` items most
+similar to the labeled one. Items far from every new label stay
+classified and are not re-judged. Since staleness then only counts
+relevant labels, a `Lambda` close to 1 fits this mode.
+
+Brute-force cosine similarity in numpy, one chunk of rows at a time,
+so `vectors` can be a `numpy.memmap` larger than RAM.
+'''
+
+from __future__ import annotations
+
+import typing as tp
+
+import numpy as np
+
+class NeighborIndex:
+    def __init__(
+        self, ids: tp.Sequence[str], vectors: np.ndarray,
+        k: int = 100, min_similarity: float | None = None,
+        chunk_size: int = 65536,
+    ) -> None:
+        '''
+        `vectors[i]` is the feature vector of `ids[i]`.
+        `min_similarity`: also drop neighbours below this cosine.
+        '''
+        assert len(ids) == len(vectors)
+        self.ids = ids
+        self.row_of = {id_: i for i, id_ in enumerate(ids)}
+        self.vectors = vectors
+        self.k = k
+        self.min_similarity = min_similarity
+        self.chunk_size = chunk_size
+        self.norms = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            self.norms[start:start + len(chunk)] = np.linalg.norm(chunk, axis=1)
+        # zero vectors are similar to nothing
+        self.norms[self.norms == 0.0] = np.inf
+
+    @classmethod
+    def fromNpy(
+        cls, ids: tp.Sequence[str], path: str, **kw,
+    ) -> NeighborIndex:
+        '''
+        Memory-maps a `.npy` file of shape (len(ids), dim).
+        '''
+        return cls(ids, np.load(path, mmap_mode='r'), **kw)
+
+    def near(self, id_: str) -> list[str] | None:
+        '''
+        The `k` most similar ids, `id_` included.
+        `None` if `id_` has no vector.
+        '''
+        row = self.row_of.get(id_)
+        if row is None:
+            return None
+        query = np.asarray(self.vectors[row], dtype=np.float32)
+        query = query / self.norms[row]
+        best_rows: list[np.ndarray] = []
+        best_sims: list[np.ndarray] = []
+        for start in range(0, len(self.ids), self.chunk_size):
+            chunk = np.asarray(
+                self.vectors[start:start + self.chunk_size], dtype=np.float32,
+            )
+            sims = chunk @ query / self.norms[start:start + len(chunk)]
+            if len(sims) > self.k:
+                top = np.argpartition(sims, -self.k)[-self.k:]
+            else:
+                top = np.arange(len(sims))
+            best_rows.append(top + start)
+            best_sims.append(sims[top])
+        rows = np.concatenate(best_rows)
+        sims = np.concatenate(best_sims)
+        if len(sims) > self.k:
+            top = np.argpartition(sims, -self.k)[-self.k:]
+            rows, sims = rows[top], sims[top]
+        if self.min_similarity is not None:
+            rows = rows[sims >= self.min_similarity]
+        return [self.ids[i] for i in rows.tolist()]
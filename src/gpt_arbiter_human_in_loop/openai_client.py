@@ -1,32 +1,127 @@
 import os
 import logging
+import functools
 
+import httpx
 import openai
 import dotenv
 import tenacity
 
+from .circuit_breaker import CircuitBreaker
+from .connection_stats import ConnectionStats
+from .telemetry import countRetryInThisThread
+
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-def initClients():
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,  # includes APITimeoutError
+)
+
+def initClients(
+    breaker: CircuitBreaker | None = None,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 32,
+    keepalive_expiry: float = 60.0,
+    http2: bool = False,
+    stats: ConnectionStats | None = None,
+):
+    '''
+    `breaker`: shared by both clients. Open, it fails calls fast with
+    `CircuitOpenError` instead of retrying them.
+    `max_keepalive_connections` should cover the judging concurrency, 
+    and `keepalive_expiry` the gaps between calls, so that TLS 
+    handshakes stay off the critical path.
+    `http2` needs the `h2` package, 
+    e.g. `pip install gpt-arbiter-human-in-loop[http2]`.
+    `stats`: counts new vs. reused connections.
+    '''
+    backoff = tenacity.wait_exponential_jitter(initial=1, max=30)
+    def wait(retry_state: tenacity.RetryCallState) -> float:
+        if breaker is not None and breaker.isOpen():
+            return 0.0  # the next attempt fails fast
+        return backoff(retry_state)
+
+    def beforeSleep(retry_state: tenacity.RetryCallState) -> None:
+        countRetryInThisThread()
+        if breaker is not None:
+            breaker.recordRetry()
+        tenacity.before_sleep_log(log, logging.WARNING)(retry_state)
+
     def decorator():
         return tenacity.retry(
             retry=(
                 tenacity.retry_if_exception_type(openai.RateLimitError) |
                 tenacity.retry_if_exception_type(openai.InternalServerError)
             ),
-            wait=tenacity.wait_exponential_jitter(initial=1, max=30),
+            wait=wait,
             stop=tenacity.stop_after_attempt(6),
-            before_sleep=tenacity.before_sleep_log(log, logging.WARNING),
+            before_sleep=beforeSleep,
         )
 
+    def guard(create):
+        if breaker is None:
+            return create
+        @functools.wraps(create)
+        def guarded(*a, **kw):
+            breaker.acquire()
+            try:
+                result = create(*a, **kw)
+            except TRANSIENT_ERRORS:
+                breaker.recordFailure()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.recordSuccess()
+            return result
+        return guarded
+
+    def guardAsync(create):
+        if breaker is None:
+            return create
+        @functools.wraps(create)
+        async def guarded(*a, **kw):
+            breaker.acquire()
+            try:
+                result = await create(*a, **kw)
+            except TRANSIENT_ERRORS:
+                breaker.recordFailure()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.recordSuccess()
+            return result
+        return guarded
+
     dotenv.load_dotenv()
 
     api_Key = os.getenv('OPENAI_API_KEY')
 
-    client      = openai.     OpenAI(api_key=api_Key)
-    client     .chat.completions.create = decorator()(client     .chat.completions.create)
-    clientAsync = openai.AsyncOpenAI(api_key=api_Key)
-    clientAsync.chat.completions.create = decorator()(clientAsync.chat.completions.create)
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            log.warning('HTTP/2 needs the `h2` package. Falling back to HTTP/1.1.')
+            http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    hooks      = {} if stats is None else {'request': [stats.onRequest]}
+    hooksAsync = {} if stats is None else {'request': [stats.onRequestAsync]}
+
+    client      = openai.     OpenAI(api_key=api_Key, http_client=openai.     DefaultHttpxClient(
+        limits=limits, http2=http2, event_hooks=hooks,
+    ))
+    client     .chat.completions.create = decorator()(guard     (client     .chat.completions.create))
+    clientAsync = openai.AsyncOpenAI(api_key=api_Key, http_client=openai.DefaultAsyncHttpxClient(
+        limits=limits, http2=http2, event_hooks=hooksAsync,
+    ))
+    clientAsync.chat.completions.create = decorator()(guardAsync(clientAsync.chat.completions.create))
 
     return client, clientAsync
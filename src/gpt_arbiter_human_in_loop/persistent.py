@@ -9,9 +9,16 @@ from pydantic import BaseModel, ConfigDict, field_serializer, field_validator
 from .shared import ItemStatus
 
 class ItemAnnotations(BaseModel):
+    # P(Yes). With more than 2 classes, the top class probability.
     gpt_verdict: float | None
     status: ItemStatus.Base
+    # The labeled class index. 0 or 1, i.e. No or Yes, when binary.
+    # The name predates K-way prompts and is kept for stored files.
     human_label_no_or_yes: int | None
+    # Only with more than 2 classes.
+    gpt_probs: tuple[float, ...] | None = None
+    # `PromptAndExamples.version` that `gpt_verdict` came from.
+    prompt_version: str | None = None
 
     model_config = ConfigDict(
         frozen=True,
@@ -29,6 +36,40 @@ class ItemAnnotations(BaseModel):
             return v
         return ItemStatus.deserialize(v)
 
+    @classmethod
+    def fromProbs(
+        cls, probs: tp.Sequence[float], status: ItemStatus.Base, 
+        human_label_no_or_yes: int | None = None, is_binary: bool = True, 
+        prompt_version: str | None = None, 
+    ) -> ItemAnnotations:
+        if is_binary:
+            return ItemAnnotations(
+                gpt_verdict=probs[1],
+                status=status,
+                human_label_no_or_yes=human_label_no_or_yes,
+                prompt_version=prompt_version,
+            )
+        return ItemAnnotations(
+            gpt_verdict=max(probs),
+            status=status,
+            human_label_no_or_yes=human_label_no_or_yes,
+            gpt_probs=tuple(probs),
+            prompt_version=prompt_version,
+        )
+
+    def probs(self) -> tuple[float, ...]:
+        '''
+        GPT's distribution over classes.
+        '''
+        if self.gpt_probs is not None:
+            return self.gpt_probs
+        assert self.gpt_verdict is not None
+        return (1 - self.gpt_verdict, self.gpt_verdict)
+
+    def decision(self) -> int:
+        probs = self.probs()
+        return max(range(len(probs)), key=probs.__getitem__)
+
     @classmethod
     def Unvisited(cls) -> ItemAnnotations:
         return ItemAnnotations(
@@ -43,17 +84,18 @@ class ItemAnnotations(BaseModel):
                 return self
             case _:
                 k = self.status.staleness
-        return ItemAnnotations(
-            gpt_verdict=self.gpt_verdict,
+        return self.model_copy(update=dict(
             status=ItemStatus.Outdated(k + 1),
-            human_label_no_or_yes=self.human_label_no_or_yes,
-        )
+        ))
 
 class Persistent:
     def __init__(self, /, path: str) -> None:
         self.path = path
         self.__data: dict[str, ItemAnnotations] = {}
         self.is_in_context = False
+        self.observers: list[tp.Callable[
+            [str, ItemAnnotations, ItemAnnotations], None, 
+        ]] = []
     
     @contextmanager
     def Context(self) -> tp.Generator[dict[str, ItemAnnotations], None, None]:
@@ -62,7 +104,10 @@ class Persistent:
             with open(self.path, 'r', encoding='utf-8') as f:
                 raw: dict = json.load(f)
             for k, v in raw.items():
-                self.__data[k] = ItemAnnotations.model_validate(v)
+                anno = ItemAnnotations.model_validate(v)
+                # only visited items are stored
+                if anno.status != ItemStatus.Unvisited():
+                    self.__data[k] = anno
         except FileNotFoundError:
             pass
         self.is_in_context = True
@@ -72,7 +117,10 @@ class Persistent:
             self.is_in_context = False
             with open(self.path, 'w', encoding='utf-8') as f:
                 json.dump(
-                    {k: v.model_dump() for k, v in self.__data.items()},
+                    {
+                        k: v.model_dump(exclude_defaults=True)
+                        for k, v in self.__data.items()
+                    },
                     f,
                     indent=2,
                 )
@@ -83,16 +131,60 @@ class Persistent:
     
     def set(self, id_: str, ann: ItemAnnotations) -> None:
         assert self.is_in_context
+        if self.observers:
+            old = self.get(id_)
+            for observer in self.observers:
+                observer(id_, old, ann)
         self.__data[id_] = ann
+    
+    def pop(self, id_: str) -> None:
+        '''
+        Forgets `id_`, which becomes Unvisited.
+        '''
+        assert self.is_in_context
+        if id_ not in self.__data:
+            return
+        if self.observers:
+            old = self.__data[id_]
+            for observer in self.observers:
+                observer(id_, old, ItemAnnotations.Unvisited())
+        del self.__data[id_]
+    
+    def observe(self, observer: tp.Callable[
+        [str, ItemAnnotations, ItemAnnotations], None, 
+    ]) -> None:
+        '''
+        `observer(id_, old, new)` is called on every `set()`, 
+        so that views can update incrementally.  
+        '''
+        self.observers.append(observer)
+    
+    def items(self) -> list[tuple[str, ItemAnnotations]]:
+        '''
+        A snapshot of all visited items. Safe to iterate from another thread.  
+        '''
+        assert self.is_in_context
+        return list(self.__data.items())
 
-    def labelOne(self, id_: str, label: int) -> None:
+    def labelOne(
+        self, id_: str, label: int, near: tp.Iterable[str] | None = None, 
+    ) -> None:
+        '''
+        `near`: only these items become more stale. Default: all.  
+        '''
         old = self.get(id_)
-        self.set(id_, ItemAnnotations(
-            gpt_verdict=old.gpt_verdict,
+        self.set(id_, old.model_copy(update=dict(
             status=ItemStatus.Classified(),
             human_label_no_or_yes=label,
-        ))
-        for other, anno in self.__data.items():
+        )))
+        if near is None:
+            others: tp.Iterable[tuple[str, ItemAnnotations]] = self.__data.items()
+        else:
+            others = [
+                (other, self.__data[other]) 
+                for other in near if other in self.__data
+            ]
+        for other, anno in others:
             if other == id_:
                 continue
             self.set(other, anno.afterOneLabel())
@@ -0,0 +1,286 @@
+'''
+A fixed-width, memory-mapped `Persistent` for corpora too large to
+load into Python objects.
+
+A store is a directory of two `.npy` files:
+- `ids.npy`: all ids, sorted, as fixed-width bytes. Lookups bisect it.
+- `annotations.npy`: one record per id, in the same order.
+  - `verdict` float32, NaN if not judged.
+  - `status` int32: -1 if unvisited, else the staleness, i.e. how many
+    labels ago the item was judged.
+  - `label` int8, -1 if not labeled.
+  - `probs` float32 x K, only in stores made for K > 2 classes.
+  - `version` 16 bytes, the prompt version of the verdict, or empty.
+
+Opening maps both files, so startup time does not grow with the
+corpus. `set()` writes in place. Read-only consumers, e.g. dashboards
+and exports, open the store with `readonly=True` and share the page
+cache with the writer.
+
+The set of ids is fixed when the store is created.
+
+The `UI` does not take a store: it scans and observes annotations
+on every label, and here each row is decoded into Python objects.
+A store is written by one `HeadlessWorker` (`store=`), batch by batch
+with `writeVerdicts()`, and read by exports and dashboards. Readers
+of whole columns use `visited()`, which decodes nothing.
+'''
+
+from __future__ import annotations
+
+import os
+import json
+import typing as tp
+from contextlib import contextmanager
+
+import numpy as np
+
+from .shared import ItemStatus
+from .persistent import Persistent, ItemAnnotations
+
+IDS_FILENAME = 'ids.npy'
+ANNOTATIONS_FILENAME = 'annotations.npy'
+
+def recordDtype(n_classes: int = 2) -> np.dtype:
+    fields: list[tuple] = [
+        ('verdict', '<f4'), ('status', '<i4'), ('label', 'i1'),
+        ('version', 'S16'),
+    ]
+    if n_classes > 2:
+        fields.append(('probs', '<f4', (n_classes, )))
+    return np.dtype(fields)
+
+class MemmapPersistent(Persistent):
+    def __init__(self, /, path: str, readonly: bool = False) -> None:
+        super().__init__(path)
+        self.readonly = readonly
+        self.ids: np.ndarray | None = None
+        self.records: np.ndarray | None = None
+
+    @classmethod
+    def create(
+        cls, path: str, ids: tp.Iterable[str], n_classes: int = 2,
+    ) -> MemmapPersistent:
+        '''
+        Makes an empty store with every id unvisited.
+        '''
+        encoded = np.unique(np.array(
+            [id_.encode('utf-8') for id_ in ids], dtype=np.bytes_,
+        ))
+        os.makedirs(path)
+        idsArray = np.lib.format.open_memmap(
+            os.path.join(path, IDS_FILENAME), mode='w+',
+            dtype=encoded.dtype, shape=encoded.shape,
+        )
+        idsArray[:] = encoded
+        idsArray.flush()
+        records = np.lib.format.open_memmap(
+            os.path.join(path, ANNOTATIONS_FILENAME), mode='w+',
+            dtype=recordDtype(n_classes), shape=encoded.shape,
+        )
+        records['verdict'] = np.nan
+        records['status'] = -1
+        records['label'] = -1
+        records['version'] = b''
+        if n_classes > 2:
+            records['probs'] = np.nan
+        records.flush()
+        return cls(path)
+
+    @classmethod
+    def fromJson(
+        cls, json_path: str, path: str, ids: tp.Iterable[str],
+        n_classes: int = 2,
+    ) -> MemmapPersistent:
+        '''
+        Migrates a JSON `Persistent` file into a new store over `ids`.
+        '''
+        store = cls.create(path, ids, n_classes)
+        with open(json_path, 'r', encoding='utf-8') as f:
+            raw: dict = json.load(f)
+        with store.Context():
+            for id_, v in raw.items():
+                store.set(id_, ItemAnnotations.model_validate(v))
+        return store
+
+    @contextmanager
+    def Context(self) -> tp.Generator[np.ndarray, None, None]:
+        assert self.records is None
+        self.ids = np.load(
+            os.path.join(self.path, IDS_FILENAME), mmap_mode='r',
+        )
+        records = np.load(
+            os.path.join(self.path, ANNOTATIONS_FILENAME),
+            mmap_mode='r' if self.readonly else 'r+',
+        )
+        self.records = records
+        self.is_in_context = True
+        try:
+            yield records
+        finally:
+            self.is_in_context = False
+            if not self.readonly:
+                records.flush()
+            self.ids = None
+            self.records = None
+
+    def row(self, id_: str) -> int | None:
+        assert self.ids is not None
+        key = id_.encode('utf-8')
+        i = int(np.searchsorted(self.ids, key))
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return None
+
+    def decode(self, i: int) -> ItemAnnotations:
+        assert self.records is not None
+        record = self.records[i]
+        status_code = int(record['status'])
+        if status_code == -1:
+            return ItemAnnotations.Unvisited()
+        verdict = float(record['verdict'])
+        label = int(record['label'])
+        gpt_probs = None
+        if 'probs' in record.dtype.names and not np.isnan(verdict):
+            gpt_probs = tuple(record['probs'].tolist())
+        prompt_version = None
+        if 'version' in record.dtype.names and record['version']:
+            prompt_version = record['version'].decode('ascii')
+        return ItemAnnotations(
+            gpt_verdict=None if np.isnan(verdict) else verdict,
+            status=(
+                ItemStatus.Classified() if status_code == 0 else
+                ItemStatus.Outdated(status_code)
+            ),
+            human_label_no_or_yes=None if label == -1 else label,
+            gpt_probs=gpt_probs,
+            prompt_version=prompt_version,
+        )
+
+    def encode(self, i: int, ann: ItemAnnotations) -> None:
+        assert self.records is not None
+        record = self.records[i:i + 1]
+        record['verdict'] = (
+            np.nan if ann.gpt_verdict is None else ann.gpt_verdict
+        )
+        record['status'] = (
+            -1 if ann.status == ItemStatus.Unvisited() else
+            ann.status.staleness
+        )
+        record['label'] = (
+            -1 if ann.human_label_no_or_yes is None else
+            ann.human_label_no_or_yes
+        )
+        if 'probs' in self.records.dtype.names:
+            record['probs'] = (
+                np.nan if ann.gpt_probs is None else ann.gpt_probs
+            )
+        if 'version' in self.records.dtype.names:
+            record['version'] = (
+                b'' if ann.prompt_version is None else
+                ann.prompt_version.encode('ascii')
+            )
+
+    def get(self, id_: str) -> ItemAnnotations:
+        assert self.is_in_context
+        i = self.row(id_)
+        if i is None:
+            return ItemAnnotations.Unvisited()
+        return self.decode(i)
+
+    def set(self, id_: str, ann: ItemAnnotations) -> None:
+        assert self.is_in_context
+        assert not self.readonly
+        i = self.row(id_)
+        if i is None:
+            raise KeyError(f'{id_!r} is not in the store {self.path!r}')
+        if self.observers:
+            old = self.decode(i)
+            for observer in self.observers:
+                observer(id_, old, ann)
+        self.encode(i, ann)
+
+    def pop(self, id_: str) -> None:
+        if self.row(id_) is not None:
+            self.set(id_, ItemAnnotations.Unvisited())
+
+    def visitedRows(self) -> np.ndarray:
+        assert self.records is not None
+        return np.flatnonzero(self.records['status'] != -1)
+
+    def visited(self) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        The ids and records of visited rows, as arrays.
+        '''
+        assert self.is_in_context
+        assert self.ids is not None and self.records is not None
+        rows = self.visitedRows()
+        return self.ids[rows], self.records[rows]
+
+    def writeVerdicts(
+        self, ids: tp.Sequence[str], verdicts: tp.Sequence[float],
+        prompt_version: str,
+    ) -> None:
+        '''
+        `set()` of fresh binary verdicts, in place and in one pass.
+        Labels are kept. Observers are not called.
+        '''
+        assert self.is_in_context
+        assert not self.readonly
+        assert self.ids is not None and self.records is not None
+        assert 'probs' not in self.records.dtype.names
+        encoded = [id_.encode('utf-8') for id_ in ids]
+        keys = np.array(encoded, dtype=self.ids.dtype)
+        rows = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        for id_, key, row in zip(ids, encoded, rows.tolist()):
+            if self.ids[row] != key:
+                raise KeyError(f'{id_!r} is not in the store {self.path!r}')
+        self.records['verdict'][rows] = verdicts
+        self.records['status'][rows] = 0
+        self.records['version'][rows] = prompt_version.encode('ascii')
+
+    def outdate(self, n_labels: int) -> None:
+        '''
+        Every visited row becomes `n_labels` labels staler, in one pass.
+        '''
+        assert self.is_in_context
+        assert not self.readonly
+        assert self.records is not None
+        status = self.records['status']
+        status[status != -1] += n_labels
+
+    def items(self) -> list[tuple[str, ItemAnnotations]]:
+        '''
+        Decodes every visited row. For large stores, see `visited()`.
+        '''
+        assert self.is_in_context
+        assert self.ids is not None
+        return [
+            (self.ids[i].decode('utf-8'), self.decode(i))
+            for i in self.visitedRows().tolist()
+        ]
+
+    def labelOne(
+        self, id_: str, label: int, near: tp.Iterable[str] | None = None,
+    ) -> None:
+        old = self.get(id_)
+        self.set(id_, old.model_copy(update=dict(
+            status=ItemStatus.Classified(),
+            human_label_no_or_yes=label,
+        )))
+        if near is None and not self.observers:
+            # every visited item but `id_`, in one pass
+            assert self.records is not None
+            status = self.records['status']
+            stale = status != -1
+            stale[self.row(id_)] = False
+            status[stale] += 1
+            return
+        if near is None:
+            near = [other for other, _ in self.items()]
+        for other in near:
+            if other == id_:
+                continue
+            i = self.row(other)
+            if i is not None:
+                self.set(other, self.decode(i).afterOneLabel())
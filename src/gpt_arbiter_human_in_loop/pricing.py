@@ -27,11 +27,19 @@ class ModelPricing:
             cached = 0
         else:
             cached = details.cached_tokens or 0
-        non_cached = i - cached
+        return self.estimateFromCounts(i, o, cached)
+
+    def estimateFromCounts(
+        self, n_input: float, n_output: float, n_cached: float = 0, 
+    ) -> float:
+        '''
+        `n_input` includes `n_cached`.
+        '''
+        non_cached = n_input - n_cached
         return (
             non_cached * self.USD_per_1M_tokens_input + 
-            cached     * self.USD_per_1M_tokens_input_cached + 
-            o          * self.USD_per_1M_tokens_output
+            n_cached   * self.USD_per_1M_tokens_input_cached + 
+            n_output   * self.USD_per_1M_tokens_output
         ) / 1000_000
 
 PRICING = {
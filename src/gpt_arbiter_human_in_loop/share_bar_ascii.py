@@ -0,0 +1,48 @@
+import typing as tp
+
+import numpy as np
+from rich.markup import escape
+from textual.app import RenderResult
+from textual.widget import Widget
+
+COLORS = ('#f55', '#5f5', '#55f', '#ff5', '#f5f', '#5ff', '#fa5', '#aaa')
+
+class ShareBar(Widget):
+    '''
+    A 100% stacked bar of how many items each class won.
+    '''
+    def __init__(self, classes: tp.Sequence[str], *args, **kw) -> None:
+        super().__init__(*args, **kw)
+
+        self.classes = tuple(classes)
+        self.counts = np.zeros(len(self.classes), dtype=np.int64)
+
+    def add(self, class_i: int) -> None:
+        self.counts[class_i] += 1
+        self.refresh()
+
+    def remove(self, class_i: int) -> None:
+        self.counts[class_i] -= 1
+        self.refresh()
+
+    def render(self) -> RenderResult:
+        W = self.size.width
+        total = int(self.counts.sum())
+        if W == 0 or total == 0:
+            return ''
+        # largest remainder, so the widths add up to W
+        exact = self.counts * W / total
+        widths = np.floor(exact).astype(np.int64)
+        for i in np.argsort(widths - exact)[:W - int(widths.sum())]:
+            widths[i] += 1
+        bar = []
+        for i, (name, width) in enumerate(zip(self.classes, widths.tolist())):
+            if width == 0:
+                continue
+            label = escape(name[:width].ljust(width, ' '))
+            bar.append(f'[#000 on {COLORS[i % len(COLORS)]}]{label}[/]')
+        legend = '  '.join(
+            f'{escape(name)} {count / total:.0%}'
+            for name, count in zip(self.classes, self.counts.tolist())
+        )
+        return ''.join(bar) + '\n' + legend
@@ -1,32 +1,37 @@
 from __future__ import annotations
 
+import typing as tp
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
+from functools import cached_property
+import hashlib
 import json
 
 from pydantic import BaseModel, ConfigDict
 from textual.widget import Widget
 
+from .compaction import CompactionPolicy
+
 NO_OR_YES = ('No', 'Yes')
 
 Classifiee = str
 
 class QAPair(BaseModel):
     question: Classifiee
-    no_or_yes: int  # 0 for No, 1 for Yes
+    no_or_yes: int  # index into `classes`, i.e. 0 for No, 1 for Yes
     explanation: str | None
 
     model_config = ConfigDict(
         frozen=True,
     )
 
-    def render(self) -> str:
+    def render(self, classes: tp.Sequence[str] = NO_OR_YES) -> str:
         s = f'''
 <query>
 {self.question}
 </query>
 <reference>
-{NO_OR_YES[self.no_or_yes]}
+{classes[self.no_or_yes]}
 '''.strip()
         if self.explanation is not None:
             s += f', because:\n{self.explanation}'
@@ -36,6 +41,11 @@ class PromptAndExamples(BaseModel):
     file_path: str
     prompt: str
     examples: list[QAPair]
+    # Each class name should be one token, with a distinct first token.
+    classes: list[str] = list(NO_OR_YES)
+    # Every version this file has had, oldest first. Not part of `version`.
+    history: list[str] = []
+    compaction: CompactionPolicy | None = None
 
     model_config = ConfigDict(
         frozen=True,
@@ -47,29 +57,102 @@ class PromptAndExamples(BaseModel):
             j = json.load(f)
         return cls.model_validate(j)
     
+    @cached_property
+    def version(self) -> str:
+        '''
+        Content hash of the prompt and examples.  
+        Verdicts are reusable exactly within one version.  
+        '''
+        content: list = [self.prompt, [ex.model_dump() for ex in self.examples]]
+        if not self.isBinary():
+            # binary versions stay as they were
+            content.append(self.classes)
+        if self.compaction is not None:
+            # versions without a policy stay as they were
+            content.append(self.compaction.model_dump())
+        j = json.dumps(content, sort_keys=True)
+        return hashlib.sha256(j.encode('utf-8')).hexdigest()[:16]
+    
+    def versions(self) -> list[str]:
+        '''
+        `history`, ending with the current version.
+        '''
+        if self.history[-1:] == [self.version]:
+            return self.history
+        return [*self.history, self.version]
+    
+    def versionDistance(self, version: str) -> int | None:
+        '''
+        How many versions ago `version` was current.  
+        `None` if this file never had it.  
+        '''
+        versions = self.versions()
+        for i in range(len(versions) - 1, -1, -1):
+            if versions[i] == version:
+                return len(versions) - 1 - i
+        return None
+    
+    def withVersionRecorded(self) -> PromptAndExamples:
+        '''
+        Appends the current version to `history`, and writes the file 
+        if that changed it. Called when the file changes anyway.  
+        '''
+        if self.history[-1:] == [self.version]:
+            return self
+        recorded = self.model_copy(update=dict(history=self.versions()))
+        recorded.writeFile()
+        return recorded
+    
+    def isBinary(self) -> bool:
+        return tuple(self.classes) == NO_OR_YES
+    
     def writeFile(self) -> None:
         with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.model_dump(), f, indent=2)
+            # unset options stay out of hand-written files
+            json.dump(self.model_dump(exclude_defaults=True), f, indent=2)
 
     def render(
         self, classifiee: Classifiee, omit_examples: bool = False, 
+        examples: tp.Sequence[QAPair] | None = None, 
     ) -> str:
+        '''
+        `examples` overrides `self.examples`, e.g. a budgeted selection.
+        '''
+        if examples is None:
+            examples = self.examples
+        if self.compaction is not None:
+            classifiee = self.compaction.compactClassifiee(classifiee)
         p = self.prompt.replace('{CLASSIFIEE}', f'<query>\n{classifiee}\n</query>')
         if not omit_examples:
-            p = p.replace('{EXAMPLES}', '\n\n'.join(
-                ex.render() for ex in self.examples
-            ))
+            p = p.replace('{EXAMPLES}', self.examplesBlock(examples))
         return p
     
+    def examplesBlock(self, examples: tp.Sequence[QAPair]) -> str:
+        '''
+        What `{EXAMPLES}` renders to.
+        '''
+        return '\n\n'.join(
+            self.compactedExample(ex).render(self.classes) for ex in examples
+        )
+    
+    def compactedExample(self, example: QAPair) -> QAPair:
+        if self.compaction is None:
+            return example
+        return example.model_copy(update=dict(
+            question=self.compaction.compactExample(example.question),
+        ))
+    
     def addExampleSyncingFile(self, example: QAPair) -> PromptAndExamples:
         latest = self.fromFile(self.file_path)
         added = PromptAndExamples(
             file_path=latest.file_path,
             prompt=latest.prompt,
             examples=[*latest.examples, example],
+            classes=latest.classes,
+            history=latest.versions(),
+            compaction=latest.compaction,
         )
-        added.writeFile()
-        return added
+        return added.withVersionRecorded()
 
 def titled(
     w: Widget, /, title: str, skip_bottom: bool = True,
@@ -0,0 +1,260 @@
+'''
+Replays the judging and querying loop offline, without API calls, to
+tune `Lambda` and the query threshold before a live run.
+
+- An `Oracle` stands in for the model: verdicts recorded by a past run,
+  or a synthetic model that gets sharper as examples accumulate.
+- A scripted human answers each query with the ground-truth label.
+- Judging and labeling interleave at a fixed ratio, `calls_per_label`,
+  as when one person labels while the loop runs at the throttle.
+
+The loop uses the same `IdQueue`, `queryScore` and `Persistent.labelOne`
+as the `UI`, so staleness and revisits follow the live rules.
+'''
+
+from __future__ import annotations
+
+import os
+import json
+import math
+import random
+import tempfile
+import typing as tp
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+
+from .shared import ItemStatus
+from .persistent import Persistent, ItemAnnotations
+from .id_queue import IdQueue, queryScore
+from .neighbor_index import NeighborIndex
+
+class Oracle(ABC):
+    @abstractmethod
+    def judge(self, id_: str, n_examples: int) -> tuple[float, ...]:
+        '''
+        Class probabilities for `id_`, with `n_examples` in the prompt.
+        '''
+        raise NotImplementedError
+
+class ReplayOracle(Oracle):
+    '''
+    Replays recorded verdicts. For each id, returns the latest record
+    made with at most `n_examples` examples, or else the earliest one.
+    '''
+    def __init__(self, records: tp.Mapping[
+        str, tp.Sequence[tuple[int, tuple[float, ...]]],
+    ]) -> None:
+        '''
+        `records`: id -> [(n_examples, probs), ...].
+        '''
+        self.records = {
+            id_: sorted(history) for id_, history in records.items()
+        }
+
+    @classmethod
+    def fromRwJson(cls, path: str) -> ReplayOracle:
+        '''
+        The final verdicts of a past run, from its annotations file.
+        Labeled items replay as certain.
+        '''
+        with open(path, 'r', encoding='utf-8') as f:
+            raw: dict = json.load(f)
+        records: dict[str, list[tuple[int, tuple[float, ...]]]] = {}
+        for id_, v in raw.items():
+            anno = ItemAnnotations.model_validate(v)
+            if anno.status == ItemStatus.Unvisited():
+                continue
+            records[id_] = [(0, anno.probs())]
+        return cls(records)
+
+    def judge(self, id_: str, n_examples: int) -> tuple[float, ...]:
+        history = self.records[id_]
+        result = history[0][1]
+        for n, probs in history:
+            if n > n_examples:
+                break
+            result = probs
+        return result
+
+class SyntheticOracle(Oracle):
+    '''
+    Each item has a fixed random margin for its true class, drawn from
+    N(0, `difficulty`). A negative margin is a confidently wrong item.
+    Examples raise every margin by `learning_rate * log(1 + n)`.
+    '''
+    def __init__(
+        self, truth: tp.Mapping[str, int], n_classes: int = 2,
+        difficulty: float = 2.0, learning_rate: float = 0.5,
+        seed: int = 0,
+    ) -> None:
+        self.truth = truth
+        self.n_classes = n_classes
+        self.difficulty = difficulty
+        self.learning_rate = learning_rate
+        self.seed = seed
+
+    def judge(self, id_: str, n_examples: int) -> tuple[float, ...]:
+        rng = random.Random(f'{self.seed}/{id_}')
+        margin = rng.gauss(0.0, self.difficulty) + (
+            self.learning_rate * math.log1p(n_examples)
+        )
+        # noise on the wrong classes, so K-way ties are broken
+        logits = [rng.gauss(0.0, 0.5) for _ in range(self.n_classes)]
+        logits[self.truth[id_]] = margin
+        top = max(logits)
+        weights = [math.exp(x - top) for x in logits]
+        total = sum(weights)
+        return tuple(w / total for w in weights)
+
+@dataclass(frozen=True)
+class SimulationPoint:
+    '''
+    `accuracy` is over visited items. `coverage` is the visited fraction.
+    '''
+    n_calls: int
+    n_labels: int
+    accuracy: float
+    coverage: float
+
+@dataclass
+class SimulationReport:
+    Lambda: float
+    min_query_score: float
+    calls_per_label: int
+    n_calls: int = 0
+    n_labels: int = 0
+    curve: list[SimulationPoint] = field(default_factory=list)
+
+    def final(self) -> SimulationPoint:
+        return self.curve[-1]
+
+    def summary(self) -> str:
+        last = self.final()
+        return (
+            f'Lambda={self.Lambda:g} min_query_score={self.min_query_score:g} '
+            f'calls_per_label={self.calls_per_label}: '
+            f'{self.n_calls} calls, {self.n_labels} labels, '
+            f'accuracy {last.accuracy:.1%}, coverage {last.coverage:.1%}'
+        )
+
+def measure(
+    persistent: Persistent, truth: tp.Mapping[str, int],
+    n_calls: int, n_labels: int,
+) -> SimulationPoint:
+    n_visited = 0
+    n_correct = 0
+    for id_, anno in persistent.items():
+        if anno.status == ItemStatus.Unvisited():
+            continue
+        n_visited += 1
+        decision = anno.human_label_no_or_yes
+        if decision is None:
+            decision = anno.decision()
+        n_correct += decision == truth[id_]
+    return SimulationPoint(
+        n_calls=n_calls,
+        n_labels=n_labels,
+        accuracy=n_correct / n_visited if n_visited else 0.0,
+        coverage=n_visited / len(truth),
+    )
+
+def simulate(
+    truth: tp.Mapping[str, int], oracle: Oracle, Lambda: float,
+    calls_per_label: int = 10, min_query_score: float = 0.0,
+    max_calls: int | None = None, max_labels: int | None = None,
+    report_every: int = 100, seed: int = 0,
+    neighbor_index: NeighborIndex | None = None,
+) -> SimulationReport:
+    '''
+    Runs one session until every item is classified with the latest
+    examples, or a `max_*` cap is hit.
+    `truth`: id -> label, for the scripted human and for accuracy.
+    `min_query_score`: the human is asked only about items scoring
+    above it. Otherwise labeling would never stop.
+    `max_calls` defaults to 10 passes over the ids.
+    `neighbor_index`: as in the `UI`.
+    '''
+    if max_calls is None:
+        max_calls = 10 * len(truth)
+    ids = [*truth]
+    report = SimulationReport(
+        Lambda=Lambda, min_query_score=min_query_score,
+        calls_per_label=calls_per_label,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        persistent = Persistent(os.path.join(directory, 'rw.json'))
+        with persistent.Context():
+            queue = IdQueue(
+                ids, persistent, Lambda, rng=random.Random(seed),
+            )
+            cursor = 0
+            n_examples = 0
+            while report.n_calls < max_calls:
+                next_ = nextToJudge(queue, persistent, cursor)
+                if next_ is None:
+                    break
+                cursor, id_ = next_
+                probs = oracle.judge(id_, n_examples)
+                persistent.set(id_, ItemAnnotations.fromProbs(
+                    probs, ItemStatus.Classified(),
+                    is_binary=len(probs) == 2,
+                ))
+                report.n_calls += 1
+                cursor = queue.nextIndex(cursor)
+                if report.n_calls % calls_per_label == 0 and (
+                    max_labels is None or report.n_labels < max_labels
+                ):
+                    best = max((
+                        (queryScore(anno, Lambda), other)
+                        for other, anno in persistent.items()
+                    ), default=None)
+                    if best is not None and best[0] > min_query_score:
+                        persistent.labelOne(best[1], truth[best[1]], near=(
+                            None if neighbor_index is None else
+                            neighbor_index.near(best[1])
+                        ))
+                        report.n_labels += 1
+                        n_examples += 1
+                if report.n_calls % report_every == 0:
+                    report.curve.append(measure(
+                        persistent, truth, report.n_calls, report.n_labels,
+                    ))
+            report.curve.append(measure(
+                persistent, truth, report.n_calls, report.n_labels,
+            ))
+    return report
+
+def nextToJudge(
+    queue: IdQueue, persistent: Persistent, cursor: int,
+) -> tuple[int, str] | None:
+    '''
+    As `UI.nextIdFromCursor`: labeled items are judged again, and so
+    cost a call each. Returns the new cursor and its id.
+    '''
+    initial_cursor = cursor
+    while True:
+        id_ = queue.at(cursor)
+        if id_ is None:
+            return None
+        anno = persistent.get(id_)
+        if (
+            anno.human_label_no_or_yes is not None or
+            anno.status != ItemStatus.Classified()
+        ):
+            return cursor, id_
+        cursor = queue.nextIndex(cursor)
+        if cursor == initial_cursor:
+            return None
+
+def sweep(
+    settings: tp.Iterable[tp.Mapping[str, tp.Any]],
+    truth: tp.Mapping[str, int], oracle: Oracle, **common,
+) -> list[SimulationReport]:
+    '''
+    One `simulate` per setting, e.g. `[dict(Lambda=5), dict(Lambda=20)]`.
+    The same seed, and so the same visiting order, for every setting.
+    '''
+    return [
+        simulate(truth, oracle, **{**common, **setting})
+        for setting in settings
+    ]
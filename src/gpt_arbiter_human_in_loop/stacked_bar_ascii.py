@@ -1,11 +1,20 @@
 import typing as tp
 
+import numpy as np
 from textual.reactive import reactive
 from textual.app import RenderResult
 from textual.widget import Widget
 
+N_FINE_BUCKETS = 4096
+
 class StackedBar(Widget):
-    data: reactive[tp.Sequence[str]] = reactive('')
+    '''
+    Items are kept as per-symbol counts in buckets of consecutive
+    positions, so moving one item between symbols is O(log buckets), and
+    rendering is independent of how many items there are.
+    Inserted items get a bucket of their own. Past `2 * N_FINE_BUCKETS`
+    buckets, neighbours are merged pairwise.
+    '''
     data_cursor: reactive[int] = reactive(0)
 
     def __init__(self, symbols: tp.Sequence[str], *args, **kw) -> None:
@@ -18,31 +27,121 @@ class StackedBar(Widget):
         for s in self.symbols:
             if len(s) != 1:
                 print(f'Warning: StackedBar symbols should be single char. Ensure {s} is intended. (Markdown could mis-trigger this warning.)')
-        
-        self.data = ''
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+        self.length = 0
+        self.counts = np.zeros((0, len(self.symbols)), dtype=np.int64)
+        # where each bucket ends, exclusive
+        self.ends = np.zeros(0, dtype=np.int64)
         self.data_cursor = 0
-    
+
+    @property
+    def data(self) -> np.ndarray:
+        '''
+        Only the bucket counts are kept.
+        '''
+        return self.counts
+
+    @data.setter
+    def data(self, symbols: tp.Sequence[str]) -> None:
+        '''
+        O(len(symbols)). Use `move()` for incremental updates.
+        '''
+        length = len(symbols)
+        indices = np.fromiter(
+            (self.symbol_index[s] for s in symbols),
+            dtype=np.int64, count=length,
+        )
+        n_buckets = min(length, N_FINE_BUCKETS)
+        buckets = np.arange(length, dtype=np.int64) * n_buckets // max(length, 1)
+        counts = np.bincount(
+            buckets * len(self.symbols) + indices,
+            minlength=n_buckets * len(self.symbols),
+        ).reshape(n_buckets, len(self.symbols))
+        self.setCounts(counts, length)
+
+    def setCounts(self, counts: np.ndarray, length: int) -> None:
+        '''
+        `counts[b, s]`: how many items in bucket `b` show symbol `s`.
+        Buckets are in position order, and are as large as their counts.
+        '''
+        assert counts.shape[1] == len(self.symbols)
+        assert counts.sum() == length
+        self.counts = counts.astype(np.int64)
+        self.ends = np.cumsum(self.counts.sum(axis=1))
+        self.length = length
+        self.refresh()
+
+    def bucketOf(self, position: int) -> int:
+        return int(np.searchsorted(self.ends, position, side='right'))
+
+    def insert(self, position: int, symbols: tp.Sequence[str]) -> None:
+        '''
+        Inserts items before `position`, shifting later items.
+        O(buckets + len(symbols)), so a growing queue does not need
+        `data` set again.
+        Inside a bucket, they go after it, as buckets are not split.
+        '''
+        if not symbols:
+            return
+        row = np.bincount(
+            [self.symbol_index[s] for s in symbols], minlength=len(self.symbols),
+        )
+        # after the bucket holding `position - 1`
+        b = self.bucketOf(position - 1) + 1 if position > 0 else 0
+        counts = np.insert(self.counts, min(b, len(self.counts)), row, axis=0)
+        if len(counts) > 2 * N_FINE_BUCKETS:
+            if len(counts) % 2 == 1:
+                counts = np.vstack([counts, np.zeros_like(counts[:1])])
+            counts = counts.reshape(-1, 2, len(self.symbols)).sum(axis=1)
+        self.setCounts(counts, self.length + len(symbols))
+
+    def move(self, position: int, old_symbol: str, new_symbol: str) -> None:
+        if old_symbol == new_symbol:
+            return
+        b = self.bucketOf(position)
+        old = self.symbol_index[old_symbol]
+        b_old = b
+        if self.counts[b, old] == 0:
+            # an item inserted inside a bucket sits a bucket off
+            holders = np.flatnonzero(self.counts[:, old])
+            if len(holders):
+                b_old = int(holders[np.argmin(np.abs(holders - b))])
+        self.counts[b_old, old] -= 1
+        self.counts[b, self.symbol_index[new_symbol]] += 1
+        if b_old != b:
+            self.ends = np.cumsum(self.counts.sum(axis=1))
+        self.refresh()
+
     def render(self) -> RenderResult:
-        if self.data is None:
-            return 'N/A'
+        if self.length == 0:
+            return ''
         W, H = self.size
         S = W * H
+        n_buckets, n_symbols = self.counts.shape
+        present = self.counts > 0
+        # the last present symbol wins
+        bucket_winner = np.where(
+            present.any(axis=1),
+            n_symbols - 1 - np.argmax(present[:, ::-1], axis=1),
+            -1,
+        )
+        # the cell of a bucket is that of its first position
+        first_position = self.ends - self.counts.sum(axis=1)
+        cell_of_bucket = first_position * S // self.length
+        cell_winner = np.full(S, -1, dtype=np.int64)
+        np.maximum.at(cell_winner, cell_of_bucket, bucket_winner)
+        cursor_cell = (
+            self.data_cursor * S // self.length
+            if 0 <= self.data_cursor < self.length else -1
+        )
         buf = []
-        data_i = 0
-        for bar_i in range(S):
-            winner = -1
-            is_cursor = False
-            while data_i / len(self.data) < (bar_i + 1) / S:
-                if data_i == self.data_cursor:
-                    is_cursor = True
-                datapoint = self.data[data_i]
-                winner = max(winner, self.symbols.index(datapoint))
-                data_i += 1
+        for cell_i, winner in enumerate(cell_winner.tolist()):
             if winner == -1:
                 buf.append(' ')
-            else:
-                s = self.symbols[winner]
-                if is_cursor:
-                    s = f'[black on white]{s}[/]'
-                buf.append(s)
+                continue
+            s = self.symbols[winner]
+            if cell_i == cursor_cell:
+                s = f'[black on white]{s}[/]'
+            buf.append(s)
         return ''.join(buf)
@@ -0,0 +1,221 @@
+'''
+Optional per-judgment telemetry, for capacity planning.
+
+A store is a directory, usually next to the annotations file, of one
+append-only binary file per column, plus `strings.json`, which holds
+the model names and prompt versions that the `model` and `version`
+columns index into. Columns are read back with `numpy.fromfile`.
+
+    python -m gpt_arbiter_human_in_loop.telemetry DIRECTORY
+
+prints throughput and cost per 1k items by prompt version and model.
+'''
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import threading
+import typing as tp
+from dataclasses import dataclass
+
+import numpy as np
+
+STRINGS_FILENAME = 'strings.json'
+COLUMNS = {
+    'timestamp': '<f8',     # unix seconds, when the judgment returned
+    'version': '<u4',
+    'model': '<u2',
+    'input_tokens': '<u4',  # including cached
+    'cached_tokens': '<u4',
+    'output_tokens': '<u4',
+    'latency': '<f4',       # seconds
+    'n_retries': 'u1',
+    'cache_hit': 'u1',
+    'USD': '<f4',
+}
+
+# retries of the calls made by the current thread. 
+# Not in openai_client, which imports httpx.
+thread_retries = threading.local()
+
+def retriesInThisThread() -> int:
+    return getattr(thread_retries, 'n', 0)
+
+def resetRetriesInThisThread() -> None:
+    thread_retries.n = 0
+
+def countRetryInThisThread() -> None:
+    thread_retries.n = retriesInThisThread() + 1
+
+class Telemetry:
+    def __init__(self, /, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.strings: dict[str, list[str]] = {'models': [], 'versions': []}
+        try:
+            with open(
+                os.path.join(path, STRINGS_FILENAME), 'r', encoding='utf-8',
+            ) as f:
+                self.strings = json.load(f)
+        except FileNotFoundError:
+            pass
+        truncateToCommonLength(path)
+        self.files = {
+            name: open(os.path.join(path, name), 'ab')
+            for name in COLUMNS
+        }
+
+    def intern(self, kind: str, s: str) -> int:
+        table = self.strings[kind]
+        try:
+            return table.index(s)
+        except ValueError:
+            pass
+        table.append(s)
+        tmp = os.path.join(self.path, STRINGS_FILENAME + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.strings, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, STRINGS_FILENAME))
+        return len(table) - 1
+
+    def record(
+        self, model: str, prompt_version: str | None,
+        input_tokens: int, cached_tokens: int, output_tokens: int,
+        latency: float, n_retries: int, cache_hit: bool, USD: float,
+    ) -> None:
+        with self.lock:
+            row = dict(
+                timestamp=time.time(),
+                version=self.intern('versions', prompt_version or ''),
+                model=self.intern('models', model),
+                input_tokens=input_tokens,
+                cached_tokens=cached_tokens,
+                output_tokens=output_tokens,
+                latency=latency,
+                n_retries=min(n_retries, 255),
+                cache_hit=cache_hit,
+                USD=USD,
+            )
+            for name, dtype in COLUMNS.items():
+                self.files[name].write(np.array(row[name], dtype=dtype).tobytes())
+                self.files[name].flush()
+
+    def close(self) -> None:
+        with self.lock:
+            for f in self.files.values():
+                f.close()
+
+def truncateToCommonLength(path: str) -> None:
+    '''
+    After a crash mid-record, some columns are a row longer. Appending 
+    to them as they are would misalign every later row.
+    '''
+    n_rows = {
+        name: os.path.getsize(os.path.join(path, name)) // np.dtype(dtype).itemsize
+        for name, dtype in COLUMNS.items()
+        if os.path.exists(os.path.join(path, name))
+    }
+    if not n_rows:
+        return
+    n = min(n_rows.values()) if len(n_rows) == len(COLUMNS) else 0
+    for name in n_rows:
+        os.truncate(
+            os.path.join(path, name), n * np.dtype(COLUMNS[name]).itemsize,
+        )
+
+def load(path: str) -> tuple[dict[str, np.ndarray], dict[str, list[str]]]:
+    '''
+    All columns, cut to the rows every column has, e.g. after a crash
+    mid-record. And the string tables.
+    '''
+    with open(os.path.join(path, STRINGS_FILENAME), 'r', encoding='utf-8') as f:
+        strings: dict[str, list[str]] = json.load(f)
+    columns = {
+        name: np.fromfile(os.path.join(path, name), dtype=dtype)
+        for name, dtype in COLUMNS.items()
+    }
+    n = min(len(column) for column in columns.values())
+    return {name: column[:n] for name, column in columns.items()}, strings
+
+@dataclass(frozen=True)
+class TelemetrySummary:
+    '''
+    `items_per_minute` is over the wall time between the first and
+    the last judgment, idle gaps included.
+    Token and latency means are over API calls, not cache hits.
+    '''
+    prompt_version: str
+    model: str
+    n_judgments: int
+    cache_hit_rate: float
+    mean_input_tokens: float
+    mean_output_tokens: float
+    USD: float
+    USD_per_1k_items: float
+    items_per_minute: float
+    mean_latency: float
+    p95_latency: float
+    n_retries: int
+
+def meanOrNan(values: np.ndarray) -> float:
+    return float(values.mean()) if len(values) else float('nan')
+
+def summarize(path: str) -> list[TelemetrySummary]:
+    '''
+    One summary per (prompt version, model), in order of first use.
+    '''
+    columns, strings = load(path)
+    keys = columns['version'].astype(np.int64) << 16 | columns['model']
+    _, first = np.unique(keys, return_index=True)
+    summaries: list[TelemetrySummary] = []
+    for key in keys[np.sort(first)].tolist():
+        mask = keys == key
+        n = int(mask.sum())
+        timestamps = columns['timestamp'][mask]
+        minutes = (timestamps.max() - timestamps.min()) / 60
+        # cache hits take no tokens or time at the API
+        called = mask & (columns['cache_hit'] == 0)
+        latency = columns['latency'][called]
+        USD = float(columns['USD'][mask].sum())
+        summaries.append(TelemetrySummary(
+            prompt_version=strings['versions'][key >> 16] or '?',
+            model=strings['models'][key & 0xffff],
+            n_judgments=n,
+            cache_hit_rate=float(columns['cache_hit'][mask].mean()),
+            mean_input_tokens=meanOrNan(columns['input_tokens'][called]),
+            mean_output_tokens=meanOrNan(columns['output_tokens'][called]),
+            USD=USD,
+            USD_per_1k_items=1000 * USD / n,
+            items_per_minute=n / minutes if minutes > 0 else float('nan'),
+            mean_latency=meanOrNan(latency),
+            p95_latency=(
+                float(np.percentile(latency, 95)) if len(latency) else
+                float('nan')
+            ),
+            n_retries=int(columns['n_retries'][mask].sum()),
+        ))
+    return summaries
+
+def report(path: str, out: tp.TextIO = sys.stdout) -> None:
+    header = (
+        f'{"version":<16} {"model":<14} {"items":>8} {"hit%":>5} '
+        f'{"in tok":>7} {"$/1k":>7} {"$":>8} {"/min":>7} '
+        f'{"lat s":>6} {"p95 s":>6} {"retry":>5}'
+    )
+    print(header, file=out)
+    for s in summarize(path):
+        print(
+            f'{s.prompt_version:<16} {s.model:<14} {s.n_judgments:>8} '
+            f'{s.cache_hit_rate:>5.0%} {s.mean_input_tokens:>7.0f} '
+            f'{s.USD_per_1k_items:>7.3f} {s.USD:>8.2f} '
+            f'{s.items_per_minute:>7.1f} {s.mean_latency:>6.2f} '
+            f'{s.p95_latency:>6.2f} {s.n_retries:>5}',
+            file=out,
+        )
+
+if __name__ == '__main__':
+    report(sys.argv[1])
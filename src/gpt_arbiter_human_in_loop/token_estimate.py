@@ -0,0 +1,126 @@
+'''
+Offline token counting, for pre-flight cost projection.
+No tokenizer download: it approximates the o200k/cl100k pre-tokenizers
+with a regex and charges long words by length.  
+Good enough to rank costs, not to bill them.  
+'''
+
+from __future__ import annotations
+
+import re
+import math
+import typing as tp
+import functools
+import threading
+from dataclasses import dataclass
+
+from .shared import PromptAndExamples, Classifiee, QAPair, NO_OR_YES
+
+PIECE = re.compile(r'''
+    [^\W\d_]+           # letters
+  | \d{1,3}             # numbers are split every 3 digits
+  | \s+                 # whitespace
+  | [^\w\s]+            # punctuation runs
+  | _+
+''', re.VERBOSE)
+
+CHARS_PER_TOKEN_LONG_WORD = 4.0
+CHARS_PER_TOKEN_PUNCT = 2.0
+# role tags and message framing of one chat message
+MESSAGE_OVERHEAD = 7
+
+def estimateTokens(text: str) -> int:
+    n = 0
+    for m in PIECE.finditer(text):
+        piece = m.group()
+        c = piece[0]
+        if c.isspace():
+            # a single space merges into the next word
+            if '\n' in piece or len(piece) > 1:
+                n += 1
+            continue
+        if c.isalpha():
+            if not c.isascii():
+                # CJK and friends: about one token per char
+                n += len(piece)
+            elif len(piece) <= 6:
+                n += 1
+            else:
+                n += math.ceil(len(piece) / CHARS_PER_TOKEN_LONG_WORD)
+            continue
+        if c.isdigit():
+            n += 1
+            continue
+        n += math.ceil(len(piece) / CHARS_PER_TOKEN_PUNCT)
+    return n
+
+def estimatePromptTokens(prompt: str) -> int:
+    return estimateTokens(prompt) + MESSAGE_OVERHEAD
+
+@functools.lru_cache(maxsize=4096)
+def exampleTokens(
+    example: QAPair, classes: tuple[str, ...] = NO_OR_YES, 
+) -> int:
+    # +1 for the separator
+    return estimateTokens(example.render(classes)) + 1
+
+@dataclass(frozen=True)
+class PromptTokenProfile:
+    '''
+    `fixed`: tokens of the rendered prompt without the classifiee.
+    `per_example`: the marginal tokens of each `QAPair`.
+    `saved`: tokens the `CompactionPolicy` cut from the examples.
+    '''
+    fixed: int
+    per_example: tuple[int, ...]
+    saved: int = 0
+
+    @classmethod
+    def of(
+        cls, prompt_and_examples: PromptAndExamples, 
+        examples: tp.Sequence[QAPair] | None = None, 
+    ) -> PromptTokenProfile:
+        if examples is None:
+            examples = prompt_and_examples.examples
+        classes = tuple(prompt_and_examples.classes)
+        per_example = tuple(
+            exampleTokens(prompt_and_examples.compactedExample(ex), classes) 
+            for ex in examples
+        )
+        return cls(
+            fixed=estimatePromptTokens(
+                prompt_and_examples.render('', examples=examples),
+            ),
+            per_example=per_example,
+            saved=sum(
+                exampleTokens(ex, classes) for ex in examples
+            ) - sum(per_example),
+        )
+
+    def meanPerExample(self) -> float:
+        if not self.per_example:
+            return 0.0
+        return sum(self.per_example) / len(self.per_example)
+
+class ClassifieeTokenStats:
+    '''
+    Running mean of classifiee tokens.
+    Added to from the preflight thread and the event loop.
+    '''
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.n = 0
+        self.total = 0
+
+    def add(self, classifiee: Classifiee) -> int:
+        n_tokens = estimateTokens(classifiee)
+        with self.lock:
+            self.n += 1
+            self.total += n_tokens
+        return n_tokens
+
+    def mean(self) -> float | None:
+        with self.lock:
+            if self.n == 0:
+                return None
+            return self.total / self.n
@@ -0,0 +1,100 @@
+'''
+One prompt file with its own annotations file.
+A `UI` session can host several tracks over the same ids. It fetches
+each classifiee once and judges it for every track that needs it,
+under one throttle. Human queries go to whichever track has the most
+uncertain item.
+'''
+
+from __future__ import annotations
+
+import os
+
+from .shared import PromptAndExamples, ItemStatus
+from .persistent import Persistent, ItemAnnotations
+from .dedup import ClassifieeDedup
+from .token_estimate import PromptTokenProfile
+
+# (track index, id)
+QueryKey = tuple[int, str]
+
+class Track:
+    def __init__(
+        self, name: str,
+        prompt_and_examples_filename: str, rw_json_path: str,
+    ) -> None:
+        self.name = name
+        self.prompt_and_examples = PromptAndExamples.fromFile(
+            prompt_and_examples_filename
+        )
+        # fixed for the session
+        self.class_names = tuple(self.prompt_and_examples.classes)
+        self.is_binary = self.prompt_and_examples.isBinary()
+        # a MemmapPersistent's rows are decoded one by one, which is too
+        # slow for the per-label scans and observers of a session
+        assert not os.path.isdir(rw_json_path), (
+            'MemmapPersistent stores are for HeadlessWorker(store=...), '
+            'exports and dashboards'
+        )
+        self.persistent = Persistent(rw_json_path)
+        self.dedup = ClassifieeDedup()
+        self.token_profile: tuple[PromptAndExamples, PromptTokenProfile] | None = None
+        self.n_classified = 0
+
+    def needsJudging(self, id_: str) -> bool:
+        anno = self.persistent.get(id_)
+        return (
+            anno.human_label_no_or_yes is None and
+            anno.status != ItemStatus.Classified()
+        )
+
+    def reconcileVersions(self, warm_start: bool = True) -> int:
+        '''
+        Verdicts from another prompt version, e.g. after the prompt file 
+        was edited by hand, are no longer up to date.  
+        With `warm_start`, one still marked classified becomes Outdated 
+        by the version distance, so it is re-judged in the usual 
+        priority order. Otherwise it becomes Unvisited.  
+        Outdated items keep their staleness, which already counts the 
+        labels since. Labeled items and verdicts with no recorded 
+        version are kept. Returns how many items changed.  
+        '''
+        prompt_and_examples = self.prompt_and_examples
+        version = prompt_and_examples.version
+        n_changed = 0
+        for id_, anno in self.persistent.items():
+            if (
+                anno.human_label_no_or_yes is not None or 
+                anno.prompt_version is None or 
+                anno.prompt_version == version
+            ):
+                continue
+            if not warm_start:
+                self.persistent.pop(id_)
+                n_changed += 1
+                continue
+            if anno.status != ItemStatus.Classified():
+                continue
+            distance = prompt_and_examples.versionDistance(anno.prompt_version)
+            if distance is None:
+                # older than the recorded history
+                distance = len(prompt_and_examples.versions())
+            self.persistent.set(id_, anno.model_copy(update=dict(
+                status=ItemStatus.Outdated(distance),
+            )))
+            n_changed += 1
+        return n_changed
+    
+    def countClassified(self) -> None:
+        self.n_classified = sum(
+            1 for _, anno in self.persistent.items()
+            if anno.status == ItemStatus.Classified()
+        )
+
+    def onAnnotationChanged(
+        self, id_: str, old: ItemAnnotations, new: ItemAnnotations,
+    ) -> None:
+        self.n_classified += (
+            (new.status == ItemStatus.Classified()) -
+            (old.status == ItemStatus.Classified())
+        )
@@ -0,0 +1,219 @@
+'''
+A work queue shared by several judging processes, in one SQLite file.
+
+- Workers lease items, renew leases with heartbeats, and commit verdicts.
+  - A lease expires if its worker stops heart-beating.
+  - Commits are idempotent: the same verdict under the same prompt
+    version is written once, no matter how many workers raced for it.
+- One human-facing `UI` publishes the prompt version for everyone.
+  - `epoch` counts human labels, so staleness is `epoch - judged_epoch`.
+
+One `WorkQueue` may be shared by threads, e.g. to keep SQLite off an
+event loop. Its calls are serialized.
+
+Keep the file on a disk with working POSIX locks.
+The default rollback journal is used, as WAL does not work over
+network file systems.
+'''
+
+from __future__ import annotations
+
+import time
+import random
+import sqlite3
+import threading
+import typing as tp
+from dataclasses import dataclass
+from contextlib import contextmanager
+
+from .id_queue import binaryEntropy
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    rank REAL NOT NULL,
+    gpt_verdict REAL,
+    judged_version TEXT,
+    judged_epoch INTEGER,
+    human_label INTEGER,
+    lease_owner TEXT,
+    lease_expiry REAL,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS items_rank ON items (rank);
+CREATE INDEX IF NOT EXISTS items_seq ON items (seq);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+'''
+
+@dataclass(frozen=True)
+class CommittedVerdict:
+    id_: str
+    gpt_verdict: float | None
+    judged_version: str | None
+    judged_epoch: int | None
+    human_label: int | None
+
+class WorkQueue:
+    def __init__(self, /, path: str, timeout: float = 30.0) -> None:
+        self.path = path
+        self.db = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False,
+        )
+        self.lock = threading.RLock()
+        self.db.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self) -> tp.Generator[sqlite3.Connection, None, None]:
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            else:
+                self.db.execute('COMMIT')
+
+    def enqueue(self, ids: tp.Iterable[str], chunk_size: int = 10_000) -> None:
+        '''
+        Unvisited ids get a random rank in [0, 1), i.e. i.i.d. order.
+        Ids already in the queue are left untouched.
+        '''
+        chunk: list[tuple[str, float]] = []
+        def flush() -> None:
+            with self.transaction() as db:
+                db.executemany(
+                    'INSERT OR IGNORE INTO items (id, rank) VALUES (?, ?)',
+                    chunk,
+                )
+            chunk.clear()
+        for id_ in ids:
+            chunk.append((id_, random.random()))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+
+    def publish(self, version: str, epoch: int) -> None:
+        with self.transaction() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                [('prompt_version', version), ('epoch', epoch)],
+            )
+
+    def current(self) -> tuple[str | None, int]:
+        '''
+        Returns the published (prompt version, epoch).
+        '''
+        with self.lock:
+            rows = dict(self.db.execute(
+                "SELECT key, value FROM meta WHERE key IN ('prompt_version', 'epoch')",
+            ).fetchall())
+        return rows.get('prompt_version'), int(rows.get('epoch', 0))
+
+    def lease(
+        self, worker_id: str, n: int, lease_seconds: float = 60.0,
+    ) -> list[str]:
+        '''
+        Leases up to `n` items not judged under the published version.
+        '''
+        version, _ = self.current()
+        now = time.time()
+        with self.transaction() as db:
+            ids = [row[0] for row in db.execute('''
+                SELECT id FROM items
+                WHERE human_label IS NULL
+                  AND (judged_version IS NULL OR judged_version != ?)
+                  AND (lease_owner IS NULL OR lease_expiry < ?)
+                ORDER BY rank
+                LIMIT ?
+            ''', (version, now, n))]
+            db.executemany(
+                'UPDATE items SET lease_owner = ?, lease_expiry = ? WHERE id = ?',
+                [(worker_id, now + lease_seconds, id_) for id_ in ids],
+            )
+        return ids
+
+    def heartbeat(self, worker_id: str, lease_seconds: float = 60.0) -> None:
+        with self.transaction() as db:
+            db.execute(
+                'UPDATE items SET lease_expiry = ? WHERE lease_owner = ?',
+                (time.time() + lease_seconds, worker_id),
+            )
+
+    def release(self, worker_id: str) -> None:
+        with self.transaction() as db:
+            db.execute(
+                'UPDATE items SET lease_owner = NULL, lease_expiry = NULL '
+                'WHERE lease_owner = ?',
+                (worker_id, ),
+            )
+
+    def commit(
+        self, worker_id: str, id_: str, gpt_verdict: float,
+        version: str, epoch: int,
+    ) -> bool:
+        '''
+        Idempotent. Returns whether the verdict was written.
+        Late commits after a lost lease are still accepted, unless
+        someone else already committed under the same version.
+        '''
+        H2 = binaryEntropy(gpt_verdict)
+        with self.transaction() as db:
+            cursor = db.execute('''
+                UPDATE items SET
+                    gpt_verdict = ?, judged_version = ?, judged_epoch = ?,
+                    rank = ?,
+                    lease_owner = CASE WHEN lease_owner = ? THEN NULL ELSE lease_owner END,
+                    seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM items)
+                WHERE id = ? AND human_label IS NULL
+                  AND (judged_version IS NULL OR judged_version != ?)
+            ''', (
+                # revisit uncertain items first
+                gpt_verdict, version, epoch, 2.0 - H2,
+                worker_id, id_, version,
+            ))
+            return cursor.rowcount == 1
+
+    def label(self, id_: str, label: int) -> None:
+        with self.transaction() as db:
+            db.execute('''
+                INSERT INTO items (id, rank, human_label, seq) VALUES (
+                    ?, 2.0, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM items)
+                ) ON CONFLICT (id) DO UPDATE SET
+                    human_label = excluded.human_label,
+                    seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM items)
+            ''', (id_, label))
+
+    def changesSince(
+        self, seq: int, limit: int = 10_000,
+    ) -> tuple[list[CommittedVerdict], int]:
+        '''
+        Returns committed changes after `seq`, and the new `seq`.
+        '''
+        with self.lock:
+            rows = self.db.execute('''
+                SELECT seq, id, gpt_verdict, judged_version, judged_epoch, human_label
+                FROM items WHERE seq > ? ORDER BY seq LIMIT ?
+            ''', (seq, limit)).fetchall()
+        changes = [CommittedVerdict(*row[1:]) for row in rows]
+        if rows:
+            seq = rows[-1][0]
+        return changes, seq
+
+    def nPending(self) -> int:
+        version, _ = self.current()
+        with self.lock:
+            return self.db.execute('''
+                SELECT COUNT(*) FROM items
+                WHERE human_label IS NULL
+                  AND (judged_version IS NULL OR judged_version != ?)
+            ''', (version, )).fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
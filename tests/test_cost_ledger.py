@@ -0,0 +1,23 @@
+from openai.types.completion_usage import CompletionUsage
+
+from gpt_arbiter_human_in_loop.cost_ledger import CostLedger
+
+def test_ledgers_sharing_a_file_add_up(tmp_path):
+    path = str(tmp_path / 'ledger.json')
+    usage = CompletionUsage(
+        prompt_tokens=100, completion_tokens=1, total_tokens=101,
+    )
+    ui = CostLedger(path, save_interval=3600.0)
+    worker = CostLedger(path, save_interval=3600.0)
+    for _ in range(3):
+        ui.recordUsage('gpt-4o-mini', usage)
+    worker.recordUsage('gpt-4o-mini', usage)
+    worker.recordCacheHit('gpt-4o-mini')
+    ui.save()
+    worker.save()
+    # each sees the other's spend from its last save on
+    assert worker.get('gpt-4o-mini').n_calls == 4
+    ui.save()
+    assert ui.get('gpt-4o-mini').n_calls == 4
+    assert ui.get('gpt-4o-mini').n_cache_hits == 1
+    assert CostLedger(path).totalUSD() == ui.totalUSD() > 0
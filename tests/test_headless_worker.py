@@ -0,0 +1,93 @@
+import json
+import asyncio
+
+import numpy as np
+
+from gpt_arbiter_human_in_loop.arbiter_dummy import ArbiterDummy
+from gpt_arbiter_human_in_loop.cost_ledger import CostLedger
+from gpt_arbiter_human_in_loop.shared import PromptAndExamples
+from gpt_arbiter_human_in_loop.work_queue import WorkQueue
+from gpt_arbiter_human_in_loop.persistent_memmap import MemmapPersistent
+from gpt_arbiter_human_in_loop.headless_worker import HeadlessWorker
+
+class FlakyArbiter(ArbiterDummy):
+    def __init__(self) -> None:
+        self.n_failures = 0
+
+    async def judge(self, model, prompt, max_tokens, prompt_version=None):
+        if self.n_failures < 3:
+            self.n_failures += 1
+            raise RuntimeError('connection reset')
+        return 0.9
+
+def test_worker_survives_failed_judgments(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    with open(prompt_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(
+            file_path=str(prompt_path), prompt='{CLASSIFIEE} {EXAMPLES}',
+            examples=[],
+        ), f)
+    work_queue = WorkQueue(str(tmp_path / 'queue.sqlite'))
+    work_queue.enqueue([f'id{i}' for i in range(10)])
+    work_queue.publish(PromptAndExamples.fromFile(str(prompt_path)).version, 0)
+    worker = HeadlessWorker(
+        FlakyArbiter(), work_queue, str(prompt_path), lambda id_: id_, 'w',
+        batch_size=4, poll_interval=0.0,
+    )
+    asyncio.run(worker.run(stop_when_idle=True))
+    assert worker.n_committed == 10
+    assert work_queue.nPending() == 0
+
+class BudgetedArbiter(ArbiterDummy):
+    def __init__(self, ledger: CostLedger) -> None:
+        self.ledger = ledger
+
+    def getLedger(self) -> CostLedger | None:
+        return self.ledger
+
+def test_worker_stops_at_the_budget(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    with open(prompt_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(
+            file_path=str(prompt_path), prompt='{CLASSIFIEE} {EXAMPLES}',
+            examples=[],
+        ), f)
+    ledger_path = tmp_path / 'ledger.json'
+    with open(ledger_path, 'w', encoding='utf-8') as f:
+        json.dump({'judge': {'gpt-4o-mini': {'n_calls': 10, 'USD': 1.0}}}, f)
+    work_queue = WorkQueue(str(tmp_path / 'queue.sqlite'))
+    work_queue.enqueue([f'id{i}' for i in range(10)])
+    work_queue.publish(PromptAndExamples.fromFile(str(prompt_path)).version, 0)
+    worker = HeadlessWorker(
+        BudgetedArbiter(CostLedger(str(ledger_path), budget_USD=0.5)),
+        work_queue, str(prompt_path), lambda id_: id_, 'w', poll_interval=0.0,
+    )
+    asyncio.run(worker.run())
+    assert worker.n_committed == 0
+    assert work_queue.nPending() == 10
+
+def test_worker_writes_verdicts_into_its_store(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    with open(prompt_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(
+            file_path=str(prompt_path), prompt='{CLASSIFIEE} {EXAMPLES}',
+            examples=[],
+        ), f)
+    ids = [f'id{i}' for i in range(10)]
+    store = MemmapPersistent.create(str(tmp_path / 'store'), ids)
+    work_queue = WorkQueue(str(tmp_path / 'queue.sqlite'))
+    work_queue.enqueue(ids[:6])
+    version = PromptAndExamples.fromFile(str(prompt_path)).version
+    work_queue.publish(version, 0)
+    worker = HeadlessWorker(
+        FlakyArbiter(), work_queue, str(prompt_path), lambda id_: id_, 'w',
+        poll_interval=0.0, store=store,
+    )
+    asyncio.run(worker.run(stop_when_idle=True))
+    reader = MemmapPersistent(str(tmp_path / 'store'), readonly=True)
+    with reader.Context():
+        visited_ids, records = reader.visited()
+        assert sorted(visited_ids.tolist()) == [id_.encode() for id_ in ids[:6]]
+        assert (records['verdict'] == np.float32(0.9)).all()
+        assert (records['status'] == 0).all()
+        assert reader.get('id0').prompt_version == version[:16]
@@ -0,0 +1,28 @@
+import os
+
+from gpt_arbiter_human_in_loop.telemetry import Telemetry, load
+
+def record(telemetry, input_tokens):
+    telemetry.record(
+        'gpt-4o-mini', 'v1', input_tokens=input_tokens, cached_tokens=0,
+        output_tokens=1, latency=0.5, n_retries=0, cache_hit=False, USD=0.0,
+    )
+
+def test_appends_align_after_a_torn_record(tmp_path):
+    path = str(tmp_path / 'telemetry')
+    telemetry = Telemetry(path)
+    record(telemetry, 10)
+    telemetry.close()
+    # a crash mid-record: only the first columns got the next row
+    with open(os.path.join(path, 'timestamp'), 'ab') as f:
+        f.write(bytes(8))
+    with open(os.path.join(path, 'version'), 'ab') as f:
+        f.write(bytes(2))
+
+    telemetry = Telemetry(path)
+    record(telemetry, 20)
+    telemetry.close()
+    columns, _ = load(path)
+    assert columns['input_tokens'].tolist() == [10, 20]
+    assert (columns['timestamp'] > 0).all()
+    assert columns['version'].tolist() == [0, 0]
@@ -0,0 +1,101 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gpt_arbiter_human_in_loop.shared import ItemStatus, QAPair
+from gpt_arbiter_human_in_loop.persistent import Persistent, ItemAnnotations
+from gpt_arbiter_human_in_loop.persistent_memmap import MemmapPersistent
+from gpt_arbiter_human_in_loop.id_queue import IdQueue
+from gpt_arbiter_human_in_loop.track import Track
+
+def writePrompt(path, prompt):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(file_path=str(path), prompt=prompt, examples=[]), f)
+
+def test_cold_start_forgets_old_verdicts(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    rw_path = str(tmp_path / 'rw.json')
+    writePrompt(prompt_path, 'old {CLASSIFIEE} {EXAMPLES}')
+    old_version = Track('main', str(prompt_path), rw_path).prompt_and_examples.version
+    persistent = Persistent(rw_path)
+    with persistent.Context():
+        persistent.set('a', ItemAnnotations.fromProbs(
+            (0.3, 0.7), ItemStatus.Classified(), prompt_version=old_version,
+        ))
+    writePrompt(prompt_path, 'new {CLASSIFIEE} {EXAMPLES}')
+
+    track = Track('main', str(prompt_path), rw_path)
+    with track.persistent.Context():
+        assert track.reconcileVersions(warm_start=False) == 1
+        assert track.persistent.items() == []
+        IdQueue(['a', 'b'], track.persistent, Lambda=10.0)
+    # and on every later launch
+    track = Track('main', str(prompt_path), rw_path)
+    with track.persistent.Context():
+        track.reconcileVersions(warm_start=True)
+        IdQueue(['a', 'b'], track.persistent, Lambda=10.0)
+        assert track.persistent.get('a').status == ItemStatus.Unvisited()
+
+def test_warm_start_outdates_by_version_distance(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    rw_path = str(tmp_path / 'rw.json')
+    writePrompt(prompt_path, 'p {CLASSIFIEE} {EXAMPLES}')
+    track = Track('main', str(prompt_path), rw_path)
+    old_version = track.prompt_and_examples.version
+    for question in ('x', 'y'):
+        track.prompt_and_examples = track.prompt_and_examples.addExampleSyncingFile(
+            QAPair(question=question, no_or_yes=1, explanation=None),
+        )
+    track = Track('main', str(prompt_path), rw_path)
+    with track.persistent.Context():
+        track.persistent.set('a', ItemAnnotations.fromProbs(
+            (0.3, 0.7), ItemStatus.Classified(), prompt_version=old_version,
+        ))
+        assert track.reconcileVersions() == 1
+        assert track.persistent.get('a').status == ItemStatus.Outdated(2)
+
+def test_constructing_a_track_leaves_the_prompt_file_alone(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    writePrompt(prompt_path, 'p {CLASSIFIEE} {EXAMPLES}')
+    before = prompt_path.read_text(encoding='utf-8')
+    Track('main', str(prompt_path), str(tmp_path / 'rw.json'))
+    assert prompt_path.read_text(encoding='utf-8') == before
+
+def test_rejects_memmap_store(tmp_path):
+    prompt_path = tmp_path / 'prompt.json'
+    writePrompt(prompt_path, 'p {CLASSIFIEE} {EXAMPLES}')
+    store_path = str(tmp_path / 'store')
+    MemmapPersistent.create(store_path, ['a', 'b'])
+    with pytest.raises(AssertionError):
+        Track('main', str(prompt_path), store_path)
+
+def test_queue_skips_ids_outside_the_source(tmp_path):
+    persistent = Persistent(str(tmp_path / 'rw.json'))
+    with persistent.Context():
+        for id_ in ('a', 'gone'):
+            persistent.set(id_, ItemAnnotations.fromProbs(
+                (0.3, 0.7), ItemStatus.Classified(),
+            ))
+        queue = IdQueue(['a', 'b'], persistent, Lambda=10.0)
+        assert queue.visited == ['a']
+        # a stream can be given its ids separately
+        queue = IdQueue(
+            iter(['a', 'b']), persistent, Lambda=10.0, source_ids={'a', 'b'},
+        )
+        assert queue.visited == ['a']
+
+def test_queue_draws_from_threads(tmp_path):
+    def slowSource():
+        for i in range(2000):
+            time.sleep(0)
+            yield f'id{i}'
+    persistent = Persistent(str(tmp_path / 'rw.json'))
+    with persistent.Context():
+        queue = IdQueue(slowSource(), persistent, Lambda=10.0, shuffle_buffer=16)
+        with ThreadPoolExecutor(4) as pool:
+            for f in [pool.submit(queue.at, i) for i in range(0, 2000, 7)] * 2:
+                f.result()
+        assert queue.at(1999) is not None
+        assert sorted(queue.drawn) == sorted(f'id{i}' for i in range(2000))